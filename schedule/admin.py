@@ -1,24 +1,125 @@
-from django.contrib import admin
-import csv
-import pandas as pd
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import PermissionDenied
+from django.db.models import Prefetch
+from django import forms
 from datetime import datetime, timedelta
-from django.utils.module_loading import import_string
-from .models import Department, Role, Employee, ShiftRequirement, Shift, TimeOff, Day, ShiftType
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from .models import Department, Role, Employee, ShiftRequirement, RecurringRequirement, Shift, TimeOff, Day, ShiftType, GenerationJob, WeeklyHours
+from .exports import export_response
+from .importers import IMPORTERS, import_file
+from .jobs import submit_generation_job
+from .ledger import replace_shifts
+from .recurring import materialize_templates
+from .repair import remove_employees, repair_after_time_off, repair_requirements
+from .scoring import DEFAULT_IMPROVE_ITERATIONS, MAX_IMPROVE_ITERATIONS
+from .signals import schedule_changed
+from .utils import SOLVERS, DEFAULT_SOLVER
+from .views import COVERAGE_DEFAULT_DAYS, parse_date_range
 
-# Dinamički import funkcije generiranja rasporeda
-generate_schedule_for_day = import_string("schedule.utils.generate_schedule_for_day")
+### 📌 Action forme ###
+class GenerateScheduleActionForm(ActionForm):
+    solver = forms.ChoiceField(choices=[(name, name) for name in SOLVERS], initial=DEFAULT_SOLVER, required=False)
+    seed = forms.IntegerField(required=False, help_text="Same seed and data always give the same schedule")
+    improve_iterations = forms.IntegerField(
+        required=False, min_value=0, max_value=MAX_IMPROVE_ITERATIONS,
+        help_text="Local search attempts after generating (empty or 0 = off)",
+    )
+
+class MaterializeActionForm(ActionForm):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+def repair_message(summary):
+    return (
+        f"🔧 Schedule repaired: kept {summary['kept']}, removed {summary['removed']}, created {summary['created']} shifts "
+        f"({summary['hours_covered']}/{summary['hours_required']}h covered)."
+    )
+
+### 📌 Uloge u adminu ###
+# Role.__str__ prikazuje odjel, pa ga filteri i izbornici uloga učitavaju odmah
+def roles_with_department():
+    return Role.objects.select_related('department')
+
+class RoleListFilter(admin.RelatedFieldListFilter):
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin) or Role._meta.ordering or ('name',)
+        return [(role.pk, str(role)) for role in roles_with_department().order_by(*ordering)]
+
+class RoleChoicesMixin:
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model is Role:
+            kwargs.setdefault('queryset', roles_with_department())
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.related_model is Role:
+            kwargs.setdefault('queryset', roles_with_department())
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+### 📌 Uvoz iz CSV/XLSX ###
+IMPORT_ERRORS_SHOWN = 200
+
+class ImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV (UTF-8) or XLSX; first row holds the column names")
+    dry_run = forms.BooleanField(initial=True, required=False, help_text="Only validate and report, save nothing")
+
+class ImportAdminMixin:
+    import_kind = None
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name=f'schedule_{self.model._meta.model_name}_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = ImportForm(request.POST or None, request.FILES or None)
+        report = None
+        if request.method == 'POST' and form.is_valid():
+            try:
+                report = import_file(self.import_kind, form.cleaned_data['file'], dry_run=form.cleaned_data['dry_run'])
+            except ValueError as error:
+                self.message_user(request, f"⚠️ {error}", level=messages.ERROR)
+            else:
+                summary = f"{report['rows']} rows, {report['valid']} valid, {len(report['errors'])} errors"
+                if report['errors']:
+                    self.message_user(request, f"⚠️ Import aborted, nothing saved ({summary}).", level=messages.ERROR)
+                elif report['dry_run']:
+                    self.message_user(request, f"🔍 Dry run OK, nothing saved ({summary}).")
+                else:
+                    self.message_user(request, f"✅ Imported {report['created']} rows ({summary}).", level=messages.SUCCESS)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f"Import {self.model._meta.verbose_name_plural}",
+            'form': form,
+            'columns': IMPORTERS[self.import_kind]['columns'],
+            'report': report,
+            'errors': report['errors'][:IMPORT_ERRORS_SHOWN] if report else [],
+        }
+        return TemplateResponse(request, 'admin/schedule/import.html', context)
 
 ### 📌 Employee Admin ###
 @admin.register(Employee)
-class EmployeeAdmin(admin.ModelAdmin):
+class EmployeeAdmin(RoleChoicesMixin, ImportAdminMixin, admin.ModelAdmin):
     list_display = ('get_full_name', 'user', 'max_weekly_hours', 'max_daily_hours', 'get_departments', 'get_roles', 'priority')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'departments__name', 'roles__name')
-    list_filter = ('departments', 'roles', 'available_days', 'can_work_shifts')
+    list_filter = ('departments', ('roles', RoleListFilter), 'available_days', 'can_work_shifts')
     filter_horizontal = ('departments', 'roles', 'available_days', 'can_work_shifts')
     ordering = ('priority', '-max_weekly_hours')
+    import_kind = 'employees'
+
+    # M2M stupci se čitaju jednim upitom po relaciji za cijelu stranicu
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').prefetch_related(
+            Prefetch('departments', queryset=Department.objects.only('id', 'name')),
+            Prefetch('roles', queryset=Role.objects.only('id', 'name', 'department')),
+        )
 
     def get_full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}"
@@ -32,15 +133,30 @@ class EmployeeAdmin(admin.ModelAdmin):
         return ", ".join([r.name for r in obj.roles.all()])
     get_roles.short_description = "Roles"
 
+    # Smjene uklonjenog radnika popravak odmah dodjeljuje drugima
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Employee.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.message_user(request, repair_message(remove_employees(queryset)))
+
 ### 📌 ShiftRequirement Admin ###
 @admin.register(ShiftRequirement)
-class ShiftRequirementAdmin(admin.ModelAdmin):
+class ShiftRequirementAdmin(RoleChoicesMixin, ImportAdminMixin, admin.ModelAdmin):
     list_display = ('department', 'date', 'required_hours', 'get_shift_types', 'get_roles')
     search_fields = ('department__name', 'date', 'required_roles__name')
     list_filter = ('department', 'date')
     ordering = ('date', 'department')
-    actions = ['generate_schedule_for_selected']
+    actions = ['generate_schedule_for_selected', 'repair_schedule_for_selected']
+    action_form = GenerateScheduleActionForm
     filter_horizontal = ('shift_types', 'required_roles')
+    import_kind = 'requirements'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('department').prefetch_related(
+            Prefetch('shift_types', queryset=ShiftType.objects.only('id', 'name')),
+            Prefetch('required_roles', queryset=Role.objects.only('id', 'name', 'department')),
+        )
 
     def get_shift_types(self, obj):
         return ", ".join([s.name for s in obj.shift_types.all()])
@@ -52,17 +168,103 @@ class ShiftRequirementAdmin(admin.ModelAdmin):
 
     @admin.action(description="✅ Generate schedule for selected shifts")
     def generate_schedule_for_selected(self, request, queryset):
-        for requirement in queryset:
-            generate_schedule_for_day(requirement.date)
-        self.message_user(request, "✅ Schedule generated for the selected shifts.")
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, "⚠️ Invalid solver, seed or improve iterations.", level=messages.ERROR)
+            return
+        # Svaki odabrani datum generira se samo jednom, u jednom pozadinskom poslu, i samo za
+        # odjele odabranih zahtjeva (smjene ostalih odjela tih dana ostaju)
+        try:
+            job = submit_generation_job(
+                queryset.values_list('date', flat=True).distinct(),
+                departments=set(queryset.values_list('department_id', flat=True)),
+                solver=form.cleaned_data['solver'] or DEFAULT_SOLVER,
+                seed=form.cleaned_data['seed'],
+                improve_iterations=form.cleaned_data['improve_iterations'] or DEFAULT_IMPROVE_ITERATIONS,
+            )
+        except ValueError as error:
+            self.message_user(request, f"⚠️ {error}", level=messages.ERROR)
+            return
+        self.message_user(request, f"⏳ Schedule generation started as job #{job.pk}, progress: {reverse('generation_job_status', args=[job.pk])}")
+
+    @admin.action(description="🔧 Repair schedule for selected shifts")
+    def repair_schedule_for_selected(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, "⚠️ Invalid solver or seed.", level=messages.ERROR)
+            return
+        # Postojeće valjane smjene ostaju, nadoknađuju se samo sati obrisanih smjena
+        summary = repair_requirements(queryset, solver=form.cleaned_data['solver'] or DEFAULT_SOLVER, seed=form.cleaned_data['seed'])
+        self.message_user(request, repair_message(summary))
+
+### 📌 RecurringRequirement Admin ###
+@admin.register(RecurringRequirement)
+class RecurringRequirementAdmin(RoleChoicesMixin, admin.ModelAdmin):
+    list_display = ('department', 'get_days', 'required_hours', 'valid_from', 'valid_until', 'get_shift_types', 'get_roles')
+    search_fields = ('department__name', 'required_roles__name')
+    list_filter = ('department', 'days')
+    ordering = ('department', 'valid_from')
+    actions = ['materialize_selected']
+    action_form = MaterializeActionForm
+    filter_horizontal = ('days', 'shift_types', 'required_roles')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('department').prefetch_related(
+            'days',
+            Prefetch('shift_types', queryset=ShiftType.objects.only('id', 'name')),
+            Prefetch('required_roles', queryset=Role.objects.only('id', 'name', 'department')),
+        )
+
+    def get_days(self, obj):
+        return ", ".join([d.name for d in obj.days.all()])
+    get_days.short_description = "Days"
+
+    def get_shift_types(self, obj):
+        return ", ".join([s.name for s in obj.shift_types.all()])
+    get_shift_types.short_description = "Shift Types"
+
+    def get_roles(self, obj):
+        return ", ".join([r.name for r in obj.required_roles.all()])
+    get_roles.short_description = "Required Roles"
+
+    @admin.action(description="📌 Materialize selected templates as shift requirements")
+    def materialize_selected(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid() or not form.cleaned_data['start_date'] or not form.cleaned_data['end_date']:
+            self.message_user(request, "⚠️ Choose a start and end date.", level=messages.ERROR)
+            return
+        if form.cleaned_data['end_date'] < form.cleaned_data['start_date']:
+            self.message_user(request, "⚠️ End date must not be before start date.", level=messages.ERROR)
+            return
+        # Nastali ShiftRequirement retci se mogu pojedinačno mijenjati i imaju prednost pred predloškom
+        created = materialize_templates(queryset, form.cleaned_data['start_date'], form.cleaned_data['end_date'])
+        self.message_user(request, f"📌 Created {created} shift requirements; days that already had one were skipped.")
+
+### 📌 TimeOff Admin ###
+@admin.register(TimeOff)
+class TimeOffAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'reason', 'start_date', 'end_date')
+    search_fields = ('employee__user__username', 'employee__user__first_name', 'employee__user__last_name')
+    list_filter = ('reason', 'start_date')
+    list_select_related = ('employee__user',)
+    actions = ['repair_schedule_for_time_off']
+
+    @admin.action(description="🔧 Repair schedule around selected time off")
+    def repair_schedule_for_time_off(self, request, queryset):
+        # Mijenjaju se samo smjene radnika na odsustvu; ostali zadržavaju svoj raspored
+        self.message_user(request, repair_message(repair_after_time_off(queryset)))
 
 ### 📌 Shift Admin ###
 @admin.register(Shift)
-class ShiftAdmin(admin.ModelAdmin):
+class ShiftAdmin(RoleChoicesMixin, admin.ModelAdmin):
     list_display = ('get_employee_full_name', 'department', 'get_role_name', 'date', 'start_time', 'end_time', 'calculate_total_hours')
     search_fields = ('employee__user__username', 'employee__user__first_name', 'employee__user__last_name', 'department__name', 'role__name', 'date')
-    list_filter = ('department', 'role', 'date')
+    list_filter = ('department', ('role', RoleListFilter), 'date')
     ordering = ('date', 'start_time')
+    list_select_related = ('employee__user', 'department', 'role')
     actions = ['export_schedule_to_csv', 'export_schedule_to_excel', 'export_schedule_to_pdf', 'delete_all_shifts']
 
     def get_employee_full_name(self, obj):
@@ -86,90 +288,94 @@ class ShiftAdmin(admin.ModelAdmin):
 
     calculate_total_hours.short_description = "Total Hours"
 
+    # Brisanje ide kroz knjigu sati, a verziju rasporeda (cache PDF-a) mijenjamo ručno
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Shift.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        replace_shifts(queryset, [])
+        schedule_changed.send(sender=Shift)
+
+    # 📊 Izvještaj pokrivenosti: /admin/schedule/shift/coverage/
+    def get_urls(self):
+        return [
+            path('coverage/', self.admin_site.admin_view(self.coverage_view), name='schedule_shift_coverage'),
+        ] + super().get_urls()
+
+    def coverage_view(self, request):
+        # NumPy se uvozi tek ovdje, ne pri startu admina
+        from .coverage import coverage_report
+
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta, 'title': "Coverage report"}
+        try:
+            start_date, end_date, departments = parse_date_range(request, default_days=COVERAGE_DEFAULT_DAYS)
+        except ValueError as error:
+            self.message_user(request, f"⚠️ {error}", level=messages.ERROR)
+            return TemplateResponse(request, 'admin/schedule/coverage.html', context)
+
+        report = coverage_report(start_date, end_date, departments)
+        report['employees'].sort(key=lambda row: -row['utilization'])
+        context.update({
+            'report': report,
+            'departments': Department.objects.order_by('name'),
+            'selected_departments': departments or [],
+        })
+        return TemplateResponse(request, 'admin/schedule/coverage.html', context)
+
     @admin.action(description="📄 Export schedule to CSV")
     def export_schedule_to_csv(self, request, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="schedule.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Employee', 'Department', 'Role', 'Date', 'Start Time', 'End Time', 'Total Hours'])
-
-        for shift in queryset.distinct():
-            writer.writerow([
-                self.get_employee_full_name(shift),
-                shift.department.name, 
-                shift.role.name, 
-                shift.date, 
-                shift.start_time.strftime('%H:%M'), 
-                shift.end_time.strftime('%H:%M'), 
-                self.calculate_total_hours(shift)
-            ])
-        return response
+        # Streaming: redovi idu u odgovor čim se pročitaju, bez gradnje cijelog CSV-a u memoriji
+        return export_response('csv', queryset)
 
     @admin.action(description="📊 Export schedule to Excel")
     def export_schedule_to_excel(self, request, queryset):
-        df = pd.DataFrame([
-            (
-                self.get_employee_full_name(shift),
-                shift.department.name, 
-                shift.role.name, 
-                shift.date, 
-                shift.start_time.strftime('%H:%M'), 
-                shift.end_time.strftime('%H:%M'), 
-                self.calculate_total_hours(shift)
-            ) for shift in queryset.distinct()
-        ], columns=['Employee', 'Department', 'Role', 'Date', 'Start Time', 'End Time', 'Total Hours'])
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="schedule.xlsx"'
-        df.to_excel(response, index=False)
-        return response
+        # Write-only radna knjiga: sheet po odjelu + tjedni pivot, bez DataFrame-a u memoriji
+        return export_response('excel', queryset)
 
     @admin.action(description="📄 Export schedule to PDF")
     def export_schedule_to_pdf(self, request, queryset):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="schedule.pdf"'
-        pdf = canvas.Canvas(response, pagesize=letter)
-        pdf.setFont("Helvetica", 12)
-        y = 750  
-
-        pdf.drawString(200, y, "Generated Schedule")
-        y -= 30
-
-        headers = ['Employee', 'Department', 'Role', 'Date', 'Start Time', 'End Time', 'Total Hours']
-        x_positions = [50, 150, 250, 350, 450, 500, 550]
-
-        for x, header in zip(x_positions, headers):
-            pdf.drawString(x, y, header)
-        y -= 20
-
-        for shift in queryset.distinct():
-            data = [
-                self.get_employee_full_name(shift),
-                shift.department.name, 
-                shift.role.name, 
-                str(shift.date), 
-                shift.start_time.strftime('%H:%M'), 
-                shift.end_time.strftime('%H:%M'), 
-                str(self.calculate_total_hours(shift))
-            ]
-            for x, value in zip(x_positions, data):
-                pdf.drawString(x, y, value)
-            y -= 20
-
-            if y < 50:
-                pdf.showPage()
-                y = 750
-
-        pdf.save()
-        return response
+        # Tjedna mreža po odjelu; nepromijenjeni raspored se vraća iz cachea
+        return export_response('pdf', queryset)
 
     @admin.action(description="🗑 Delete all shifts")
     def delete_all_shifts(self, request, queryset):
-        queryset.delete()
+        self.delete_queryset(request, queryset)
         self.message_user(request, "🗑 All selected shifts have been deleted.")
 
+### 📌 Role Admin ###
+@admin.register(Role)
+class RoleAdmin(admin.ModelAdmin):
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('department')
+
+### 📌 GenerationJob Admin ###
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'solver', 'seed', 'requirements_done', 'requirements_total', 'hours_covered', 'hours_required', 'shifts_created', 'score', 'created_at', 'finished_at')
+    list_filter = ('status', 'solver')
+    ordering = ('-created_at',)
+    readonly_fields = [field.name for field in GenerationJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+### 📌 WeeklyHours Admin ###
+@admin.register(WeeklyHours)
+class WeeklyHoursAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'iso_year', 'iso_week', 'hours')
+    search_fields = ('employee__user__username', 'employee__user__first_name', 'employee__user__last_name')
+    list_filter = ('iso_year', 'iso_week')
+    ordering = ('-iso_year', '-iso_week', 'employee')
+    list_select_related = ('employee__user',)
+    readonly_fields = ('employee', 'iso_year', 'iso_week', 'minutes')
+
+    # Knjigu vode smjene; ručne izmjene bi je razdvojile od stvarnog rasporeda
+    def has_add_permission(self, request):
+        return False
+
 ### 📌 Registering other models ###
 admin.site.register(Department)
-admin.site.register(Role)
 admin.site.register(Day)
 admin.site.register(ShiftType)
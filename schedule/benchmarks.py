@@ -0,0 +1,229 @@
+import json
+import random
+import tracemalloc
+from datetime import date, time, timedelta
+from time import perf_counter
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from .instrumentation import GenerationStats
+from .models import DAYS_OF_WEEK, Department, Role, ShiftType, Employee, Day, ShiftRequirement, Shift, TimeOff
+from .scoring import DEFAULT_IMPROVE_ITERATIONS
+from .utils import generate_schedule_for_range, DEFAULT_SOLVER
+
+# === SINTETIČKI PODACI ===
+# Bolnica s odjelima od ~50 radnika; sve se upisuje bulk_create-om, uključujući M2M through tablice
+
+BENCHMARK_SHIFT_TYPES = [
+    ('BM 07-15', time(7), time(15), 8),
+    ('BM 15-23', time(15), time(23), 8),
+    ('BM 23-07', time(23), time(7), 8),
+    ('BM 08-20', time(8), time(20), 12),
+    ('BM 20-08', time(20), time(8), 12),
+]
+BENCHMARK_ROLES = ['Nurse', 'Senior Nurse', 'HCA']
+STAFF_PER_DEPARTMENT = 50
+# Razlike u vremenu ispod ovoga (s) su šum mjerenja, ne regresija
+WALL_TIME_NOISE = 0.1
+
+def build_dataset(staff, days, start_date=None, seed=0, shared_staff=0.1):
+    rng = random.Random(seed)
+    start_date = start_date or date(2025, 3, 3)
+    department_count = max(1, staff // STAFF_PER_DEPARTMENT)
+
+    weekdays = [Day.objects.get_or_create(name=name)[0] for name, _ in DAYS_OF_WEEK]
+    shift_types = [
+        ShiftType.objects.get_or_create(name=name, defaults={'start_time': start, 'end_time': end, 'duration_hours': hours})[0]
+        for name, start, end, hours in BENCHMARK_SHIFT_TYPES
+    ]
+
+    departments = Department.objects.bulk_create([Department(name=f"BM Department {number}") for number in range(department_count)])
+    roles = Role.objects.bulk_create([
+        Role(name=f"BM {role} {department.name}", department=department)
+        for department in departments for role in BENCHMARK_ROLES
+    ])
+    roles_by_department = {department.id: [role for role in roles if role.department_id == department.id] for department in departments}
+
+    users = User.objects.bulk_create([User(username=f"bm{number:05d}", first_name="Bench", last_name=f"Mark {number}") for number in range(staff)])
+    employees = Employee.objects.bulk_create([
+        Employee(user=user, max_weekly_hours=rng.choice([24, 36, 40, 48]), max_daily_hours=12, priority=rng.randint(1, 3))
+        for user in users
+    ])
+
+    department_links, role_links, day_links, shift_links = [], [], [], []
+    for number, employee in enumerate(employees):
+        home = departments[number % department_count]
+        employee_departments = [home]
+        if department_count > 1 and rng.random() < shared_staff:
+            employee_departments.append(rng.choice(departments))
+        for department in {department.id: department for department in employee_departments}.values():
+            department_links.append(Employee.departments.through(employee_id=employee.id, department_id=department.id))
+            for role in rng.sample(roles_by_department[department.id], rng.randint(1, 2)):
+                role_links.append(Employee.roles.through(employee_id=employee.id, role_id=role.id))
+        for day in rng.sample(weekdays, 5):
+            day_links.append(Employee.available_days.through(employee_id=employee.id, day_id=day.id))
+        if rng.random() < 0.3:
+            for shift_type in rng.sample(shift_types, 3):
+                shift_links.append(Employee.can_work_shifts.through(employee_id=employee.id, shifttype_id=shift_type.id))
+
+    Employee.departments.through.objects.bulk_create(department_links, batch_size=1000)
+    Employee.roles.through.objects.bulk_create(role_links, batch_size=1000)
+    Employee.available_days.through.objects.bulk_create(day_links, batch_size=1000)
+    Employee.can_work_shifts.through.objects.bulk_create(shift_links, batch_size=1000)
+
+    # ~5% radnika ima bolovanje ili godišnji od nekoliko dana
+    time_off = []
+    for employee in rng.sample(employees, len(employees) // 20):
+        first_day = start_date + timedelta(days=rng.randint(0, days - 1))
+        time_off.append(TimeOff(employee=employee, start_date=first_day, end_date=first_day + timedelta(days=rng.randint(0, 4)), reason=rng.choice(['sick', 'holiday'])))
+    TimeOff.objects.bulk_create(time_off)
+
+    # Potražnja ~70% kapaciteta odjela, zaokružena na smjene od 8h
+    requirements = []
+    for offset in range(days):
+        for department in departments:
+            daily_capacity = STAFF_PER_DEPARTMENT * 40 / 7
+            requirements.append(ShiftRequirement(department=department, date=start_date + timedelta(days=offset), required_hours=max(8, round(daily_capacity * 0.7 / 8) * 8)))
+    requirements = ShiftRequirement.objects.bulk_create(requirements, batch_size=1000)
+
+    ShiftRequirement.shift_types.through.objects.bulk_create([
+        ShiftRequirement.shift_types.through(shiftrequirement_id=requirement.id, shifttype_id=shift_type.id)
+        for requirement in requirements for shift_type in shift_types
+    ], batch_size=1000)
+    ShiftRequirement.required_roles.through.objects.bulk_create([
+        ShiftRequirement.required_roles.through(shiftrequirement_id=requirement.id, role_id=role.id)
+        for requirement in requirements for role in roles_by_department[requirement.department_id]
+    ], batch_size=1000)
+
+    return start_date, start_date + timedelta(days=days - 1)
+
+# === MJERENJE ===
+
+def measure(function, *args, **kwargs):
+    # Log upita ima ograničenu duljinu; praznimo ga da brojanje ne stane na 9000
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = perf_counter()
+        result = function(*args, **kwargs)
+        wall_time = perf_counter() - started
+    return result, {'wall_time': round(wall_time, 4), 'queries': len(queries.captured_queries)}
+
+def measure_peak_memory(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+def read_response(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+def shift_hours(shift):
+    return admin.site._registry[Shift].calculate_total_hours(shift)
+
+def coverage_ratio(start_date, end_date):
+    assigned = {}
+    for shift in Shift.objects.filter(date__range=(start_date, end_date)).only('department_id', 'date', 'start_time', 'end_time'):
+        key = (shift.department_id, shift.date)
+        assigned[key] = assigned.get(key, 0) + shift_hours(shift)
+
+    required = covered = 0
+    for department_id, requirement_date, required_hours in ShiftRequirement.objects.filter(date__range=(start_date, end_date)).values_list('department_id', 'date', 'required_hours'):
+        required += required_hours
+        covered += min(required_hours, assigned.get((department_id, requirement_date), 0))
+    return round(covered / required, 4) if required else 1.0
+
+def run_scenario(staff, days, solver=DEFAULT_SOLVER, seed=0, exports=True, memory=True, shared_staff=0.1, workers=None, improve_iterations=DEFAULT_IMPROVE_ITERATIONS):
+    start_date, end_date = build_dataset(staff, days, seed=seed, shared_staff=shared_staff)
+    stats = GenerationStats()
+    shifts, result = measure(generate_schedule_for_range, start_date, end_date, solver=solver, seed=seed, workers=workers, stats=stats, improve_iterations=improve_iterations)
+    # Ocjena (manje je bolje) uz vrijeme pokazuje odnos kvalitete i trajanja
+    result.update({
+        'shifts': len(shifts),
+        'coverage': coverage_ratio(start_date, end_date),
+        'score': stats.scores['final']['total'] if stats.scores else None,
+        'improve_time': round(stats.timings.get('improve', 0), 4),
+    })
+    if memory:
+        result['peak_memory_kb'] = measure_peak_memory(generate_schedule_for_range, start_date, end_date, solver=solver, seed=seed, workers=workers, improve_iterations=improve_iterations)
+
+    if exports:
+        shift_admin = admin.site._registry[Shift]
+        queryset = Shift.objects.filter(date__range=(start_date, end_date))
+        for name in ('csv', 'excel', 'pdf'):
+            action = getattr(shift_admin, f"export_schedule_to_{name}")
+            _, export_result = measure(lambda: read_response(action(None, queryset)))
+            result[f"export_{name}"] = export_result
+    return result
+
+# === PLANOVI UPITA ===
+# Najčešći upiti generatora i popravka; EXPLAIN pokazuje koriste li indekse
+
+def hot_queries():
+    # Tipičan posao: jedan tjedan na kraju raspona, nad svim ili nad dva odjela
+    last_date = ShiftRequirement.objects.aggregate(last=Max('date'))['last']
+    dates = [last_date - timedelta(days=offset) for offset in range(7)] if last_date else []
+    department_ids = list(Department.objects.order_by('id').values_list('id', flat=True)[:2])
+    employee_id = Shift.objects.order_by('id').values_list('employee_id', flat=True).first()
+    return {
+        'shifts_by_date': Shift.objects.filter(date__in=dates),
+        'shifts_by_date_department': Shift.objects.filter(date__in=dates, department__in=department_ids),
+        'shifts_by_employee_date': Shift.objects.filter(employee_id=employee_id, date__range=(min(dates, default=None), last_date)),
+        'requirements_by_date': ShiftRequirement.objects.filter(date__in=dates),
+        'requirements_by_date_department': ShiftRequirement.objects.filter(date__in=dates, department__in=department_ids),
+    }
+
+def explain_hot_queries():
+    plans = {}
+    for name, queryset in hot_queries().items():
+        _, result = measure(lambda: list(queryset.values_list('id', flat=True)))
+        plans[name] = {'plan': queryset.explain(), 'wall_time': result['wall_time']}
+    return plans
+
+def scenario_name(staff, days, solver):
+    return f"{solver}-{staff}x{days}"
+
+# === BASELINE ===
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+def save_baseline(path, results):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, 'w') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+def find_regressions(name, result, baseline, tolerance=0.25):
+    expected = baseline.get(name)
+    if not expected:
+        return []
+
+    regressions = []
+    for metric, noise in (('wall_time', WALL_TIME_NOISE), ('peak_memory_kb', 0)):
+        if metric in expected and metric in result and result[metric] > expected[metric] * (1 + tolerance) + noise:
+            regressions.append(f"{name}: {metric} {result[metric]} > {expected[metric]} (+{tolerance:.0%})")
+    # Broj upita i pokrivenost su deterministični, pa za njih nema tolerancije
+    if 'queries' in expected and result['queries'] > expected['queries']:
+        regressions.append(f"{name}: queries {result['queries']} > {expected['queries']}")
+    if 'coverage' in expected and result['coverage'] < expected['coverage']:
+        regressions.append(f"{name}: coverage {result['coverage']} < {expected['coverage']}")
+    # Seed i broj pokušaja poboljšanja određuju raspored, pa je i ocjena deterministična
+    if expected.get('score') is not None and result.get('score') is not None and result['score'] > expected['score']:
+        regressions.append(f"{name}: score {result['score']} > {expected['score']}")
+
+    # Exporti imaju vlastite metrike pod ključevima export_*
+    for key, value in result.items():
+        if isinstance(value, dict) and isinstance(expected.get(key), dict):
+            regressions.extend(find_regressions(f"{name}.{key}", value, {f"{name}.{key}": expected[key]}, tolerance))
+    return regressions
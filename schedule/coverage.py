@@ -0,0 +1,212 @@
+from datetime import timedelta
+
+import numpy as np
+from django.apps import apps
+
+from .intervals import MINUTES_PER_DAY
+from .recurring import expand_templates, load_templates
+
+# === ANALIZA POKRIVENOSTI ===
+# Smjene raspona učitavaju se u NumPy polja (jedan upit), a zauzetost se računa po minuti
+# za svaki odjel i dan: +1 na početku smjene, -1 na kraju, pa kumulativni zbroj.
+# Smjene preko ponoći pune jutro sljedećeg dana, a one od prethodnog dana jutro prvog.
+# NumPy se uvozi samo s ovim modulom, a view i admin ga uvoze tek na zahtjev.
+
+def time_minutes(values):
+    return np.fromiter((value.hour * 60 + value.minute for value in values), dtype=np.int32, count=len(values))
+
+def day_offsets(dates, start_date):
+    origin = start_date.toordinal()
+    return np.fromiter((value.toordinal() - origin for value in dates), dtype=np.int32, count=len(dates))
+
+def absolute_intervals(days, starts, ends):
+    # Minute od početka raspona; kraj <= početak znači da smjena završava sutradan
+    ends = np.where(ends <= starts, ends + MINUTES_PER_DAY, ends)
+    return days * MINUTES_PER_DAY + starts, days * MINUTES_PER_DAY + ends
+
+def minute_profile(rows, starts, ends, row_count, day_count):
+    # Broj preklapajućih intervala po minuti: oblik (row_count, day_count, 1440)
+    timeline = (day_count + 1) * MINUTES_PER_DAY
+    diff = np.zeros((row_count, timeline + 1), dtype=np.int32)
+    np.add.at(diff, (rows, np.clip(starts, 0, timeline)), 1)
+    np.add.at(diff, (rows, np.clip(ends, 0, timeline)), -1)
+    profile = np.cumsum(diff, axis=1)[:, :day_count * MINUTES_PER_DAY]
+    return profile.reshape(row_count, day_count, MINUTES_PER_DAY)
+
+def load_shifts(start_date, end_date, departments=None):
+    Shift = apps.get_model('schedule', 'Shift')
+    shifts = Shift.objects.filter(date__range=(start_date - timedelta(days=1), end_date))
+    if departments is not None:
+        shifts = shifts.filter(department__in=departments)
+    rows = list(shifts.values_list('employee_id', 'department_id', 'role_id', 'date', 'start_time', 'end_time'))
+    employee_ids, department_ids, role_ids, dates, start_times, end_times = zip(*rows) if rows else ((),) * 6
+
+    days = day_offsets(dates, start_date)
+    starts, ends = absolute_intervals(days, time_minutes(start_times), time_minutes(end_times))
+    return {
+        'employee': np.array(employee_ids, dtype=np.int64),
+        'department': np.array(department_ids, dtype=np.int64),
+        'role': np.array(role_ids, dtype=np.int64),
+        'day': days,
+        'start': starts,
+        'end': ends,
+    }
+
+def load_requirements(start_date, end_date, departments=None):
+    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+    requirements = ShiftRequirement.objects.filter(date__range=(start_date, end_date))
+    if departments is not None:
+        requirements = requirements.filter(department__in=departments)
+    rows = list(requirements.values_list('department_id', 'date', 'required_hours'))
+
+    # Prozori u kojima zahtjev traži ljude = unija njegovih tipova smjena
+    links = ShiftRequirement.shift_types.through.objects.filter(shiftrequirement__in=requirements)
+    windows = list(links.values_list('shiftrequirement__department_id', 'shiftrequirement__date', 'shifttype__start_time', 'shifttype__end_time'))
+
+    # Ponavljajući predlošci za odjel-dane bez konkretnog zahtjeva, kao u generatoru
+    templates = load_templates(start_date, end_date, departments)
+    if templates:
+        ShiftType = apps.get_model('schedule', 'ShiftType')
+        shift_type_times = {pk: (start_time, end_time) for pk, start_time, end_time in ShiftType.objects.values_list('id', 'start_time', 'end_time')}
+        range_dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        overridden = {(department_id, custom_date) for department_id, custom_date, _ in rows}
+        for template, custom_date in expand_templates(templates, range_dates, overridden):
+            rows.append((template.department_id, custom_date, template.required_hours))
+            windows.extend((template.department_id, custom_date, *shift_type_times[shift_type_id]) for shift_type_id in template.shift_type_ids)
+
+    department_ids, dates, required_hours = zip(*rows) if rows else ((),) * 3
+    window_departments, window_dates, window_starts, window_ends = zip(*windows) if windows else ((),) * 4
+    window_days = day_offsets(window_dates, start_date)
+    window_starts, window_ends = absolute_intervals(window_days, time_minutes(window_starts), time_minutes(window_ends))
+    return {
+        'department': np.array(department_ids, dtype=np.int64),
+        'day': day_offsets(dates, start_date),
+        'required_hours': np.array(required_hours, dtype=np.float64),
+        'window_department': np.array(window_departments, dtype=np.int64),
+        'window_start': window_starts,
+        'window_end': window_ends,
+    }
+
+def coverage_report(start_date, end_date, departments=None):
+    Department = apps.get_model('schedule', 'Department')
+    Employee = apps.get_model('schedule', 'Employee')
+    Role = apps.get_model('schedule', 'Role')
+
+    day_count = (end_date - start_date).days + 1
+    shifts = load_shifts(start_date, end_date, departments)
+    requirements = load_requirements(start_date, end_date, departments)
+
+    # Odjeli -> redni brojevi redova u poljima
+    department_ids = np.unique(np.concatenate([shifts['department'], requirements['department']]))
+    shift_department = np.searchsorted(department_ids, shifts['department'])
+    requirement_department = np.searchsorted(department_ids, requirements['department'])
+    window_department = np.searchsorted(department_ids, requirements['window_department'])
+    department_count = len(department_ids)
+
+    # --- Minute: zauzetost i prozori zahtjeva ---
+    occupancy = minute_profile(shift_department, shifts['start'], shifts['end'], department_count, day_count)
+    required_window = minute_profile(window_department, requirements['window_start'], requirements['window_end'], department_count, day_count) > 0
+    uncovered_minutes = (required_window & (occupancy == 0)).sum(axis=2)
+    peak_staff = occupancy.max(axis=2, initial=0)
+    min_staff = np.where(required_window, occupancy, np.iinfo(np.int32).max).min(axis=2, initial=np.iinfo(np.int32).max)
+    min_staff = np.where(required_window.any(axis=2), min_staff, 0)
+
+    # --- Sati po odjelu i danu: smjena pripada danu u kojem počinje (kao u generatoru) ---
+    in_range = shifts['day'] >= 0
+    durations = (shifts['end'] - shifts['start']) / 60
+    covered = np.zeros((department_count, day_count))
+    np.add.at(covered, (shift_department[in_range], shifts['day'][in_range]), durations[in_range])
+    required = np.zeros((department_count, day_count))
+    np.add.at(required, (requirement_department, requirements['day']), requirements['required_hours'])
+    gap = np.clip(required - covered, 0, None)
+    over = np.clip(covered - required, 0, None)
+
+    # --- Iskorištenost radnika po ISO tjednu ---
+    range_dates = [start_date + timedelta(days=offset) for offset in range(day_count)]
+    week_keys = sorted({custom_date.isocalendar()[:2] for custom_date in range_dates})
+    week_of_day = np.array([week_keys.index(custom_date.isocalendar()[:2]) for custom_date in range_dates], dtype=np.int64)
+    days_in_week = np.bincount(week_of_day, minlength=len(week_keys))
+    employee_ids, shift_employee = np.unique(shifts['employee'][in_range], return_inverse=True)
+    weekly = np.zeros((len(employee_ids), len(week_keys)))
+    np.add.at(weekly, (shift_employee, week_of_day[shifts['day'][in_range]]), durations[in_range])
+
+    # --- Zastupljenost uloga po odjelu (sati) ---
+    role_ids, shift_role = np.unique(shifts['role'][in_range], return_inverse=True)
+    role_hours = np.zeros((department_count, len(role_ids)))
+    np.add.at(role_hours, (shift_department[in_range], shift_role), durations[in_range])
+    department_hours = role_hours.sum(axis=1, keepdims=True)
+    role_share = np.divide(role_hours, department_hours, out=np.zeros_like(role_hours), where=department_hours > 0)
+
+    # Imena tek na kraju, jednim upitom po modelu
+    department_names = dict(Department.objects.filter(id__in=department_ids.tolist()).values_list('id', 'name'))
+    role_names = dict(Role.objects.filter(id__in=role_ids.tolist()).values_list('id', 'name'))
+    employees = {
+        employee_id: (f"{first_name} {last_name} ({username})", max_weekly_hours)
+        for employee_id, first_name, last_name, username, max_weekly_hours in Employee.objects.filter(id__in=employee_ids.tolist()).values_list(
+            'id', 'user__first_name', 'user__last_name', 'user__username', 'max_weekly_hours',
+        )
+    }
+    max_weekly = np.array([employees[employee_id][1] for employee_id in employee_ids.tolist()], dtype=np.float64).reshape(-1, 1)
+    utilization = np.divide(weekly, max_weekly, out=np.zeros_like(weekly), where=max_weekly > 0)
+
+    required_total, covered_total = float(required.sum()), float(np.minimum(covered, required).sum())
+    report = {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'totals': {
+            'required_hours': round(required_total, 2),
+            'covered_hours': round(covered_total, 2),
+            'gap_hours': round(float(gap.sum()), 2),
+            'over_hours': round(float(over.sum()), 2),
+            'uncovered_minutes': int(uncovered_minutes.sum()),
+            'coverage': round(covered_total / required_total, 4) if required_total else 1.0,
+        },
+        'days': [],
+        'employees': [],
+        'role_mix': [],
+    }
+
+    for row, department_id in enumerate(department_ids.tolist()):
+        for day in range(day_count):
+            if not required[row, day] and not covered[row, day]:
+                continue
+            report['days'].append({
+                'department_id': department_id,
+                'department': department_names.get(department_id, ''),
+                'date': range_dates[day].isoformat(),
+                'required_hours': round(float(required[row, day]), 2),
+                'covered_hours': round(float(covered[row, day]), 2),
+                'gap_hours': round(float(gap[row, day]), 2),
+                'over_hours': round(float(over[row, day]), 2),
+                'uncovered_minutes': int(uncovered_minutes[row, day]),
+                'min_staff': int(min_staff[row, day]),
+                'peak_staff': int(peak_staff[row, day]),
+            })
+
+    for row, employee_id in enumerate(employee_ids.tolist()):
+        for week, (iso_year, iso_week) in enumerate(week_keys):
+            if not weekly[row, week]:
+                continue
+            report['employees'].append({
+                'employee_id': employee_id,
+                'employee': employees[employee_id][0],
+                'week': f"{iso_year}-W{iso_week:02d}",
+                'partial_week': bool(days_in_week[week] < 7),
+                'hours': round(float(weekly[row, week]), 2),
+                'max_weekly_hours': employees[employee_id][1],
+                'utilization': round(float(utilization[row, week]), 4),
+            })
+
+    for row, department_id in enumerate(department_ids.tolist()):
+        for column, role_id in enumerate(role_ids.tolist()):
+            if not role_hours[row, column]:
+                continue
+            report['role_mix'].append({
+                'department_id': department_id,
+                'department': department_names.get(department_id, ''),
+                'role_id': role_id,
+                'role': role_names.get(role_id, ''),
+                'hours': round(float(role_hours[row, column]), 2),
+                'share': round(float(role_share[row, column]), 4),
+            })
+    return report
@@ -0,0 +1,274 @@
+import csv
+import hashlib
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .signals import get_schedule_version
+
+# === EXPORT SMJENA ===
+# Redovi se čitaju iteratorom u blokovima (select_related, bez N+1 upita),
+# pa memorija ostaje konstantna i za godinu dana smjena.
+#
+# Teške biblioteke (openpyxl, reportlab) uvoze se tek unutar backend funkcije, a admin
+# backend dohvaća preko EXPORTERS registra; start Django procesa ih nikad ne učitava.
+
+EXPORTERS = {
+    'csv': 'schedule.exports.csv_response',
+    'excel': 'schedule.exports.excel_response',
+    'pdf': 'schedule.exports.pdf_response',
+}
+
+EXPORT_COLUMNS = ['Employee', 'Department', 'Role', 'Date', 'Start Time', 'End Time', 'Total Hours']
+EXPORT_CHUNK_SIZE = 2000
+# Do ove veličine (bajtova) datoteka ostaje u memoriji, iznad se prelijeva na disk
+EXPORT_SPOOL_SIZE = 10 * 1024 * 1024
+
+def get_exporter(name):
+    if name not in EXPORTERS:
+        raise ValueError(f"Unknown exporter '{name}', available: {', '.join(EXPORTERS)}")
+    return import_string(EXPORTERS[name])
+
+def export_response(name, queryset):
+    return get_exporter(name)(queryset)
+
+def export_queryset(queryset):
+    return (
+        queryset.distinct()
+        .select_related('employee__user', 'department', 'role')
+        .order_by('date', 'start_time', 'id')
+    )
+
+def shift_total_hours(shift):
+    start_dt = datetime.combine(shift.date, shift.start_time)
+    end_dt = datetime.combine(shift.date, shift.end_time)
+
+    # Ako se smjena proteže preko ponoći, dodaj jedan dan na end_dt
+    if end_dt <= start_dt:
+        end_dt += timedelta(days=1)
+    return round((end_dt - start_dt).total_seconds() / 3600, 2)
+
+def employee_full_name(employee):
+    return f"{employee.user.first_name} {employee.user.last_name} ({employee.user.username})"
+
+def shift_row(shift):
+    return [
+        employee_full_name(shift.employee),
+        shift.department.name,
+        shift.role.name,
+        shift.date,
+        shift.start_time.strftime('%H:%M'),
+        shift.end_time.strftime('%H:%M'),
+        shift_total_hours(shift),
+    ]
+
+def iter_shifts(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    return export_queryset(queryset).iterator(chunk_size=chunk_size)
+
+# === CSV ===
+
+class Echo:
+    # csv.writer piše u "datoteku" koja samo vraća redak, pa ga možemo odmah poslati
+    def write(self, value):
+        return value
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for shift in iter_shifts(queryset, chunk_size):
+        yield writer.writerow(shift_row(shift))
+
+def csv_response(queryset, filename='schedule.csv'):
+    response = StreamingHttpResponse(iter_csv(queryset), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# === EXCEL ===
+# openpyxl write-only: svaki sheet se odmah zapisuje u privremenu datoteku, pa se
+# u memoriji ne drži ni lista redova ni cijela radna knjiga.
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def sheet_title(name, used_titles):
+    # Excel: najviše 31 znak, bez []:*?/\ i bez duplikata
+    base = re.sub(r'[\[\]:*?/\\]', '-', name)[:31] or 'Sheet'
+    title, number = base, 1
+    while title.lower() in used_titles:
+        number += 1
+        suffix = f" ({number})"
+        title = base[:31 - len(suffix)] + suffix
+    used_titles.add(title.lower())
+    return title
+
+def write_excel(queryset, output, chunk_size=EXPORT_CHUNK_SIZE):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used_titles = set()
+    all_shifts = workbook.create_sheet(sheet_title('Schedule', used_titles))
+    all_shifts.append(EXPORT_COLUMNS)
+    department_sheets = {}
+    weekly_hours = {}
+
+    for shift in iter_shifts(queryset, chunk_size):
+        row = shift_row(shift)
+        all_shifts.append(row)
+
+        sheet = department_sheets.get(shift.department_id)
+        if sheet is None:
+            sheet = department_sheets[shift.department_id] = workbook.create_sheet(sheet_title(shift.department.name, used_titles))
+            sheet.append(EXPORT_COLUMNS)
+        sheet.append(row)
+
+        # Pivot: sati po radniku i ISO tjednu
+        iso_year, iso_week, _ = shift.date.isocalendar()
+        employee_weeks = weekly_hours.setdefault(row[0], {})
+        week = f"{iso_year}-W{iso_week:02d}"
+        employee_weeks[week] = employee_weeks.get(week, 0) + row[-1]
+
+    weeks = sorted({week for employee_weeks in weekly_hours.values() for week in employee_weeks})
+    pivot = workbook.create_sheet(sheet_title('Weekly Hours', used_titles))
+    pivot.append(['Employee'] + weeks + ['Total'])
+    for employee in sorted(weekly_hours):
+        employee_weeks = weekly_hours[employee]
+        hours = [round(employee_weeks.get(week, 0), 2) for week in weeks]
+        pivot.append([employee] + hours + [round(sum(hours), 2)])
+
+    workbook.save(output)
+
+def excel_response(queryset, filename='schedule.xlsx'):
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    write_excel(queryset, spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=EXCEL_CONTENT_TYPE)
+
+# === PDF RASPORED ===
+# Tjedna mreža (radnici × dani) po odjelu. Smjene se čitaju sortirane po odjelu i datumu,
+# pa se u memoriji drži samo jedan odjel-tjedan, a reportlab dobiva tablice jednu po jednu.
+
+PDF_DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+PDF_FLOWABLE_BUFFER = 8
+
+class FlowableStream(list):
+    # reportlab build() troši listu s početka (len, [0], del [0]) i vraća podijeljene
+    # tablice na početak; lista se dopunjava iz generatora tek kad se isprazni
+    def __init__(self, flowables, buffer=PDF_FLOWABLE_BUFFER):
+        super().__init__()
+        self.source = iter(flowables)
+        self.buffer = buffer
+
+    def fill(self):
+        while super().__len__() < self.buffer:
+            flowable = next(self.source, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+
+    def __len__(self):
+        self.fill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self.fill()
+        return super().__getitem__(index)
+
+def iter_department_weeks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    shifts = (
+        queryset.distinct()
+        .select_related('employee__user', 'department', 'role')
+        .order_by('department__name', 'department_id', 'date', 'start_time', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    current, employees = None, {}
+    for shift in shifts:
+        week_start = shift.date - timedelta(days=shift.date.weekday())
+        key = (shift.department_id, week_start)
+        if key != current:
+            if current is not None:
+                yield department_name, current[1], employees
+            current, department_name, employees = key, shift.department.name, {}
+
+        row = employees.get(shift.employee_id)
+        if row is None:
+            row = employees[shift.employee_id] = {
+                'name': employee_full_name(shift.employee),
+                'roles': set(),
+                'days': [[] for _ in PDF_DAY_NAMES],
+                'hours': 0,
+            }
+        row['roles'].add(shift.role.name)
+        row['days'][shift.date.weekday()].append(f"{shift.start_time:%H:%M}-{shift.end_time:%H:%M}")
+        row['hours'] += shift_total_hours(shift)
+
+    if current is not None:
+        yield department_name, current[1], employees
+
+def iter_roster_flowables(queryset, styles, chunk_size=EXPORT_CHUNK_SIZE):
+    from reportlab.lib import colors
+    from reportlab.platypus import CondPageBreak, Paragraph, Spacer, Table, TableStyle
+
+    table_style = TableStyle([
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 8),
+        ('FONT', (0, 1), (-1, -1), 'Helvetica', 7),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+    ])
+    column_widths = [150, 90] + [66] * len(PDF_DAY_NAMES) + [40]
+
+    yield Paragraph("Generated Schedule", styles['Title'])
+    for department_name, week_start, employees in iter_department_weeks(queryset, chunk_size):
+        iso_year, iso_week, _ = week_start.isocalendar()
+        header = ['Employee', 'Role'] + [
+            f"{day} {(week_start + timedelta(days=offset)):%d.%m.}" for offset, day in enumerate(PDF_DAY_NAMES)
+        ] + ['Hours']
+        data = [header] + [
+            [row['name'], ", ".join(sorted(row['roles']))] + ["\n".join(cell) for cell in row['days']] + [round(row['hours'], 2)]
+            for row in sorted(employees.values(), key=lambda row: row['name'])
+        ]
+
+        # Naslov ne smije ostati sam na dnu stranice
+        yield CondPageBreak(80)
+        yield Paragraph(f"{department_name} — {iso_year}-W{iso_week:02d}", styles['Heading2'])
+        yield Table(data, colWidths=column_widths, repeatRows=1, style=table_style)
+        yield Spacer(0, 12)
+
+def write_pdf(queryset, output, chunk_size=EXPORT_CHUNK_SIZE):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate
+
+    document = SimpleDocTemplate(
+        output, pagesize=landscape(A4), title="Generated Schedule",
+        leftMargin=30, rightMargin=30, topMargin=30, bottomMargin=30,
+    )
+    document.build(FlowableStream(iter_roster_flowables(queryset, getSampleStyleSheet(), chunk_size)))
+
+def pdf_cache_key(queryset):
+    # Isti upit nad istom verzijom rasporeda uvijek daje isti PDF
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha256(repr((sql, params)).encode()).hexdigest()
+    return f"schedule:pdf:{get_schedule_version()}:{digest}"
+
+def pdf_response(queryset, filename='schedule.pdf'):
+    cache_key = pdf_cache_key(queryset)
+    content = cache.get(cache_key)
+    if content is not None:
+        response = HttpResponse(content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    write_pdf(queryset, spool)
+    if spool.tell() <= settings.SCHEDULE_PDF_CACHE_MAX_SIZE:
+        spool.seek(0)
+        cache.set(cache_key, spool.read(), settings.SCHEDULE_PDF_CACHE_TIMEOUT)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type='application/pdf')
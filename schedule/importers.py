@@ -0,0 +1,281 @@
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .signals import schedule_changed
+
+# === UVOZ PODATAKA ===
+# Radnici i zahtjevi smjena uvoze se iz CSV ili XLSX datoteke. Redovi se čitaju jedan po
+# jedan, nazivi (odjeli, uloge, dani, tipovi smjena) se razrješavaju iz tablica učitanih
+# jednom na početku, a upis ide bulk_create-om po batchu, uključujući M2M retke.
+#
+# Cijeli uvoz je jedna transakcija: dry-run ili bilo koja greška je poništava, pa se
+# izvještaj o valjanosti dobije nad pravom bazom bez ikakve promjene.
+
+IMPORT_BATCH_SIZE = 500
+LIST_SEPARATOR = ';'
+XLSX_SUFFIXES = {'.xlsx', '.xlsm'}
+
+# === ČITANJE DATOTEKE ===
+
+def read_rows(file, filename):
+    # (broj retka u datoteci, {stupac: vrijednost}); zaglavlje je redak 1
+    if Path(filename).suffix.lower() in XLSX_SUFFIXES:
+        return read_xlsx_rows(file)
+    return read_csv_rows(file)
+
+def normalize_header(header):
+    return [str(column or '').strip().lower() for column in header]
+
+def read_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='') if not isinstance(file, io.TextIOBase) else file
+    reader = csv.reader(text)
+    header = normalize_header(next(reader, []))
+    for row_number, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield row_number, dict(zip(header, values))
+
+def read_xlsx_rows(file):
+    from openpyxl import load_workbook
+
+    # read_only: redovi se čitaju iz ZIP-a po potrebi, radna knjiga nije cijela u memoriji
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = normalize_header(next(rows, ()))
+        for row_number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+# === VRIJEDNOSTI ===
+
+def text_value(row, column, required=False):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"'{column}' is required")
+    return value
+
+def int_value(row, column, default=None):
+    value = row.get(column)
+    if value is None or str(value).strip() == '':
+        if default is None:
+            raise ValueError(f"'{column}' is required")
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{column}' must be a whole number, got '{value}'")
+    if not number.is_integer():
+        raise ValueError(f"'{column}' must be a whole number, got '{value}'")
+    return int(number)
+
+def date_value(row, column):
+    value = row.get(column)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(text_value(row, column, required=True))
+    except ValueError as error:
+        raise ValueError(f"'{column}' must be a date (YYYY-MM-DD): {error}")
+
+def names_value(row, column):
+    return [name.strip() for name in text_value(row, column).split(LIST_SEPARATOR) if name.strip()]
+
+def resolve_names(row, column, lookup, label, required=False):
+    names = names_value(row, column)
+    if required and not names:
+        raise ValueError(f"'{column}' needs at least one {label}")
+    unknown = [name for name in names if name.lower() not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+    return list(dict.fromkeys(lookup[name.lower()] for name in names))
+
+# === TABLICE NAZIVA ===
+
+def load_lookups():
+    # Nazivi -> ID, jedan upit po modelu za cijeli uvoz
+    Department = apps.get_model('schedule', 'Department')
+    Role = apps.get_model('schedule', 'Role')
+    Day = apps.get_model('schedule', 'Day')
+    ShiftType = apps.get_model('schedule', 'ShiftType')
+    departments = list(Department.objects.values_list('id', 'name'))
+    roles = list(Role.objects.values_list('id', 'name', 'department_id'))
+    return {
+        'departments': {name.lower(): pk for pk, name in departments},
+        'department_names': dict(departments),
+        'roles': {name.lower(): pk for pk, name, _ in roles},
+        'role_names': {pk: name for pk, name, _ in roles},
+        'role_departments': {pk: department_id for pk, _, department_id in roles},
+        'days': {name.lower(): pk for pk, name in Day.objects.values_list('id', 'name')},
+        'shift_types': {name.lower(): pk for pk, name in ShiftType.objects.values_list('id', 'name')},
+    }
+
+def check_role_departments(role_ids, department_ids, lookups):
+    # Uloga pripada jednom odjelu; radnik/zahtjev mora biti u tom odjelu
+    for role_id in role_ids:
+        department_id = lookups['role_departments'][role_id]
+        if department_id not in department_ids:
+            raise ValueError(f"Role '{lookups['role_names'][role_id]}' belongs to department '{lookups['department_names'][department_id]}'")
+
+def link_rows(relation, owner_field, target_field, links, batch_size):
+    through = relation.through
+    through.objects.bulk_create([through(**{owner_field: owner_id, target_field: target_id}) for owner_id, target_id in links], batch_size=batch_size)
+
+# === RADNICI ===
+# username, first_name, last_name, email, max_weekly_hours, max_daily_hours, priority,
+# departments, roles, available_days, can_work_shifts (više naziva odvojeno s ';')
+
+EMPLOYEE_COLUMNS = [
+    'username', 'first_name', 'last_name', 'email', 'max_weekly_hours', 'max_daily_hours', 'priority',
+    'departments', 'roles', 'available_days', 'can_work_shifts',
+]
+
+def parse_employee_row(row, lookups, seen):
+    username = text_value(row, 'username', required=True)
+    if username.lower() in seen:
+        raise ValueError(f"Duplicate username '{username}' in file")
+    seen.add(username.lower())
+
+    departments = resolve_names(row, 'departments', lookups['departments'], 'department', required=True)
+    roles = resolve_names(row, 'roles', lookups['roles'], 'role', required=True)
+    check_role_departments(roles, departments, lookups)
+    return {
+        'username': username,
+        'first_name': text_value(row, 'first_name'),
+        'last_name': text_value(row, 'last_name'),
+        'email': text_value(row, 'email'),
+        'max_weekly_hours': int_value(row, 'max_weekly_hours'),
+        'max_daily_hours': int_value(row, 'max_daily_hours'),
+        'priority': int_value(row, 'priority', default=1),
+        'departments': departments,
+        'roles': roles,
+        'available_days': resolve_names(row, 'available_days', lookups['days'], 'day'),
+        'can_work_shifts': resolve_names(row, 'can_work_shifts', lookups['shift_types'], 'shift type'),
+    }
+
+def existing_employee_rows(batch):
+    existing = set(User.objects.filter(username__in=[record['username'] for _, record in batch]).values_list('username', flat=True))
+    return [(row_number, f"User '{record['username']}' already exists") for row_number, record in batch if record['username'] in existing]
+
+def write_employees(batch, batch_size):
+    Employee = apps.get_model('schedule', 'Employee')
+    users = []
+    for record in batch:
+        user = User(username=record['username'], first_name=record['first_name'], last_name=record['last_name'], email=record['email'])
+        user.set_unusable_password()
+        users.append(user)
+    User.objects.bulk_create(users, batch_size=batch_size)
+
+    employees = Employee.objects.bulk_create(
+        [
+            Employee(user=user, max_weekly_hours=record['max_weekly_hours'], max_daily_hours=record['max_daily_hours'], priority=record['priority'])
+            for user, record in zip(users, batch)
+        ],
+        batch_size=batch_size,
+    )
+    for field, target_field in (('departments', 'department_id'), ('roles', 'role_id'), ('available_days', 'day_id'), ('can_work_shifts', 'shifttype_id')):
+        links = [(employee.pk, target_id) for employee, record in zip(employees, batch) for target_id in record[field]]
+        link_rows(getattr(Employee, field), 'employee_id', target_field, links, batch_size)
+
+# === ZAHTJEVI SMJENA ===
+# department, date, required_hours, shift_types, required_roles (više naziva odvojeno s ';')
+
+REQUIREMENT_COLUMNS = ['department', 'date', 'required_hours', 'shift_types', 'required_roles']
+
+def parse_requirement_row(row, lookups, seen):
+    department_id = resolve_names(row, 'department', lookups['departments'], 'department', required=True)
+    if len(department_id) != 1:
+        raise ValueError("'department' takes exactly one department")
+    roles = resolve_names(row, 'required_roles', lookups['roles'], 'role', required=True)
+    check_role_departments(roles, department_id, lookups)
+    return {
+        'department_id': department_id[0],
+        'date': date_value(row, 'date'),
+        'required_hours': int_value(row, 'required_hours'),
+        'shift_types': resolve_names(row, 'shift_types', lookups['shift_types'], 'shift type', required=True),
+        'required_roles': roles,
+    }
+
+def write_requirements(batch, batch_size):
+    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+    requirements = ShiftRequirement.objects.bulk_create(
+        [ShiftRequirement(department_id=record['department_id'], date=record['date'], required_hours=record['required_hours']) for record in batch],
+        batch_size=batch_size,
+    )
+    for field, target_field in (('shift_types', 'shifttype_id'), ('required_roles', 'role_id')):
+        links = [(requirement.pk, target_id) for requirement, record in zip(requirements, batch) for target_id in record[field]]
+        link_rows(getattr(ShiftRequirement, field), 'shiftrequirement_id', target_field, links, batch_size)
+
+# === UVOZ ===
+
+IMPORTERS = {
+    'employees': {'columns': EMPLOYEE_COLUMNS, 'parse': parse_employee_row, 'check': existing_employee_rows, 'write': write_employees},
+    'requirements': {'columns': REQUIREMENT_COLUMNS, 'parse': parse_requirement_row, 'check': None, 'write': write_requirements},
+}
+
+def get_importer(kind):
+    if kind not in IMPORTERS:
+        raise ValueError(f"Unknown import '{kind}', available: {', '.join(IMPORTERS)}")
+    return IMPORTERS[kind]
+
+def import_rows(kind, rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    importer = get_importer(kind)
+    report = {'kind': kind, 'rows': 0, 'valid': 0, 'created': 0, 'errors': [], 'dry_run': dry_run, 'committed': False}
+    lookups = load_lookups()
+    seen = set()
+    rows = iter(rows)
+
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+
+            batch = []
+            for row_number, row in chunk:
+                report['rows'] += 1
+                try:
+                    batch.append((row_number, importer['parse'](row, lookups, seen)))
+                except ValueError as error:
+                    report['errors'].append((row_number, str(error)))
+
+            if importer['check'] is not None and batch:
+                conflicts = importer['check'](batch)
+                report['errors'].extend(conflicts)
+                conflict_rows = {row_number for row_number, _ in conflicts}
+                batch = [(row_number, record) for row_number, record in batch if row_number not in conflict_rows]
+
+            # Nakon prve greške se samo validira; upis bi ionako bio poništen
+            if batch and not report['errors']:
+                importer['write']([record for _, record in batch], batch_size)
+            report['valid'] += len(batch)
+
+        report['errors'].sort()
+        if dry_run or report['errors']:
+            transaction.set_rollback(True)
+        else:
+            report['committed'] = True
+            report['created'] = report['valid']
+            # bulk_create ne šalje post_save; roster i PDF cache moraju vidjeti nove podatke
+            transaction.on_commit(lambda: schedule_changed.send(sender=import_rows))
+    return report
+
+def import_file(kind, file, filename=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    filename = filename or getattr(file, 'name', '') or ''
+    try:
+        rows = read_rows(file, filename)
+        return import_rows(kind, rows, dry_run=dry_run, batch_size=batch_size)
+    except (csv.Error, UnicodeDecodeError, zipfile.BadZipFile) as error:
+        raise ValueError(f"Could not read '{filename}': {error}")
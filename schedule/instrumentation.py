@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from time import perf_counter
+import logging
+
+from django.db import connection
+
+logger = logging.getLogger('schedule.generator')
+
+# === STATISTIKA GENERIRANJA ===
+# Vrijeme i broj SQL upita po fazi (load, eligibility, assignment, improve, persist), brojači
+# iz samog solvera i ocjena rasporeda (schedule.scoring) prije i poslije poboljšanja. Objekt nema veza na bazu, pa se može slati u procese i spajati.
+
+COUNTERS = ('candidates_scanned', 'overlaps_rejected', 'shifts_created')
+
+class GenerationStats:
+    def __init__(self):
+        self.timings = {}
+        self.queries = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.scores = {}
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    @contextmanager
+    def phase(self, name):
+        query_count = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        started = perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                yield
+        finally:
+            elapsed = perf_counter() - started
+            self.timings[name] = self.timings.get(name, 0) + elapsed
+            self.queries[name] = self.queries.get(name, 0) + query_count
+            logger.debug("⏱️ Faza %s: %.3fs, %d upita", name, elapsed, query_count)
+
+    def as_dict(self):
+        return {
+            'timings': {name: round(seconds, 4) for name, seconds in self.timings.items()},
+            'queries': dict(self.queries),
+            'counters': dict(self.counters),
+            'scores': dict(self.scores),
+        }
+
+    def log_summary(self):
+        logger.info(
+            "📊 Generiranje: %s | upiti: %s | %s | ocjena: %s",
+            ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.timings.items()),
+            sum(self.queries.values()),
+            ", ".join(f"{name}={value}" for name, value in self.counters.items()),
+            ", ".join(f"{name} {score['total']}" for name, score in self.scores.items()) or "-",
+        )
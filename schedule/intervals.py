@@ -0,0 +1,86 @@
+from bisect import bisect_left, bisect_right
+
+MINUTES_PER_DAY = 24 * 60
+
+# === INTERVALI SMJENA ===
+# Smjena se pretvara u [početak, kraj) u minutama na apsolutnoj vremenskoj osi,
+# pa se preklapanja vide i između susjednih dana (npr. 20-08 pa 06-14 sutradan).
+
+def shift_interval(custom_date, start_time, end_time):
+    day_start = custom_date.toordinal() * MINUTES_PER_DAY
+    start = day_start + start_time.hour * 60 + start_time.minute
+    end = day_start + end_time.hour * 60 + end_time.minute
+
+    # Ako se smjena proteže preko ponoći, kraj je sutradan (kao ShiftAdmin.calculate_total_hours)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+class EmployeeIntervals:
+    __slots__ = ('starts', 'ends')
+
+    # Intervali se ne preklapaju, pa su i početci i krajevi sortirani istim redom
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def overlaps(self, start, end):
+        position = bisect_left(self.starts, end)
+        # Jedini kandidat za preklapanje je zadnji interval koji počinje prije našeg kraja
+        return position > 0 and self.ends[position - 1] > start
+
+    def contains(self, start, end):
+        position = bisect_left(self.starts, start)
+        return position < len(self.starts) and self.starts[position] == start and self.ends[position] == end
+
+    def add(self, start, end):
+        position = bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+
+class ShiftIntervalIndex:
+    def __init__(self):
+        self.by_employee = {}
+
+    def overlaps(self, employee_id, custom_date, start_time, end_time):
+        intervals = self.by_employee.get(employee_id)
+        return intervals is not None and intervals.overlaps(*shift_interval(custom_date, start_time, end_time))
+
+    def contains(self, employee_id, custom_date, start_time, end_time):
+        intervals = self.by_employee.get(employee_id)
+        return intervals is not None and intervals.contains(*shift_interval(custom_date, start_time, end_time))
+
+    def add(self, employee_id, custom_date, start_time, end_time):
+        intervals = self.by_employee.get(employee_id)
+        if intervals is None:
+            intervals = self.by_employee[employee_id] = EmployeeIntervals()
+        intervals.add(*shift_interval(custom_date, start_time, end_time))
+
+# === RASPONI DATUMA ===
+# Odsustva (TimeOff) kao rasponi datuma s bitom radnika. Maska se računa unaprijed za
+# svaku točku promjene, pa je upit za bilo koji datum jedan bisect: O(log n).
+
+class DateRangeIndex:
+    __slots__ = ('points', 'masks')
+
+    def __init__(self, ranges=()):
+        changes = {}
+        for start_date, end_date, bit in ranges:
+            changes.setdefault(start_date.toordinal(), []).append((bit, 1))
+            changes.setdefault(end_date.toordinal() + 1, []).append((bit, -1))
+
+        self.points = []
+        self.masks = []
+        counts = {}  # rasponi istog radnika se smiju preklapati
+        mask = 0
+        for point in sorted(changes):
+            for bit, delta in changes[point]:
+                counts[bit] = counts.get(bit, 0) + delta
+            for bit, _ in changes[point]:
+                mask = mask | bit if counts[bit] > 0 else mask & ~bit
+            self.points.append(point)
+            self.masks.append(mask)
+
+    def mask(self, custom_date):
+        position = bisect_right(self.points, custom_date.toordinal())
+        return self.masks[position - 1] if position else 0
@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.timezone import now
+
+from .instrumentation import GenerationStats
+from .models import Employee, GenerationJob
+from .scoring import DEFAULT_IMPROVE_ITERATIONS
+from .utils import generate_schedule_for_dates, DEFAULT_SOLVER
+
+# === LOKALNI WORKER ===
+# Poslovi se izvršavaju u thread poolu unutar istog procesa, bez vanjskog brokera.
+# Stanje i napredak su u bazi (GenerationJob), pa ih status endpoint čita bilo gdje.
+#
+# Dva generiranja istih datuma dodijelila bi iste radnike dvaput ako im odjeli dijele
+# radnike, pa se odbija posao čiji se datumi preklapaju s aktivnim poslom iste komponente
+# (odjeli povezani zajedničkim radnicima, kao SchedulingSnapshot.partition). Poslovi
+# odjela bez zajedničkih radnika rade istodobno.
+
+# Posao koji ne završi u ovom roku smatra se mrtvim (npr. proces je ugašen usred rada)
+JOB_STALE_AFTER = timedelta(hours=2)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SCHEDULE_JOB_WORKERS', 2),
+                thread_name_prefix='schedule-job',
+            )
+        return _executor
+
+def connected_departments(department_ids):
+    # Odjeli do kojih se iz zadanih može doći preko radnika s više odjela (union-find)
+    parent = {}
+
+    def find(department_id):
+        parent.setdefault(department_id, department_id)
+        while parent[department_id] != department_id:
+            parent[department_id] = parent[parent[department_id]]
+            department_id = parent[department_id]
+        return department_id
+
+    by_employee = {}
+    for employee_id, department_id in Employee.departments.through.objects.values_list('employee_id', 'department_id'):
+        by_employee.setdefault(employee_id, []).append(department_id)
+    for first, *others in by_employee.values():
+        for department_id in others:
+            parent[find(department_id)] = find(first)
+
+    roots = {find(department_id) for department_id in department_ids}
+    return {department_id for department_id in parent if find(department_id) in roots}
+
+def conflicting_job(dates, departments=None, lock=False):
+    requested = {custom_date.isoformat() for custom_date in dates}
+    active = GenerationJob.objects.filter(status__in=('pending', 'running'), created_at__gte=now() - JOB_STALE_AFTER)
+    if lock:
+        active = active.select_for_update()
+    overlapping = [job for job in active.prefetch_related('departments').order_by('created_at') if requested.intersection(job.dates)]
+    if not overlapping:
+        return None
+
+    # Posao bez odjela (svi odjeli) sukobljava se sa svakim
+    component = connected_departments(departments) if departments else None
+    for job in overlapping:
+        job_departments = {department.pk for department in job.departments.all()}
+        if component is None or not job_departments or component & job_departments:
+            return job
+    return None
+
+def submit_generation_job(dates, departments=None, solver=DEFAULT_SOLVER, seed=None, improve_iterations=DEFAULT_IMPROVE_ITERATIONS):
+    dates = list(dates)
+    with transaction.atomic():
+        conflict = conflicting_job(dates, departments, lock=True)
+        if conflict is not None:
+            raise ValueError(f"Dates overlap generation job #{conflict.pk} ({conflict.status})")
+        job = GenerationJob.objects.create(
+            dates=sorted({custom_date.isoformat() for custom_date in dates}),
+            solver=solver,
+            seed=seed,
+            improve_iterations=improve_iterations,
+        )
+        if departments:
+            job.departments.set(departments)
+
+    # Posao krećemo tek kad je zapis vidljiv drugim konekcijama
+    transaction.on_commit(lambda: get_executor().submit(run_generation_job, job.pk))
+    return job
+
+def run_generation_job(job_id):
+    try:
+        job = GenerationJob.objects.get(pk=job_id)
+        GenerationJob.objects.filter(pk=job_id).update(status='running', started_at=now())
+
+        def report_progress(status):
+            GenerationJob.objects.filter(pk=job_id).update(**status)
+
+        department_ids = list(job.departments.values_list('id', flat=True)) or None
+        stats = GenerationStats()
+        generate_schedule_for_dates(
+            [date.fromisoformat(value) for value in job.dates],
+            departments=department_ids,
+            solver=job.solver,
+            seed=job.seed,
+            progress=report_progress,
+            stats=stats,
+            improve_iterations=job.improve_iterations,
+        )
+        score = stats.scores.get('final')
+        GenerationJob.objects.filter(pk=job_id).update(status='done', score=score['total'] if score else None, finished_at=now())
+    except Exception as error:
+        GenerationJob.objects.filter(pk=job_id).update(status='failed', error=repr(error), finished_at=now())
+    finally:
+        # Svaki thread ima svoju konekciju; zatvaramo je da ne ostane visjeti
+        connections.close_all()
+
+def job_status(job):
+    return {
+        'job_id': job.pk,
+        'status': job.status,
+        'dates': job.dates,
+        'solver': job.solver,
+        'seed': job.seed,
+        'improve_iterations': job.improve_iterations,
+        'requirements_total': job.requirements_total,
+        'requirements_done': job.requirements_done,
+        'hours_required': job.hours_required,
+        'hours_covered': job.hours_covered,
+        'shifts_created': job.shifts_created,
+        'score': job.score,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
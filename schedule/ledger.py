@@ -0,0 +1,97 @@
+from functools import reduce
+from operator import or_
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from .intervals import shift_interval
+
+# === KNJIGA TJEDNIH SATI ===
+# WeeklyHours drži zbroj minuta po radniku i ISO tjednu. Generator ga čita jednim upitom
+# umjesto da zbraja sve smjene tjedna, a svaka promjena smjena ga ažurira razlikom:
+# masovno (replace_shifts) ili kroz signale za pojedinačne izmjene u adminu.
+
+LEDGER_BATCH_SIZE = 500
+
+def shift_minutes(custom_date, start_time, end_time):
+    start, end = shift_interval(custom_date, start_time, end_time)
+    return end - start
+
+def add_minutes(deltas, rows, sign=1):
+    # rows: (employee_id, date, start_time, end_time)
+    for employee_id, custom_date, start_time, end_time in rows:
+        key = (employee_id, *custom_date.isocalendar()[:2])
+        deltas[key] = deltas.get(key, 0) + sign * shift_minutes(custom_date, start_time, end_time)
+    return deltas
+
+def shift_rows(queryset):
+    return queryset.values_list('employee_id', 'date', 'start_time', 'end_time')
+
+def week_filter(weeks):
+    return reduce(or_, (Q(iso_year=iso_year, iso_week=iso_week) for iso_year, iso_week in weeks))
+
+def apply_minute_deltas(deltas):
+    WeeklyHours = apps.get_model('schedule', 'WeeklyHours')
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    # savepoint=False: unutar veće transakcije (generator) ne trebaju dodatni SAVEPOINT upiti
+    with transaction.atomic(savepoint=False):
+        # Trenutno stanje svih pogođenih redaka jednim upitom, zatim jedan upsert po batchu
+        current = {}
+        rows = WeeklyHours.objects.select_for_update().filter(
+            week_filter({key[1:] for key in deltas}),
+            employee_id__in={key[0] for key in deltas},
+        )
+        for employee_id, iso_year, iso_week, minutes in rows.values_list('employee_id', 'iso_year', 'iso_week', 'minutes'):
+            current[(employee_id, iso_year, iso_week)] = minutes
+
+        WeeklyHours.objects.bulk_create(
+            [
+                WeeklyHours(employee_id=employee_id, iso_year=iso_year, iso_week=iso_week, minutes=max(current.get((employee_id, iso_year, iso_week), 0) + delta, 0))
+                for (employee_id, iso_year, iso_week), delta in deltas.items()
+            ],
+            batch_size=LEDGER_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['employee', 'iso_year', 'iso_week'],
+            update_fields=['minutes'],
+        )
+
+def replace_shifts(queryset, new_shifts, batch_size=LEDGER_BATCH_SIZE):
+    # Briše smjene iz queryseta, sprema nove i knjiži razliku; sve u jednoj transakciji
+    Shift = apps.get_model('schedule', 'Shift')
+    with transaction.atomic(savepoint=False):
+        deltas = add_minutes({}, shift_rows(queryset), sign=-1)
+        deleted_count, _ = queryset.delete()
+        Shift.objects.bulk_create(new_shifts, batch_size=batch_size)
+        add_minutes(deltas, ((shift.employee_id, shift.date, shift.start_time, shift.end_time) for shift in new_shifts))
+        apply_minute_deltas(deltas)
+    return deleted_count
+
+def load_weekly_hours(employee_ids, weeks):
+    # {ISO tjedan: {radnik: sati}}
+    WeeklyHours = apps.get_model('schedule', 'WeeklyHours')
+    weekly_hours = {}
+    if not weeks:
+        return weekly_hours
+    rows = WeeklyHours.objects.filter(week_filter(weeks), employee__in=employee_ids)
+    for employee_id, iso_year, iso_week, minutes in rows.values_list('employee_id', 'iso_year', 'iso_week', 'minutes'):
+        weekly_hours.setdefault((iso_year, iso_week), {})[employee_id] = minutes / 60
+    return weekly_hours
+
+def rebuild_weekly_hours():
+    # Puna rekonstrukcija iz smjena (npr. nakon kaskadnog brisanja odjela ili uloge)
+    Shift = apps.get_model('schedule', 'Shift')
+    WeeklyHours = apps.get_model('schedule', 'WeeklyHours')
+    with transaction.atomic():
+        totals = add_minutes({}, shift_rows(Shift.objects.all()).iterator())
+        WeeklyHours.objects.all().delete()
+        WeeklyHours.objects.bulk_create(
+            [
+                WeeklyHours(employee_id=employee_id, iso_year=iso_year, iso_week=iso_week, minutes=minutes)
+                for (employee_id, iso_year, iso_week), minutes in totals.items() if minutes
+            ],
+            batch_size=LEDGER_BATCH_SIZE,
+        )
@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from schedule.benchmarks import run_scenario, scenario_name, load_baseline, save_baseline, find_regressions, explain_hot_queries
+from schedule.scoring import DEFAULT_IMPROVE_ITERATIONS
+from schedule.utils import SOLVERS, DEFAULT_SOLVER
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmark_baseline.json'
+
+class Command(BaseCommand):
+    help = "Benchmark schedule generation and exports on synthetic hospital-scale data (runs in a throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, nargs='+', default=[50, 500], help="Employee counts to benchmark, e.g. 50 500 5000")
+        parser.add_argument('--days', type=int, nargs='+', default=[7], help="Horizon lengths in days, e.g. 1 30 90")
+        parser.add_argument('--solver', choices=list(SOLVERS), nargs='+', default=[DEFAULT_SOLVER])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--shared-staff', type=float, default=0.1, help="Share of staff also working in a second department (0 = fully independent departments)")
+        parser.add_argument('--workers', type=int, default=None, help="Processes for independent department groups (default: SCHEDULE_GENERATION_WORKERS)")
+        parser.add_argument('--improve-iterations', type=int, default=DEFAULT_IMPROVE_ITERATIONS, help="Move attempts for the local-search improver after generation (0 = score only)")
+        parser.add_argument('--no-exports', action='store_true', help="Skip CSV/Excel/PDF export timings")
+        parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory pass")
+        parser.add_argument('--explain', action='store_true', help="Print query plans and timings of the hot generator queries")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON file to compare against")
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown for time and memory")
+
+    def handle(self, *args, **options):
+        baseline = load_baseline(options['baseline'])
+        results, regressions = {}, []
+
+        # Nikad ne diramo pravu bazu: sve ide u testnu bazu koja se na kraju briše
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for solver in options['solver']:
+                for staff in options['staff']:
+                    for days in options['days']:
+                        name = scenario_name(staff, days, solver)
+                        call_command('flush', interactive=False, verbosity=0)
+                        result = run_scenario(
+                            staff, days, solver, options['seed'],
+                            exports=not options['no_exports'], memory=not options['no_memory'],
+                            shared_staff=options['shared_staff'], workers=options['workers'],
+                            improve_iterations=options['improve_iterations'],
+                        )
+                        results[name] = result
+                        regressions.extend(find_regressions(name, result, baseline, options['tolerance']))
+                        self.stdout.write(f"{name}: {json.dumps(result, sort_keys=True)}")
+                        if options['explain']:
+                            for query, details in explain_hot_queries().items():
+                                self.stdout.write(f"  {query} ({details['wall_time']}s):")
+                                for line in details['plan'].splitlines():
+                                    self.stdout.write(f"    {line}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+        elif regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        else:
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schedule.importers import IMPORT_BATCH_SIZE, IMPORTERS, import_file
+
+class Command(BaseCommand):
+    help = "Import employees or shift requirements from a CSV or XLSX file (names separated by ';' in list columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORTERS), help="What the file contains")
+        parser.add_argument('path', help="CSV or XLSX file")
+        parser.add_argument('--dry-run', action='store_true', help="Validate every row and report errors without saving anything")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"File not found: {path}")
+
+        with path.open('rb') as file:
+            try:
+                report = import_file(options['kind'], file, path.name, dry_run=options['dry_run'], batch_size=options['batch_size'])
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        for row_number, message in report['errors']:
+            self.stderr.write(f"Row {row_number}: {message}")
+        summary = f"{report['rows']} rows read, {report['valid']} valid, {len(report['errors'])} errors"
+        if report['errors']:
+            raise CommandError(f"Import aborted, nothing saved: {summary}")
+        if report['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Dry run OK, nothing saved: {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} {options['kind']}: {summary}"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from schedule.ledger import rebuild_weekly_hours
+
+class Command(BaseCommand):
+    help = "Rebuild the WeeklyHours ledger from all existing shifts."
+
+    def handle(self, *args, **options):
+        rebuild_weekly_hours()
+        self.stdout.write(self.style.SUCCESS("Weekly hours ledger rebuilt."))
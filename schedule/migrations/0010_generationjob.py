@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0009_shiftrequirement_required_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dates', models.JSONField(default=list)),
+                ('solver', models.CharField(default='greedy', max_length=20)),
+                ('seed', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('requirements_total', models.PositiveIntegerField(default=0)),
+                ('requirements_done', models.PositiveIntegerField(default=0)),
+                ('hours_required', models.PositiveIntegerField(default=0)),
+                ('hours_covered', models.PositiveIntegerField(default=0)),
+                ('shifts_created', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('departments', models.ManyToManyField(blank=True, to='schedule.department')),
+            ],
+        ),
+    ]
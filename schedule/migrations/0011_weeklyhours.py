@@ -0,0 +1,55 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# Zamrznuta kopija schedule.intervals.shift_interval: migracija ne smije ovisiti o kodu aplikacije
+def shift_interval(custom_date, start_time, end_time):
+    day_start = custom_date.toordinal() * MINUTES_PER_DAY
+    start = day_start + start_time.hour * 60 + start_time.minute
+    end = day_start + end_time.hour * 60 + end_time.minute
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def fill_weekly_hours(apps, schema_editor):
+    Shift = apps.get_model('schedule', 'Shift')
+    WeeklyHours = apps.get_model('schedule', 'WeeklyHours')
+
+    totals = {}
+    for employee_id, custom_date, start_time, end_time in Shift.objects.values_list('employee_id', 'date', 'start_time', 'end_time').iterator():
+        start, end = shift_interval(custom_date, start_time, end_time)
+        key = (employee_id, *custom_date.isocalendar()[:2])
+        totals[key] = totals.get(key, 0) + end - start
+    WeeklyHours.objects.bulk_create(
+        [WeeklyHours(employee_id=employee_id, iso_year=iso_year, iso_week=iso_week, minutes=minutes) for (employee_id, iso_year, iso_week), minutes in totals.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0010_generationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iso_year', models.PositiveIntegerField()),
+                ('iso_week', models.PositiveIntegerField()),
+                ('minutes', models.PositiveIntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule.employee')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'iso_year', 'iso_week'), name='unique_weekly_hours')],
+            },
+        ),
+        migrations.RunPython(fill_weekly_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# Zamrznuta kopija schedule.intervals.shift_interval: migracija ne smije ovisiti o kodu aplikacije
+def shift_interval(custom_date, start_time, end_time):
+    day_start = custom_date.toordinal() * MINUTES_PER_DAY
+    start = day_start + start_time.hour * 60 + start_time.minute
+    end = day_start + end_time.hour * 60 + end_time.minute
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def remove_duplicate_shifts(apps, schema_editor):
+    # Prije unique_shift: zadržava se najstarija kopija, a knjiga sati se umanjuje za obrisane
+    Shift = apps.get_model('schedule', 'Shift')
+    WeeklyHours = apps.get_model('schedule', 'WeeklyHours')
+
+    seen = set()
+    duplicate_ids = []
+    released = {}
+    rows = Shift.objects.order_by('id').values_list('id', 'employee_id', 'department_id', 'date', 'start_time', 'end_time')
+    for shift_id, employee_id, department_id, custom_date, start_time, end_time in rows.iterator():
+        key = (employee_id, department_id, custom_date, start_time, end_time)
+        if key not in seen:
+            seen.add(key)
+            continue
+        duplicate_ids.append(shift_id)
+        start, end = shift_interval(custom_date, start_time, end_time)
+        week = (employee_id, *custom_date.isocalendar()[:2])
+        released[week] = released.get(week, 0) + end - start
+
+    for start in range(0, len(duplicate_ids), 500):
+        Shift.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+    for (employee_id, iso_year, iso_week), minutes in released.items():
+        ledger = WeeklyHours.objects.filter(employee_id=employee_id, iso_year=iso_year, iso_week=iso_week).first()
+        if ledger is not None:
+            ledger.minutes = max(ledger.minutes - minutes, 0)
+            ledger.save(update_fields=['minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0011_weeklyhours'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_shifts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['date', 'department'], name='shift_date_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['employee', 'date'], name='shift_employee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftrequirement',
+            index=models.Index(fields=['date', 'department'], name='requirement_date_dept_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shift',
+            constraint=models.UniqueConstraint(fields=('employee', 'department', 'date', 'start_time', 'end_time'), name='unique_shift'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0012_shift_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringRequirement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('required_hours', models.PositiveIntegerField()),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('days', models.ManyToManyField(to='schedule.day')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule.department')),
+                ('required_roles', models.ManyToManyField(to='schedule.role')),
+                ('shift_types', models.ManyToManyField(to='schedule.shifttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['department', 'valid_from'], name='recurring_dept_valid_idx')],
+            },
+        ),
+    ]
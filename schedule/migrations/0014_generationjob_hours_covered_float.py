@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0013_recurringrequirement'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generationjob',
+            name='hours_covered',
+            field=models.FloatField(default=0),
+        ),
+    ]
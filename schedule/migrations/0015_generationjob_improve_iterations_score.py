@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0014_generationjob_hours_covered_float'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='improve_iterations',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -61,9 +61,35 @@ class ShiftRequirement(models.Model):
     required_hours = models.PositiveIntegerField()  # Ukupno potrebni sati
     required_roles = models.ManyToManyField(Role)  # ➕ Dodajemo ovo polje
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'department'], name='requirement_date_dept_idx'),
+        ]
+
     def __str__(self):
         return f"{self.department.name} - {self.date} (Total: {self.required_hours}h)"
 
+# === RECURRING REQUIREMENT ===
+class RecurringRequirement(models.Model):
+    # Tjedni predložak: generator ga razvija po danima u traženom rasponu, bez spremanja redaka.
+    # Ako za isti odjel i datum postoji ShiftRequirement, vrijedi on umjesto predložaka.
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    days = models.ManyToManyField(Day)  # dani u tjednu na koje predložak vrijedi
+    shift_types = models.ManyToManyField(ShiftType)
+    required_hours = models.PositiveIntegerField()
+    required_roles = models.ManyToManyField(Role)
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)  # prazno = bez kraja
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'valid_from'], name='recurring_dept_valid_idx'),
+        ]
+
+    def __str__(self):
+        period = f"{self.valid_from} - {self.valid_until}" if self.valid_until else f"from {self.valid_from}"
+        return f"{self.department.name} weekly {self.required_hours}h ({period})"
+
 # === SHIFT ===
 class Shift(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
@@ -72,7 +98,26 @@ class Shift(models.Model):
     date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'department'], name='shift_date_dept_idx'),
+            models.Index(fields=['employee', 'date'], name='shift_employee_date_idx'),
+        ]
+        constraints = [
+            # Isti radnik ne može dvaput imati istu smjenu u istom odjelu
+            models.UniqueConstraint(fields=['employee', 'department', 'date', 'start_time', 'end_time'], name='unique_shift'),
+        ]
     
+    # Pojedinačno brisanje ide kroz knjigu sati kao i admin; post_delete namjerno ne slušamo
+    def delete(self, *args, **kwargs):
+        from .ledger import replace_shifts
+        from .signals import schedule_changed
+
+        deleted_count = replace_shifts(Shift.objects.filter(pk=self.pk), [])
+        schedule_changed.send(sender=Shift)
+        return deleted_count, {self._meta.label: deleted_count}
+
     def calculate_total_hours(self):
         total_seconds = (self.end_time.hour * 3600 + self.end_time.minute * 60) - \
                         (self.start_time.hour * 3600 + self.start_time.minute * 60)
@@ -90,3 +135,48 @@ class TimeOff(models.Model):
     
     def __str__(self):
         return f"{self.employee.user.username} - {self.reason} ({self.start_date} to {self.end_date})"
+
+# === GENERATION JOB ===
+class GenerationJob(models.Model):
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+
+    dates = models.JSONField(default=list)  # ISO datumi koje posao generira
+    departments = models.ManyToManyField(Department, blank=True)  # prazno = svi odjeli
+    solver = models.CharField(max_length=20, default='greedy')
+    seed = models.IntegerField(null=True, blank=True)
+    improve_iterations = models.PositiveIntegerField(default=0)  # pokušaji lokalne pretrage nakon generiranja
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    requirements_total = models.PositiveIntegerField(default=0)
+    requirements_done = models.PositiveIntegerField(default=0)
+    hours_required = models.PositiveIntegerField(default=0)
+    hours_covered = models.FloatField(default=0)  # smjene preko ponoći daju sate s decimalama
+    shifts_created = models.PositiveIntegerField(default=0)
+    score = models.FloatField(null=True, blank=True)  # ukupna ocjena gotovog rasporeda (manje je bolje)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        period = f"{self.dates[0]} - {self.dates[-1]}" if self.dates else "-"
+        return f"Job #{self.pk} {period} ({self.status})"
+
+# === WEEKLY HOURS ===
+class WeeklyHours(models.Model):
+    # Knjiga sati: minute svih smjena radnika u ISO tjednu, ažurira se pri svakoj promjeni smjena
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    iso_year = models.PositiveIntegerField()
+    iso_week = models.PositiveIntegerField()
+    minutes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'iso_year', 'iso_week'], name='unique_weekly_hours'),
+        ]
+
+    @property
+    def hours(self):
+        return round(self.minutes / 60, 2)
+
+    def __str__(self):
+        return f"{self.employee} - {self.iso_year}-W{self.iso_week:02d} ({self.hours}h)"
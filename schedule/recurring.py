@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from .signals import schedule_changed
+
+# === PONAVLJAJUĆI ZAHTJEVI ===
+# Predlošci se učitavaju jednom za cijeli raspon (fiksni broj upita, bez obzira na broj
+# dana) i razvijaju u memoriji. Konkretni ShiftRequirement za odjel i datum ima prednost:
+# taj dan se predlošci tog odjela preskaču, pa je "override" običan ShiftRequirement.
+
+MATERIALIZE_BATCH_SIZE = 500
+
+class RecurringTemplate:
+    __slots__ = ('id', 'department_id', 'department_name', 'required_hours', 'valid_from', 'valid_until', 'weekdays', 'shift_type_ids', 'role_ids')
+
+    def __init__(self, id, department_id, department_name, required_hours, valid_from, valid_until):
+        self.id = id
+        self.department_id = department_id
+        self.department_name = department_name
+        self.required_hours = required_hours
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        self.weekdays = set()  # nazivi dana kao u modelu Day ('Monday', ...)
+        self.shift_type_ids = []
+        self.role_ids = set()
+
+    def applies_to(self, custom_date):
+        return self.valid_from <= custom_date and (self.valid_until is None or custom_date <= self.valid_until)
+
+    def __repr__(self):
+        return f"<RecurringTemplate {self.department_name} #{self.id}>"
+
+def template_queryset(start_date, end_date, departments=None):
+    RecurringRequirement = apps.get_model('schedule', 'RecurringRequirement')
+    templates = RecurringRequirement.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=start_date),
+        valid_from__lte=end_date,
+    )
+    if departments is not None:
+        templates = templates.filter(department__in=departments)
+    return templates
+
+def load_templates(start_date, end_date, departments=None, queryset=None):
+    RecurringRequirement = apps.get_model('schedule', 'RecurringRequirement')
+    templates = queryset if queryset is not None else template_queryset(start_date, end_date, departments)
+
+    by_id = {}
+    for values in templates.values_list('id', 'department_id', 'department__name', 'required_hours', 'valid_from', 'valid_until').order_by('id'):
+        by_id[values[0]] = RecurringTemplate(*values)
+    if not by_id:
+        return []
+
+    # M2M veze iz through tablica, jednim upitom po relaciji
+    for template_id, day_name in RecurringRequirement.days.through.objects.filter(recurringrequirement__in=templates).values_list('recurringrequirement_id', 'day__name'):
+        by_id[template_id].weekdays.add(day_name)
+    for template_id, shift_type_id in RecurringRequirement.shift_types.through.objects.filter(recurringrequirement__in=templates).values_list('recurringrequirement_id', 'shifttype_id'):
+        by_id[template_id].shift_type_ids.append(shift_type_id)
+    for template_id, role_id in RecurringRequirement.required_roles.through.objects.filter(recurringrequirement__in=templates).values_list('recurringrequirement_id', 'role_id'):
+        by_id[template_id].role_ids.add(role_id)
+    return list(by_id.values())
+
+def expand_templates(templates, dates, overridden=()):
+    # (predložak, datum) za svaki dan u tjednu predloška; overridden = {(odjel, datum)}
+    by_weekday = {}
+    for template in templates:
+        for weekday in template.weekdays:
+            by_weekday.setdefault(weekday, []).append(template)
+
+    for custom_date in dates:
+        for template in by_weekday.get(custom_date.strftime('%A'), ()):
+            if template.applies_to(custom_date) and (template.department_id, custom_date) not in overridden:
+                yield template, custom_date
+
+def concrete_requirement_keys(dates, departments=None):
+    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+    requirements = ShiftRequirement.objects.filter(date__in=dates)
+    if departments is not None:
+        requirements = requirements.filter(department__in=departments)
+    return set(requirements.values_list('department_id', 'date'))
+
+# === MATERIJALIZACIJA ===
+# Predložak se za raspon pretvara u obične ShiftRequirement retke koje onda možeš
+# pojedinačno mijenjati; dani koji već imaju ShiftRequirement ostaju netaknuti.
+
+def materialize_templates(queryset, start_date, end_date, batch_size=MATERIALIZE_BATCH_SIZE):
+    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    templates = load_templates(start_date, end_date, queryset=template_queryset(start_date, end_date).filter(pk__in=queryset.values('pk')))
+    overridden = concrete_requirement_keys(dates, {template.department_id for template in templates})
+    expanded = list(expand_templates(templates, dates, overridden))
+    if not expanded:
+        return 0
+
+    with transaction.atomic():
+        requirements = ShiftRequirement.objects.bulk_create(
+            [ShiftRequirement(department_id=template.department_id, date=custom_date, required_hours=template.required_hours) for template, custom_date in expanded],
+            batch_size=batch_size,
+        )
+        shift_types = ShiftRequirement.shift_types.through
+        shift_types.objects.bulk_create(
+            [shift_types(shiftrequirement_id=requirement.pk, shifttype_id=shift_type_id) for requirement, (template, _) in zip(requirements, expanded) for shift_type_id in template.shift_type_ids],
+            batch_size=batch_size,
+        )
+        required_roles = ShiftRequirement.required_roles.through
+        required_roles.objects.bulk_create(
+            [required_roles(shiftrequirement_id=requirement.pk, role_id=role_id) for requirement, (template, _) in zip(requirements, expanded) for role_id in sorted(template.role_ids)],
+            batch_size=batch_size,
+        )
+        transaction.on_commit(lambda: schedule_changed.send(sender=ShiftRequirement))
+    return len(requirements)
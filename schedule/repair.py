@@ -0,0 +1,246 @@
+from time import monotonic
+import random
+
+from django.apps import apps
+from django.db import transaction
+
+from .instrumentation import GenerationStats, logger
+from .intervals import ShiftIntervalIndex
+from .ledger import replace_shifts, shift_minutes
+from .signals import schedule_changed
+from .snapshot import RequirementRecord, SchedulingSnapshot
+from .utils import DEFAULT_SOLVER, DEFAULT_TIME_LIMIT, SHIFT_BATCH_SIZE, assign_shifts_for_day, get_solver
+
+# === POPRAVAK RASPOREDA ===
+# Umjesto brisanja cijelog dana, postojeće smjene se provjere nad trenutnim podacima:
+# valjane ostaju (i zauzimaju sate i intervale radnika), a nevaljane se brišu.
+# Solver zatim nadoknađuje samo sate obrisanih smjena, i to radnicima koji taj dan još
+# ne rade. Pokrivenost prije popravka je cilj, pa popravak nepromijenjenog rasporeda
+# ne mijenja ništa (manjak koji je generator ostavio popravak ne pokušava riješiti).
+# Zahtjevi koje je promjena izravno pogodila (targets: izmijenjeni zahtjevi i oni koje su
+# pokrivale smjene obrisane prije popravka, released_shifts) pune se do required_hours.
+
+def repair_schedule(dates, departments=None, solver=DEFAULT_SOLVER, time_limit=DEFAULT_TIME_LIMIT, seed=None, stats=None, targets=(), released_shifts=()):
+    assign = get_solver(solver)
+    stats = stats if stats is not None else GenerationStats()
+    summary = {'kept': 0, 'removed': 0, 'created': 0, 'hours_required': 0, 'hours_covered': 0}
+
+    dates = sorted(set(dates))
+    if not dates:
+        return summary
+
+    logger.info("🔧 === POPRAVAK RASPOREDA: %s - %s (%d dana, solver %s) ===", dates[0], dates[-1], len(dates), solver)
+
+    with stats.phase('load'):
+        snapshot = SchedulingSnapshot.load(dates, departments)
+        existing = load_existing_shifts(dates)
+        # Smjene ovih dana se ponovno knjiže dok se provjeravaju (zadržane i tuđe)
+        snapshot.release_hours((employee_id, custom_date, start_time, end_time) for _, employee_id, _, custom_date, start_time, end_time in existing)
+
+    with stats.phase('eligibility'):
+        snapshot.prepare_eligibility()
+
+    rng = random.Random(seed)
+    deadline = monotonic() + time_limit if time_limit else None
+    employee_hours = snapshot.employee_hours()
+    intervals = ShiftIntervalIndex()
+    removed_ids = []
+    new_shifts = []
+
+    with stats.phase('assignment'):
+        working, covered, freed, summary['kept'] = keep_valid_shifts(snapshot, departments, existing, employee_hours, intervals, removed_ids, stats)
+        targets = set(targets) | released_requirements(snapshot, released_shifts)
+
+        for custom_date, requirements in snapshot.requirements_by_date.items():
+            deficits = deficit_requirements(requirements, covered, freed, working.get(custom_date, set()), targets)
+            summary['hours_required'] += sum(requirement.required_hours for requirement in requirements)
+            summary['hours_covered'] += sum(covered.get(requirement.id, 0) for requirement in requirements)
+            if not deficits:
+                continue
+
+            if deadline is not None and monotonic() >= deadline and assign is not assign_shifts_for_day:
+                logger.warning("⏱️ Isteklo vrijeme za solver '%s', %s popravljam pohlepno.", solver, custom_date)
+                assign = assign_shifts_for_day
+            week_hours = employee_hours.setdefault(custom_date.isocalendar()[:2], {})
+            hours_before = sum(week_hours.values())
+            assign(snapshot, custom_date, deficits, employee_hours, intervals, new_shifts, deadline=deadline, rng=rng, stats=stats)
+            summary['hours_covered'] += round(sum(week_hours.values()) - hours_before, 2)
+
+    summary['removed'] = len(removed_ids)
+    summary['created'] = len(new_shifts)
+
+    with stats.phase('persist'):
+        persist_repair(removed_ids, new_shifts)
+
+    stats.log_summary()
+    logger.info("✅ Popravak gotov: zadržano %d, obrisano %d, novo %d smjena", summary['kept'], summary['removed'], summary['created'])
+    return summary
+
+def load_existing_shifts(dates):
+    Shift = apps.get_model('schedule', 'Shift')
+    # Učitavaju se smjene svih odjela: i one izvan popravka zauzimaju radnikovo vrijeme
+    return list(
+        Shift.objects.filter(date__in=dates)
+        .order_by('date', 'start_time', 'id')
+        .values_list('id', 'employee_id', 'department_id', 'date', 'start_time', 'end_time')
+    )
+
+def requirements_by_key(snapshot):
+    by_key = {}
+    for requirements in snapshot.requirements_by_date.values():
+        for requirement in requirements:
+            by_key.setdefault((requirement.department_id, requirement.date), []).append(requirement)
+    return by_key
+
+def released_requirements(snapshot, released_shifts):
+    # Zahtjevi koje su pokrivale smjene obrisane prije popravka (npr. s uklonjenim radnikom)
+    by_key = requirements_by_key(snapshot)
+    released = set()
+    for department_id, custom_date, start_time, end_time in released_shifts:
+        requirement, _ = covering_requirement(by_key.get((department_id, custom_date), ()), start_time, end_time)
+        if requirement is not None:
+            released.add(requirement.id)
+    return released
+
+def keep_valid_shifts(snapshot, departments, existing, employee_hours, intervals, removed_ids, stats=None):
+    by_key = requirements_by_key(snapshot)
+    candidate_ids = {
+        requirement.id: {employee.id for employee in requirement.candidates}
+        for requirements in snapshot.requirements_by_date.values() for requirement in requirements
+    }
+
+    working = {}  # datum -> radnici koji taj dan već imaju smjenu
+    covered = {}  # zahtjev -> sati pokriveni zadržanim smjenama
+    freed = {}  # zahtjev -> sati obrisanih smjena koje su ga pokrivale
+    kept = 0
+
+    for shift_id, employee_id, department_id, custom_date, start_time, end_time in existing:
+        employee = snapshot.employees_by_id.get(employee_id)
+        week_hours = employee_hours.setdefault(custom_date.isocalendar()[:2], {})
+        day_hours = employee_hours.setdefault(custom_date, {})
+
+        if departments is not None and department_id not in departments:
+            # Smjena drugog odjela se ne dira, ali radniku zauzima vrijeme i sate
+            if employee is not None:
+                duration = shift_minutes(custom_date, start_time, end_time) / 60
+                intervals.add(employee_id, custom_date, start_time, end_time)
+                week_hours[employee_id] = week_hours.get(employee_id, 0) + duration
+                day_hours[employee_id] = day_hours.get(employee_id, 0) + duration
+                working.setdefault(custom_date, set()).add(employee_id)
+            continue
+
+        requirement, duration = matching_requirement(
+            employee, by_key.get((department_id, custom_date), ()), candidate_ids,
+            covered, working.get(custom_date, ()), week_hours, day_hours, intervals, custom_date, start_time, end_time,
+        )
+        if requirement is None:
+            logger.debug("🗑️ Smjena #%s (%s %s - %s) više nije valjana", shift_id, custom_date, start_time, end_time)
+            removed_ids.append(shift_id)
+            freed_requirement, freed_hours = covering_requirement(by_key.get((department_id, custom_date), ()), start_time, end_time)
+            if freed_requirement is not None:
+                freed[freed_requirement.id] = freed.get(freed_requirement.id, 0) + freed_hours
+            if stats is not None:
+                stats.count('shifts_removed')
+            continue
+
+        intervals.add(employee_id, custom_date, start_time, end_time)
+        week_hours[employee_id] = week_hours.get(employee_id, 0) + duration
+        day_hours[employee_id] = day_hours.get(employee_id, 0) + duration
+        working.setdefault(custom_date, set()).add(employee_id)
+        covered[requirement.id] = covered.get(requirement.id, 0) + duration
+        kept += 1
+        if stats is not None:
+            stats.count('shifts_kept')
+
+    return working, covered, freed, kept
+
+def covering_requirement(requirements, start_time, end_time):
+    # Zahtjev koji je smjena pokrivala, bez obzira na to je li radnik i dalje valjan
+    for requirement in requirements:
+        for shift_type in requirement.shift_types:
+            if (shift_type.start_time, shift_type.end_time) == (start_time, end_time):
+                return requirement, shift_type.duration_hours
+    return None, 0
+
+def matching_requirement(employee, requirements, candidate_ids, covered, working, week_hours, day_hours, intervals, custom_date, start_time, end_time):
+    # Smjena ostaje samo ako bi je generator i danas mogao dodijeliti istom radniku
+    if employee is None or employee.id in working:
+        return None, 0
+    if intervals.overlaps(employee.id, custom_date, start_time, end_time):
+        return None, 0
+
+    for requirement in requirements:
+        if employee.id not in candidate_ids[requirement.id]:
+            continue
+        for shift_type in requirement.shift_types:
+            if (shift_type.start_time, shift_type.end_time) != (start_time, end_time) or not employee.can_work(shift_type):
+                continue
+            duration = shift_type.duration_hours
+            if covered.get(requirement.id, 0) + duration > requirement.required_hours:
+                continue
+            if week_hours.get(employee.id, 0) + duration > employee.max_weekly_hours:
+                continue
+            if day_hours.get(employee.id, 0) + duration > employee.max_daily_hours:
+                continue
+            return requirement, duration
+    return None, 0
+
+def deficit_requirements(requirements, covered, freed, working, targets=()):
+    # Kopije zahtjeva s nedostajućim satima i bez radnika koji taj dan već rade. Netaknuti
+    # zahtjevi dobivaju najviše sate obrisanih smjena, pogođeni (targets) sve do required_hours.
+    deficits = []
+    for requirement in requirements:
+        missing = requirement.required_hours - covered.get(requirement.id, 0)
+        if requirement.id not in targets:
+            missing = min(missing, freed.get(requirement.id, 0))
+        if missing <= 0 or not requirement.shift_types:
+            continue
+        deficit = RequirementRecord(requirement.id, requirement.department_id, requirement.department_name, requirement.date, missing)
+        deficit.shift_types = requirement.shift_types
+        deficit.role_ids = requirement.role_ids
+        deficit.candidates = [employee for employee in requirement.candidates if employee.id not in working]
+        deficits.append(deficit)
+    return deficits
+
+def persist_repair(removed_ids, new_shifts):
+    Shift = apps.get_model('schedule', 'Shift')
+    if not removed_ids and not new_shifts:
+        return
+
+    with transaction.atomic():
+        replace_shifts(Shift.objects.filter(id__in=removed_ids), new_shifts, batch_size=SHIFT_BATCH_SIZE)
+        transaction.on_commit(lambda: schedule_changed.send(sender=Shift))
+
+# === OKIDAČI ===
+
+def repair_after_time_off(time_off_queryset, solver=DEFAULT_SOLVER, seed=None, stats=None):
+    # Odsustvo pogađa samo dane i odjele u kojima radnik već ima smjenu
+    Shift = apps.get_model('schedule', 'Shift')
+    dates, departments = set(), set()
+    for employee_id, start_date, end_date in time_off_queryset.values_list('employee_id', 'start_date', 'end_date'):
+        affected = Shift.objects.filter(employee_id=employee_id, date__range=(start_date, end_date))
+        for custom_date, department_id in affected.values_list('date', 'department_id'):
+            dates.add(custom_date)
+            departments.add(department_id)
+    return repair_schedule(dates, sorted(departments), solver=solver, seed=seed, stats=stats)
+
+def repair_requirements(requirement_queryset, solver=DEFAULT_SOLVER, seed=None, stats=None):
+    # Izmijenjeni zahtjevi se pune do novih required_hours, bez obzira na staru pokrivenost
+    dates, departments, targets = set(), set(), set()
+    for requirement_id, custom_date, department_id in requirement_queryset.values_list('id', 'date', 'department_id'):
+        dates.add(custom_date)
+        departments.add(department_id)
+        targets.add(requirement_id)
+    return repair_schedule(dates, sorted(departments), solver=solver, seed=seed, stats=stats, targets=targets)
+
+def remove_employees(employee_queryset, solver=DEFAULT_SOLVER, seed=None, stats=None):
+    # Brisanje radnika kaskadno briše i njegove smjene (bez signala), pa se prije brisanja
+    # pamti što su pokrivale; popravak zatim te zahtjeve puni do required_hours
+    Shift = apps.get_model('schedule', 'Shift')
+    with transaction.atomic():
+        released_shifts = list(Shift.objects.filter(employee__in=employee_queryset).values_list('department_id', 'date', 'start_time', 'end_time'))
+        employee_queryset.delete()
+        transaction.on_commit(lambda: schedule_changed.send(sender=Shift))
+    dates = {custom_date for _, custom_date, _, _ in released_shifts}
+    departments = sorted({department_id for department_id, _, _, _ in released_shifts})
+    return repair_schedule(dates, departments, solver=solver, seed=seed, stats=stats, released_shifts=released_shifts)
@@ -0,0 +1,101 @@
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .exports import employee_full_name, shift_total_hours
+from .recurring import expand_templates, load_templates
+from .signals import get_schedule_last_modified, get_schedule_version
+
+# === ROSTER API ===
+# Zasloni na odjelima stalno pitaju "tko radi danas". Gotov JSON se kešira pod verzijom
+# rasporeda, a ETag i Last-Modified se računaju samo iz cachea: nepromijenjen roster
+# vraća 304 bez ijednog upita u bazu.
+
+ROSTER_MAX_DAYS = 62
+
+def roster_access_allowed(request):
+    # Token iz postavki umjesto sesije: provjera bez upita u bazu, pa i 304 ostaje bez upita
+    if getattr(settings, 'SCHEDULE_ROSTER_PUBLIC', False):
+        return True
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else request.GET.get('token', '')
+    return bool(token) and any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in getattr(settings, 'SCHEDULE_ROSTER_TOKENS', ()))
+
+def roster_params_key(start_date, end_date, departments=None, employees=None):
+    params = (start_date.isoformat(), end_date.isoformat(), sorted(departments or []), sorted(employees or []))
+    return hashlib.sha256(repr(params).encode()).hexdigest()
+
+def roster_cache_key(start_date, end_date, departments=None, employees=None):
+    return f"schedule:roster:{get_schedule_version()}:{roster_params_key(start_date, end_date, departments, employees)}"
+
+def roster_etag(start_date, end_date, departments=None, employees=None):
+    return hashlib.sha256(roster_cache_key(start_date, end_date, departments, employees).encode()).hexdigest()[:32]
+
+def roster_last_modified():
+    return get_schedule_last_modified()
+
+def build_roster(start_date, end_date, departments=None, employees=None):
+    Shift = apps.get_model('schedule', 'Shift')
+
+    shifts = Shift.objects.filter(date__range=(start_date, end_date))
+    if departments is not None:
+        shifts = shifts.filter(department__in=departments)
+    if employees is not None:
+        shifts = shifts.filter(employee__in=employees)
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'shifts': [
+            {
+                'id': shift.pk,
+                'date': shift.date,
+                'start_time': shift.start_time.strftime('%H:%M'),
+                'end_time': shift.end_time.strftime('%H:%M'),
+                'hours': shift_total_hours(shift),
+                'employee_id': shift.employee_id,
+                'employee': employee_full_name(shift.employee),
+                'department_id': shift.department_id,
+                'department': shift.department.name,
+                'role_id': shift.role_id,
+                'role': shift.role.name,
+            }
+            for shift in shifts.select_related('employee__user', 'department', 'role').order_by('date', 'start_time', 'department__name', 'id')
+        ],
+        'requirements': roster_requirements(start_date, end_date, departments),
+    }
+
+def roster_requirements(start_date, end_date, departments=None):
+    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+
+    requirements = ShiftRequirement.objects.filter(date__range=(start_date, end_date))
+    if departments is not None:
+        requirements = requirements.filter(department__in=departments)
+    rows = [
+        {'date': custom_date, 'department_id': department_id, 'department': department_name, 'required_hours': required_hours, 'recurring': False}
+        for custom_date, department_id, department_name, required_hours in requirements.values_list('date', 'department_id', 'department__name', 'required_hours')
+    ]
+
+    # Predlošci vrijede samo za odjel-dane bez konkretnog zahtjeva
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    overridden = {(row['department_id'], row['date']) for row in rows}
+    rows.extend(
+        {'date': custom_date, 'department_id': template.department_id, 'department': template.department_name, 'required_hours': template.required_hours, 'recurring': True}
+        for template, custom_date in expand_templates(load_templates(start_date, end_date, departments), dates, overridden)
+    )
+    rows.sort(key=lambda row: (row['date'], row['department']))
+    return rows
+
+def roster_json(start_date, end_date, departments=None, employees=None):
+    cache_key = roster_cache_key(start_date, end_date, departments, employees)
+    content = cache.get(cache_key)
+    if content is None:
+        content = json.dumps(build_roster(start_date, end_date, departments, employees), cls=DjangoJSONEncoder).encode()
+        cache.set(cache_key, content, settings.SCHEDULE_ROSTER_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,287 @@
+import random
+
+from .instrumentation import logger
+from .intervals import shift_interval
+
+# === KVALITETA RASPOREDA ===
+# Ciljna funkcija (manje je bolje) je zbroj ponderiranih kazni:
+#   uncovered_hours  - sati zahtjeva koje nitko ne pokriva
+#   fairness         - zbroj kvadrata tjedne iskorištenosti (sati / max_weekly_hours), pa je
+#                      ravnomjerna raspodjela jeftinija od toga da jedni rade puno, a drugi malo
+#   priority         - za svaku smjenu (priority - 1) radnika; priority 1 je prvi izbor
+#   consecutive_days - svaki radni dan preko MAX_CONSECUTIVE_DAYS zaredom
+#
+# Lokalna pretraga nakon generiranja premješta smjenu na drugog radnika (move) ili
+# zamjenjuje radnike dviju smjena istog dana (swap). Svaki potez mijenja samo dva radnika
+# i jedan dan, pa se razlika ocjene računa iz njihovih zbrojeva, bez ponovnog računanja.
+
+SCORE_WEIGHTS = {
+    'uncovered_hours': 100,
+    'fairness': 10,
+    'priority': 1,
+    'consecutive_days': 5,
+}
+MAX_CONSECUTIVE_DAYS = 5
+# Pretraga staje nakon ovoliko uzastopnih pokušaja bez poboljšanja, po smjeni
+IMPROVE_STALE_FACTOR = 20
+# Broj pokušaja poteza nakon generiranja; 0 = samo ocjena. Budžet je broj pokušaja, a ne
+# vrijeme, pa isti seed uvijek daje isti raspored, bez obzira na brzinu računala.
+DEFAULT_IMPROVE_ITERATIONS = 0
+MAX_IMPROVE_ITERATIONS = 1_000_000
+SCORE_EPSILON = 1e-9
+
+class Slot:
+    __slots__ = ('shift', 'requirement', 'shift_type', 'duration', 'week', 'ordinal', 'start', 'end')
+
+    def __init__(self, shift, requirement, shift_type):
+        self.shift = shift
+        self.requirement = requirement  # None = smjena koju pretraga ne dira
+        self.shift_type = shift_type
+        self.week = shift.date.isocalendar()[:2]
+        self.ordinal = shift.date.toordinal()
+        self.start, self.end = shift_interval(shift.date, shift.start_time, shift.end_time)
+        # Sati kao u generatoru (duration_hours tipa smjene), inače stvarno trajanje
+        self.duration = shift_type.duration_hours if shift_type else (self.end - self.start) / 60
+
+def run_penalty(length):
+    return max(length - MAX_CONSECUTIVE_DAYS, 0)
+
+class ScheduleState:
+    # Smjene su one koje generiranje tek sprema: knjiga sati iz snapshota ih ne sadrži
+    def __init__(self, snapshot, shifts):
+        self.snapshot = snapshot
+        # (radnik, ISO tjedan) -> sati, uključujući knjigu sati izvan ovog generiranja
+        self.hours = {
+            (employee_id, week): hours
+            for week, employee_hours in snapshot.employee_hours().items()
+            for employee_id, hours in employee_hours.items()
+        }
+        self.slots = []
+        self.slots_by_ordinal = {}
+        self.by_employee_day = {}  # (radnik, ordinal datuma) -> Slot
+        self.days = {}  # radnik -> ordinali radnih dana
+        self.covered = {}  # zahtjev -> pokriveni sati
+        self.candidate_ids = {}
+        # Smjene koje generiranje ne dira (drugi odjeli, susjedni dani): (radnik, ordinal) -> intervali
+        self.fixed = {}
+        for employee_id, custom_date, start_time, end_time in snapshot.fixed_shifts:
+            self.fixed.setdefault((employee_id, custom_date.toordinal()), []).append(shift_interval(custom_date, start_time, end_time))
+
+        requirements_by_key = {}
+        for requirements in snapshot.requirements_by_date.values():
+            for requirement in requirements:
+                requirements_by_key.setdefault((requirement.department_id, requirement.date), []).append(requirement)
+
+        for shift in shifts:
+            slot = self.match_slot(shift, requirements_by_key.get((shift.department_id, shift.date), ()))
+            self.slots.append(slot)
+            self.slots_by_ordinal.setdefault(slot.ordinal, []).append(slot)
+            self.by_employee_day[(shift.employee_id, slot.ordinal)] = slot
+            self.days.setdefault(shift.employee_id, set()).add(slot.ordinal)
+            key = (shift.employee_id, slot.week)
+            self.hours[key] = self.hours.get(key, 0) + slot.duration
+            if slot.requirement is not None:
+                self.covered[slot.requirement.id] = self.covered.get(slot.requirement.id, 0) + slot.duration
+
+        self.components = self.full_components()
+
+    def candidates(self, requirement):
+        ids = self.candidate_ids.get(requirement.id)
+        if ids is None:
+            ids = self.candidate_ids[requirement.id] = {employee.id for employee in requirement.candidates or ()}
+        return ids
+
+    def match_slot(self, shift, requirements):
+        # Smjena pripada zahtjevu svog odjela i dana čiji tip smjene ima ista vremena
+        for requirement in requirements:
+            if shift.employee_id not in self.candidates(requirement):
+                continue
+            for shift_type in requirement.shift_types:
+                if (shift_type.start_time, shift_type.end_time) == (shift.start_time, shift.end_time):
+                    return Slot(shift, requirement, shift_type)
+        return Slot(shift, None, None)
+
+    # === CIJELA OCJENA ===
+
+    def full_components(self):
+        employees = self.snapshot.employees_by_id
+        uncovered = sum(
+            max(requirement.required_hours - self.covered.get(requirement.id, 0), 0)
+            for requirements in self.snapshot.requirements_by_date.values() for requirement in requirements
+        )
+        fairness = sum(self.utilization(employee_id, hours) ** 2 for (employee_id, _), hours in self.hours.items())
+        priority = sum(employees[slot.shift.employee_id].priority - 1 for slot in self.slots if slot.shift.employee_id in employees)
+
+        consecutive = 0
+        for ordinals in self.days.values():
+            run, previous = 0, None
+            for ordinal in sorted(ordinals):
+                run = run + 1 if previous is not None and ordinal == previous + 1 else 1
+                consecutive += 1 if run > MAX_CONSECUTIVE_DAYS else 0
+                previous = ordinal
+        return {'uncovered_hours': uncovered, 'fairness': fairness, 'priority': priority, 'consecutive_days': consecutive}
+
+    def utilization(self, employee_id, hours):
+        employee = self.snapshot.employees_by_id.get(employee_id)
+        return hours / employee.max_weekly_hours if employee is not None and employee.max_weekly_hours else 0
+
+    def score(self, components=None):
+        components = components if components is not None else self.components
+        total = sum(SCORE_WEIGHTS[name] * value for name, value in components.items())
+        return {'total': round(total, 4), **{name: round(value, 4) for name, value in components.items()}}
+
+    # === RAZLIKE (O(1) po potezu) ===
+
+    def fairness_delta(self, employee_id, week, hours_delta):
+        hours = self.hours.get((employee_id, week), 0)
+        return self.utilization(employee_id, hours + hours_delta) ** 2 - self.utilization(employee_id, hours) ** 2
+
+    def run_around(self, employee_id, ordinal):
+        # Duljina niza radnih dana lijevo i desno od datuma (ograničena duljinom raspona)
+        days = self.days.get(employee_id, ())
+        left = 0
+        while ordinal - left - 1 in days:
+            left += 1
+        right = 0
+        while ordinal + right + 1 in days:
+            right += 1
+        return left, right
+
+    def consecutive_delta(self, employee_id, ordinal, adding):
+        left, right = self.run_around(employee_id, ordinal)
+        change = run_penalty(left + right + 1) - run_penalty(left) - run_penalty(right)
+        return change if adding else -change
+
+    def fits(self, employee, slot, hours_delta, ignore=None):
+        # Ista pravila kao u generatoru: kandidat zahtjeva, can_work_shifts, tjedni i dnevni
+        # fond, jedna smjena dnevno i bez preklapanja sa smjenama susjednih dana
+        if employee.id not in self.candidates(slot.requirement):
+            return False
+        if not self.snapshot.shift_type_mask(slot.shift_type) >> employee.index & 1:
+            return False
+        if self.hours.get((employee.id, slot.week), 0) + hours_delta > employee.max_weekly_hours:
+            return False
+        if slot.duration > employee.max_daily_hours:
+            return False
+        same_day = self.by_employee_day.get((employee.id, slot.ordinal))
+        if same_day is not None and same_day is not ignore:
+            return False
+        previous = self.by_employee_day.get((employee.id, slot.ordinal - 1))
+        if previous is not None and previous.end > slot.start:
+            return False
+        following = self.by_employee_day.get((employee.id, slot.ordinal + 1))
+        if following is not None and following.start < slot.end:
+            return False
+        return not any(
+            start < slot.end and end > slot.start
+            for ordinal in (slot.ordinal - 1, slot.ordinal, slot.ordinal + 1)
+            for start, end in self.fixed.get((employee.id, ordinal), ())
+        )
+
+    def move_delta(self, slot, employee):
+        current = self.snapshot.employees_by_id.get(slot.shift.employee_id)
+        if current is None or employee is current or not self.fits(employee, slot, slot.duration):
+            return None
+        return {
+            'fairness': self.fairness_delta(current.id, slot.week, -slot.duration) + self.fairness_delta(employee.id, slot.week, slot.duration),
+            'priority': employee.priority - current.priority,
+            'consecutive_days': self.consecutive_delta(current.id, slot.ordinal, False) + self.consecutive_delta(employee.id, slot.ordinal, True),
+        }
+
+    def swap_delta(self, slot, other):
+        # Samo smjene istog dana i različitog trajanja: ostalo ne mijenja ocjenu
+        if other is slot or other.requirement is None or slot.duration == other.duration:
+            return None
+        first = self.snapshot.employees_by_id.get(slot.shift.employee_id)
+        second = self.snapshot.employees_by_id.get(other.shift.employee_id)
+        if first is None or second is None or first is second:
+            return None
+        difference = other.duration - slot.duration
+        if not self.fits(first, other, difference, ignore=slot) or not self.fits(second, slot, -difference, ignore=other):
+            return None
+        return {
+            'fairness': self.fairness_delta(first.id, slot.week, difference) + self.fairness_delta(second.id, slot.week, -difference),
+            'priority': 0,
+            'consecutive_days': 0,
+        }
+
+    def weighted(self, delta):
+        return sum(SCORE_WEIGHTS[name] * value for name, value in delta.items())
+
+    # === POTEZI ===
+
+    def add_delta(self, delta):
+        for name, value in delta.items():
+            self.components[name] += value
+
+    def assign(self, slot, employee):
+        shift = slot.shift
+        self.hours[(shift.employee_id, slot.week)] -= slot.duration
+        if self.by_employee_day.get((shift.employee_id, slot.ordinal)) is slot:
+            del self.by_employee_day[(shift.employee_id, slot.ordinal)]
+            self.days[shift.employee_id].discard(slot.ordinal)
+
+        shift.employee_id = employee.id
+        shift.role_id = employee.role_id
+        key = (employee.id, slot.week)
+        self.hours[key] = self.hours.get(key, 0) + slot.duration
+        self.by_employee_day[(employee.id, slot.ordinal)] = slot
+        self.days.setdefault(employee.id, set()).add(slot.ordinal)
+
+    def move(self, slot, employee, delta):
+        self.add_delta(delta)
+        self.assign(slot, employee)
+
+    def swap(self, slot, other, delta):
+        self.add_delta(delta)
+        first = self.snapshot.employees_by_id[slot.shift.employee_id]
+        second = self.snapshot.employees_by_id[other.shift.employee_id]
+        self.assign(slot, second)
+        self.assign(other, first)
+
+def score_schedule(snapshot, shifts):
+    return ScheduleState(snapshot, shifts).score()
+
+def improve_schedule(snapshot, shifts, iterations=DEFAULT_IMPROVE_ITERATIONS, seed=None, stats=None):
+    # Mijenja employee_id/role_id smjena na mjestu; vraća (ocjena prije, ocjena poslije)
+    state = ScheduleState(snapshot, shifts)
+    before = state.score()
+    movable = [slot for slot in state.slots if slot.requirement is not None]
+    if not iterations or not movable:
+        return before, before
+
+    # 🎲 Isti seed i isti ulaz daju iste poteze
+    rng = random.Random(f"{seed}:improve" if seed is not None else None)
+    max_stale = IMPROVE_STALE_FACTOR * len(movable)
+    stale = moves = swaps = 0
+
+    for _ in range(iterations):
+        if stale >= max_stale:
+            break
+        slot = rng.choice(movable)
+        if rng.random() < 0.5:
+            candidates = slot.requirement.candidates
+            employee = candidates[rng.randrange(len(candidates))]
+            delta = state.move_delta(slot, employee)
+            if delta is not None and state.weighted(delta) < -SCORE_EPSILON:
+                state.move(slot, employee, delta)
+                moves += 1
+                stale = 0
+                continue
+        else:
+            other = rng.choice(state.slots_by_ordinal[slot.ordinal])
+            delta = state.swap_delta(slot, other)
+            if delta is not None and state.weighted(delta) < -SCORE_EPSILON:
+                state.swap(slot, other, delta)
+                swaps += 1
+                stale = 0
+                continue
+        stale += 1
+
+    # Završna ocjena iz cijelog izračuna, bez nakupljene greške zaokruživanja
+    after = state.score(state.full_components())
+    if stats is not None:
+        stats.count('improve_moves', moves)
+        stats.count('improve_swaps', swaps)
+    logger.info("🧮 Ocjena rasporeda: %s -> %s (%d premještanja, %d zamjena)", before['total'], after['total'], moves, swaps)
+    return before, after
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .ledger import add_minutes, apply_minute_deltas, rebuild_weekly_hours
+
+# === VERZIJA RASPOREDA ===
+# Gotovi izvozi (PDF) i roster API keširaju se pod ključem koji sadrži verziju rasporeda;
+# svaka promjena smjena dobije novu verziju pa stari zapisi jednostavno više nisu dohvatljivi.
+# Uz verziju se pamti i vrijeme promjene (Last-Modified), u istom zapisu da ih cache ne
+# može izbaciti odvojeno.
+#
+# Masovne operacije (bulk_create, queryset.delete) ne šalju post_save/post_delete, zato
+# generator i admin brisanje šalju schedule_changed. Na post_delete namjerno ne slušamo:
+# s prijemnikom Django gubi brzo brisanje i učitava svaku smjenu prije brisanja.
+
+SCHEDULE_VERSION_KEY = 'schedule:state'
+
+schedule_changed = Signal()
+
+def new_schedule_state():
+    return uuid4().hex, int(time())
+
+def get_schedule_state():
+    state = cache.get(SCHEDULE_VERSION_KEY)
+    if state is None:
+        cache.add(SCHEDULE_VERSION_KEY, new_schedule_state(), None)
+        state = cache.get(SCHEDULE_VERSION_KEY)
+    return state
+
+def get_schedule_version():
+    return get_schedule_state()[0]
+
+def get_schedule_last_modified():
+    return datetime.fromtimestamp(get_schedule_state()[1], tz=timezone.utc)
+
+def bump_schedule_version():
+    cache.set(SCHEDULE_VERSION_KEY, new_schedule_state(), None)
+
+@receiver(schedule_changed)
+def schedule_changed_handler(sender, **kwargs):
+    bump_schedule_version()
+
+# Imena radnika, odjela i uloga ulaze u izvoz, pa i njihova promjena mijenja verziju
+@receiver(post_save, sender='schedule.Shift')
+@receiver(post_save, sender='schedule.Employee')
+@receiver(post_save, sender='schedule.Department')
+@receiver(post_save, sender='schedule.Role')
+def schedule_saved_handler(sender, **kwargs):
+    bump_schedule_version()
+
+# Ime i prezime radnika su na korisniku (auth.User), pa i preimenovanje mijenja verziju
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed_handler(sender, update_fields=None, **kwargs):
+    # Prijava sprema samo last_login; to ne mijenja ni izvoz ni roster
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_schedule_version()
+
+# Zahtjevi (i dani ponavljajućih predložaka) se prikazuju u rosteru uz smjene
+@receiver(post_save, sender='schedule.ShiftRequirement')
+@receiver(post_delete, sender='schedule.ShiftRequirement')
+@receiver(post_save, sender='schedule.RecurringRequirement')
+@receiver(post_delete, sender='schedule.RecurringRequirement')
+@receiver(m2m_changed, sender='schedule.RecurringRequirement_days')
+def requirement_changed_handler(sender, **kwargs):
+    bump_schedule_version()
+
+# === KNJIGA TJEDNIH SATI ===
+# Pojedinačne izmjene smjena (admin forma) knjiže razliku odmah. Brisanja i masovne
+# promjene idu kroz ledger.replace_shifts, iz istog razloga kao gore.
+
+@receiver(pre_save, sender='schedule.Shift')
+def remember_previous_shift(sender, instance, **kwargs):
+    instance._ledger_previous = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._ledger_previous = sender.objects.filter(pk=instance.pk).values_list('employee_id', 'date', 'start_time', 'end_time').first()
+
+@receiver(post_save, sender='schedule.Shift')
+def book_saved_shift(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_ledger_previous', None)
+    deltas = add_minutes({}, [previous] if previous else [], sign=-1)
+    add_minutes(deltas, [(instance.employee_id, instance.date, instance.start_time, instance.end_time)])
+    apply_minute_deltas(deltas)
+
+# Kaskadno brisanje odjela ili uloge briše i smjene bez signala; knjiga se tada gradi iznova
+@receiver(post_delete, sender='schedule.Department')
+@receiver(post_delete, sender='schedule.Role')
+def rebuild_ledger_after_cascade(sender, **kwargs):
+    connection = transaction.get_connection()
+    if not any(callback[1] is rebuild_weekly_hours for callback in connection.run_on_commit):
+        transaction.on_commit(rebuild_weekly_hours)
@@ -0,0 +1,358 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.db.models import Q
+
+from .intervals import DateRangeIndex
+from .ledger import load_weekly_hours, shift_minutes
+from .recurring import expand_templates, load_templates
+
+# === ZAPISI ===
+# Kompaktni zapisi bez ORM-a: generator radi samo nad njima, pa po dodjeli nema upita
+
+class ShiftTypeRecord:
+    __slots__ = ('id', 'name', 'start_time', 'end_time', 'duration_hours')
+
+    def __init__(self, id, name, start_time, end_time, duration_hours):
+        self.id = id
+        self.name = name
+        self.start_time = start_time
+        self.end_time = end_time
+        self.duration_hours = duration_hours
+
+    def __repr__(self):
+        return f"<ShiftTypeRecord {self.name}>"
+
+class EmployeeRecord:
+    __slots__ = (
+        'id', 'index', 'username', 'first_name', 'last_name',
+        'max_weekly_hours', 'max_daily_hours', 'priority', 'role_id', 'shift_type_ids', 'department_ids',
+    )
+
+    def __init__(self, id, index, username, first_name, last_name, max_weekly_hours, max_daily_hours, priority):
+        self.id = id
+        self.index = index  # pozicija bita u maskama prihvatljivosti
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.max_weekly_hours = max_weekly_hours
+        self.max_daily_hours = max_daily_hours
+        self.priority = priority
+        self.role_id = None  # uloga koja se upisuje u smjenu (najmanji id, kao roles.first())
+        self.shift_type_ids = frozenset()  # prazno = može raditi sve smjene
+        self.department_ids = frozenset()  # samo odjeli koji su u snapshotu
+
+    def can_work(self, shift_type):
+        return not self.shift_type_ids or shift_type.id in self.shift_type_ids
+
+    def __repr__(self):
+        return f"<EmployeeRecord {self.username}>"
+
+class RequirementRecord:
+    __slots__ = ('id', 'department_id', 'department_name', 'date', 'required_hours', 'shift_types', 'role_ids', 'candidates')
+
+    def __init__(self, id, department_id, department_name, date, required_hours):
+        self.id = id
+        self.department_id = department_id
+        self.department_name = department_name
+        self.date = date
+        self.required_hours = required_hours
+        self.shift_types = []
+        self.role_ids = set()
+        self.candidates = None  # popunjava prepare_eligibility()
+
+    def __repr__(self):
+        return f"<RequirementRecord {self.department_name} {self.date}>"
+
+# === SNAPSHOT ===
+
+class SchedulingSnapshot:
+    def __init__(self, dates, departments=None):
+        self.dates = sorted(set(dates))
+        self.departments = departments
+        self.shift_types = {}
+        self.employees = []
+        self.employees_by_id = {}
+        # Bit -> radnik; u punom snapshotu je to sama lista employees, u podskupu rječnik
+        self.employees_by_index = self.employees
+        self.requirements_by_date = {}
+        self.time_off = {}
+        self.time_off_index = DateRangeIndex()
+        # (department_id, weekday, role_id) -> bitmaska radnika
+        self.eligibility_index = {}
+        # shift_type_id -> bitmaska radnika koji smiju raditi tu smjenu
+        self.shift_type_masks = {}
+        # ISO tjedan -> {radnik: sati} iz knjige WeeklyHours (smjene izvan raspona koji se radi)
+        self.weekly_hours = {}
+        # Smjene koje generiranje ne zamjenjuje, a zauzimaju radnike: (employee_id, date, start, end)
+        self.fixed_shifts = []
+        # datum -> bitmaska radnika koji taj dan već rade u drugom odjelu
+        self.busy_masks = {}
+
+    @classmethod
+    def load(cls, dates, departments=None):
+        snapshot = cls(dates, departments)
+        if snapshot.dates:
+            snapshot._load_requirements()
+            snapshot._load_employees()
+            snapshot._load_time_off()
+            snapshot._load_weekly_hours()
+        return snapshot
+
+    def _requirement_queryset(self):
+        ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+        requirements = ShiftRequirement.objects.filter(date__in=self.dates)
+        if self.departments is not None:
+            requirements = requirements.filter(department__in=self.departments)
+        return requirements
+
+    def _load_requirements(self):
+        ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
+        ShiftType = apps.get_model('schedule', 'ShiftType')
+
+        for values in ShiftType.objects.values_list('id', 'name', 'start_time', 'end_time', 'duration_hours'):
+            self.shift_types[values[0]] = ShiftTypeRecord(*values)
+
+        requirements = self._requirement_queryset()
+        by_id = {}
+        for values in requirements.values_list('id', 'department_id', 'department__name', 'date', 'required_hours').order_by('date', 'id'):
+            requirement = RequirementRecord(*values)
+            by_id[requirement.id] = requirement
+            self.requirements_by_date.setdefault(requirement.date, []).append(requirement)
+
+        # M2M veze čitamo izravno iz through tablica, jednim upitom po relaciji
+        shift_type_links = ShiftRequirement.shift_types.through.objects.filter(shiftrequirement__in=requirements)
+        for requirement_id, shift_type_id in shift_type_links.values_list('shiftrequirement_id', 'shifttype_id'):
+            by_id[requirement_id].shift_types.append(self.shift_types[shift_type_id])
+        for requirement in by_id.values():
+            requirement.shift_types.sort(key=lambda shift_type: (shift_type.start_time, shift_type.id))
+
+        role_links = ShiftRequirement.required_roles.through.objects.filter(shiftrequirement__in=requirements)
+        for requirement_id, role_id in role_links.values_list('shiftrequirement_id', 'role_id'):
+            by_id[requirement_id].role_ids.add(role_id)
+
+        self._expand_recurring({(requirement.department_id, requirement.date) for requirement in by_id.values()})
+
+    def _expand_recurring(self, overridden):
+        # Predlošci se razvijaju samo za odjel-dane bez konkretnog zahtjeva; ID je tuple
+        # pa se ne može sudariti s ID-em ShiftRequirement retka
+        templates = load_templates(self.dates[0], self.dates[-1], self.departments)
+        if not templates:
+            return
+
+        shift_types = {
+            template.id: sorted((self.shift_types[shift_type_id] for shift_type_id in template.shift_type_ids), key=lambda shift_type: (shift_type.start_time, shift_type.id))
+            for template in templates
+        }
+        for template, custom_date in expand_templates(templates, self.dates, overridden):
+            requirement = RequirementRecord(('recurring', template.id, custom_date), template.department_id, template.department_name, custom_date, template.required_hours)
+            requirement.shift_types = shift_types[template.id]
+            requirement.role_ids = template.role_ids
+            self.requirements_by_date.setdefault(custom_date, []).append(requirement)
+
+        # Solveri idu po datumima redom kojim su u rječniku
+        self.requirements_by_date = dict(sorted(self.requirements_by_date.items()))
+
+    def _load_employees(self):
+        Employee = apps.get_model('schedule', 'Employee')
+
+        department_ids = {requirement.department_id for requirements in self.requirements_by_date.values() for requirement in requirements}
+        employees = Employee.objects.filter(departments__in=department_ids).distinct()
+        rows = employees.values_list(
+            'id', 'user__username', 'user__first_name', 'user__last_name',
+            'max_weekly_hours', 'max_daily_hours', 'priority',
+        ).order_by('-max_weekly_hours', 'priority', 'id')
+        for index, (employee_id, *values) in enumerate(rows):
+            employee = EmployeeRecord(employee_id, index, *values)
+            self.employees.append(employee)
+            self.employees_by_id[employee_id] = employee
+
+        employee_ids = employees.values('id')
+        departments = {}
+        for employee_id, department_id in Employee.departments.through.objects.filter(employee__in=employee_ids).values_list('employee_id', 'department_id'):
+            departments.setdefault(employee_id, set()).add(department_id)
+        weekdays = {}
+        for employee_id, day_name in Employee.available_days.through.objects.filter(employee__in=employee_ids).values_list('employee_id', 'day__name'):
+            weekdays.setdefault(employee_id, set()).add(day_name)
+        roles = {}
+        for employee_id, role_id in Employee.roles.through.objects.filter(employee__in=employee_ids).values_list('employee_id', 'role_id'):
+            roles.setdefault(employee_id, set()).add(role_id)
+        shift_types = {}
+        for employee_id, shift_type_id in Employee.can_work_shifts.through.objects.filter(employee__in=employee_ids).values_list('employee_id', 'shifttype_id'):
+            shift_types.setdefault(employee_id, set()).add(shift_type_id)
+
+        unrestricted = 0
+        for employee in self.employees:
+            employee_roles = roles.get(employee.id, ())
+            if employee_roles:
+                employee.role_id = min(employee_roles)
+            employee.shift_type_ids = frozenset(shift_types.get(employee.id, ()))
+            employee.department_ids = frozenset(departments.get(employee.id, set()) & department_ids)
+            bit = 1 << employee.index
+            if employee.shift_type_ids:
+                for shift_type_id in employee.shift_type_ids:
+                    self.shift_type_masks[shift_type_id] = self.shift_type_masks.get(shift_type_id, 0) | bit
+            else:
+                unrestricted |= bit
+            for department_id in departments.get(employee.id, ()):
+                if department_id not in department_ids:
+                    continue
+                for weekday in weekdays.get(employee.id, ()):
+                    for role_id in employee_roles:
+                        key = (department_id, weekday, role_id)
+                        self.eligibility_index[key] = self.eligibility_index.get(key, 0) | bit
+
+        # Radnik bez can_work_shifts smije raditi sve smjene
+        for shift_type_id in self.shift_types:
+            self.shift_type_masks[shift_type_id] = self.shift_type_masks.get(shift_type_id, 0) | unrestricted
+
+    def _load_time_off(self):
+        TimeOff = apps.get_model('schedule', 'TimeOff')
+
+        entries = TimeOff.objects.filter(start_date__lte=self.dates[-1], end_date__gte=self.dates[0])
+        for employee_id, start_date, end_date in entries.values_list('employee_id', 'start_date', 'end_date'):
+            if employee_id in self.employees_by_id:
+                self.time_off.setdefault(employee_id, []).append((start_date, end_date))
+        self.time_off_index = DateRangeIndex(
+            (start_date, end_date, 1 << self.employees_by_id[employee_id].index)
+            for employee_id, ranges in self.time_off.items()
+            for start_date, end_date in ranges
+        )
+
+    def _load_weekly_hours(self):
+        Employee = apps.get_model('schedule', 'Employee')
+
+        department_ids = {requirement.department_id for requirements in self.requirements_by_date.values() for requirement in requirements}
+        employee_ids = Employee.objects.filter(departments__in=department_ids).values('id')
+        self.weekly_hours = load_weekly_hours(employee_ids, {custom_date.isocalendar()[:2] for custom_date in self.dates})
+
+    def load_fixed_shifts(self):
+        # Smjene drugih odjela istih dana i svih odjela susjednih dana (smjene preko ponoći)
+        Shift = apps.get_model('schedule', 'Shift')
+        if not self.dates or not self.employees:
+            return
+
+        adjacent = {custom_date + timedelta(days=offset) for custom_date in self.dates for offset in (-1, 1)} - set(self.dates)
+        fixed = Q(date__in=adjacent)
+        if self.departments is not None:
+            fixed |= Q(date__in=self.dates) & ~Q(department__in=self.departments)
+
+        dates = set(self.dates)
+        for employee_id, custom_date, start_time, end_time in Shift.objects.filter(fixed).values_list('employee_id', 'date', 'start_time', 'end_time'):
+            employee = self.employees_by_id.get(employee_id)
+            if employee is None:
+                continue
+            self.fixed_shifts.append((employee_id, custom_date, start_time, end_time))
+            if custom_date in dates:
+                self.busy_masks[custom_date] = self.busy_masks.get(custom_date, 0) | 1 << employee.index
+
+    def seed_fixed_shifts(self, employee_hours, intervals):
+        # Tjedni sati su već u knjizi; ovdje idu intervali i dnevni sati za solver
+        for employee_id, custom_date, start_time, end_time in self.fixed_shifts:
+            intervals.add(employee_id, custom_date, start_time, end_time)
+            day_hours = employee_hours.setdefault(custom_date, {})
+            day_hours[employee_id] = day_hours.get(employee_id, 0) + shift_minutes(custom_date, start_time, end_time) / 60
+
+    def release_hours(self, rows):
+        # Smjene koje će se zamijeniti ne smiju trošiti tjedni fond: (employee_id, date, start, end)
+        for employee_id, custom_date, start_time, end_time in rows:
+            week_hours = self.weekly_hours.get(custom_date.isocalendar()[:2])
+            if week_hours and employee_id in week_hours:
+                week_hours[employee_id] = max(week_hours[employee_id] - shift_minutes(custom_date, start_time, end_time) / 60, 0)
+
+    def employee_hours(self):
+        # Početno stanje za solver; kopija jer ga solver mijenja
+        return {week: dict(hours) for week, hours in self.weekly_hours.items()}
+
+    # === PARTICIJE ===
+
+    def subset(self, department_ids):
+        # Samo radnici i indeksi grupe odjela (bitovi ostaju isti), jer se podskup šalje
+        # u zaseban proces. Radnik grupe ne radi ni u jednom odjelu izvan nje (partition).
+        subset = SchedulingSnapshot(self.dates, sorted(department_ids))
+        subset.shift_types = self.shift_types
+        subset.employees = [employee for employee in self.employees if employee.department_ids & department_ids]
+        subset.employees_by_id = {employee.id: employee for employee in subset.employees}
+        subset.employees_by_index = {employee.index: employee for employee in subset.employees}
+        staff_mask = sum(1 << employee.index for employee in subset.employees)
+
+        subset.time_off = {employee_id: ranges for employee_id, ranges in self.time_off.items() if employee_id in subset.employees_by_id}
+        subset.time_off_index = DateRangeIndex(
+            (start_date, end_date, 1 << subset.employees_by_id[employee_id].index)
+            for employee_id, ranges in subset.time_off.items()
+            for start_date, end_date in ranges
+        )
+        subset.eligibility_index = {key: mask for key, mask in self.eligibility_index.items() if key[0] in department_ids}
+        subset.shift_type_masks = {shift_type_id: mask & staff_mask for shift_type_id, mask in self.shift_type_masks.items()}
+        subset.busy_masks = {custom_date: mask & staff_mask for custom_date, mask in self.busy_masks.items() if mask & staff_mask}
+        subset.weekly_hours = {
+            week: {employee_id: hours for employee_id, hours in hours_by_employee.items() if employee_id in subset.employees_by_id}
+            for week, hours_by_employee in self.weekly_hours.items()
+        }
+        subset.fixed_shifts = [row for row in self.fixed_shifts if row[0] in subset.employees_by_id]
+        for custom_date, requirements in self.requirements_by_date.items():
+            selected = [requirement for requirement in requirements if requirement.department_id in department_ids]
+            if selected:
+                subset.requirements_by_date[custom_date] = selected
+        return subset
+
+    def partition(self):
+        # Odjeli bez zajedničkih radnika su neovisni: union-find po odjelima svakog radnika
+        parent = {}
+
+        def find(department_id):
+            parent.setdefault(department_id, department_id)
+            while parent[department_id] != department_id:
+                parent[department_id] = parent[parent[department_id]]
+                department_id = parent[department_id]
+            return department_id
+
+        for requirements in self.requirements_by_date.values():
+            for requirement in requirements:
+                find(requirement.department_id)
+        for employee in self.employees:
+            first, *others = sorted(employee.department_ids) or [None]
+            for department_id in others:
+                parent[find(department_id)] = find(first)
+
+        components = {}
+        for department_id in parent:
+            components.setdefault(find(department_id), set()).add(department_id)
+        return [self.subset(department_ids) for department_ids in sorted(components.values(), key=min)]
+
+    # === UPITI NAD INDEKSIMA ===
+
+    def time_off_mask(self, custom_date):
+        return self.time_off_index.mask(custom_date)
+
+    def shift_type_mask(self, shift_type):
+        return self.shift_type_masks.get(shift_type.id, 0)
+
+    def eligible_mask(self, requirement):
+        weekday = requirement.date.strftime('%A')
+        mask = 0
+        for role_id in requirement.role_ids:
+            mask |= self.eligibility_index.get((requirement.department_id, weekday, role_id), 0)
+        # Radnik na odsustvu ili sa smjenom u drugom odjelu taj dan nije kandidat
+        return mask & ~(self.time_off_mask(requirement.date) | self.busy_masks.get(requirement.date, 0))
+
+    def employees_in_mask(self, mask):
+        # Redoslijed bitova prati redoslijed učitavanja (-max_weekly_hours, priority)
+        employees = []
+        while mask:
+            low_bit = mask & -mask
+            employees.append(self.employees_by_index[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return employees
+
+    def prepare_eligibility(self):
+        # Kandidati za sve zahtjeve računaju se unaprijed, u zasebnoj fazi
+        for requirements in self.requirements_by_date.values():
+            for requirement in requirements:
+                requirement.candidates = self.employees_in_mask(self.eligible_mask(requirement))
+
+    def eligible_employees(self, requirement):
+        # Uvijek nova lista jer je solveri smiju miješati
+        if requirement.candidates is not None:
+            return list(requirement.candidates)
+        return self.employees_in_mask(self.eligible_mask(requirement))
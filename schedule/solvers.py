@@ -0,0 +1,216 @@
+import heapq
+from time import monotonic
+
+from .instrumentation import logger
+from .utils import create_shift
+
+INFINITY = float('inf')
+
+# === MIN-COST FLOW ===
+# Successive shortest paths (Dijkstra s potencijalima). Tok staje čim više nema puta
+# negativne cijene, pa se dobiva tok minimalne cijene, a ne nužno maksimalni tok.
+
+class MinCostFlow:
+    def __init__(self, node_count):
+        self.graph = [[] for _ in range(node_count)]
+
+    def add_edge(self, source, target, capacity, cost):
+        forward = [target, capacity, cost, None]
+        backward = [source, 0, -cost, forward]
+        forward[3] = backward
+        self.graph[source].append(forward)
+        self.graph[target].append(backward)
+        return forward
+
+    def _initial_potential(self, source):
+        # Bellman-Ford jer bridovi prema ponoru imaju negativnu cijenu
+        potential = [INFINITY] * len(self.graph)
+        potential[source] = 0
+        for _ in range(len(self.graph)):
+            changed = False
+            for node, edges in enumerate(self.graph):
+                if potential[node] == INFINITY:
+                    continue
+                for target, capacity, cost, _ in edges:
+                    if capacity > 0 and potential[node] + cost < potential[target]:
+                        potential[target] = potential[node] + cost
+                        changed = True
+            if not changed:
+                break
+        return [0 if value == INFINITY else value for value in potential]
+
+    def solve(self, source, sink, deadline=None):
+        potential = self._initial_potential(source)
+        total_flow = total_cost = 0
+
+        while deadline is None or monotonic() < deadline:
+            distance = [INFINITY] * len(self.graph)
+            distance[source] = 0
+            previous = [None] * len(self.graph)
+            heap = [(0, source)]
+            while heap:
+                node_distance, node = heapq.heappop(heap)
+                if node_distance > distance[node]:
+                    continue
+                for edge in self.graph[node]:
+                    target, capacity, cost, _ = edge
+                    if capacity <= 0:
+                        continue
+                    candidate = node_distance + cost + potential[node] - potential[target]
+                    if candidate < distance[target]:
+                        distance[target] = candidate
+                        previous[target] = edge
+                        heapq.heappush(heap, (candidate, target))
+
+            if distance[sink] == INFINITY:
+                break
+            for node, node_distance in enumerate(distance):
+                if node_distance < INFINITY:
+                    potential[node] += node_distance
+
+            path_cost = potential[sink] - potential[source]
+            if path_cost >= 0:
+                break
+
+            path_flow = INFINITY
+            node = sink
+            while node != source:
+                edge = previous[node]
+                path_flow = min(path_flow, edge[1])
+                node = edge[3][0]
+            node = sink
+            while node != source:
+                edge = previous[node]
+                edge[1] -= path_flow
+                edge[3][1] += path_flow
+                node = edge[3][0]
+
+            total_flow += path_flow
+            total_cost += path_flow * path_cost
+
+        return total_flow, total_cost
+
+# === PLANIRANJE SMJENA ===
+
+def can_take_shift(employee, shift_type, allowed_mask, custom_date, week_hours, day_hours, intervals, stats=None):
+    # allowed_mask = radnici koji smiju raditi ovu smjenu (can_work_shifts)
+    if not (
+        allowed_mask >> employee.index & 1
+        and day_hours.get(employee.id, 0) + shift_type.duration_hours <= employee.max_daily_hours
+        and week_hours.get(employee.id, 0) + shift_type.duration_hours <= employee.max_weekly_hours
+    ):
+        return False
+    if intervals.overlaps(employee.id, custom_date, shift_type.start_time, shift_type.end_time):
+        if stats is not None:
+            stats.count('overlaps_rejected')
+        return False
+    return True
+
+def plan_shift_slots(remaining_hours, shift_types, limits):
+    # Ograničeni ruksak: najviše pokrivenih sati <= remaining_hours, uz što manje smjena
+    best = [0] + [INFINITY] * remaining_hours
+    choices = []
+    for shift_type in shift_types:
+        duration, limit = shift_type.duration_hours, limits.get(shift_type.id, 0)
+        previous = best
+        best = list(previous)
+        choice = [0] * (remaining_hours + 1)
+        if duration > 0 and limit > 0:
+            for hours in range(remaining_hours + 1):
+                for count in range(1, min(limit, hours // duration) + 1):
+                    candidate = previous[hours - count * duration] + count
+                    if candidate < best[hours]:
+                        best[hours] = candidate
+                        choice[hours] = count
+        choices.append(choice)
+
+    covered = max(hours for hours in range(remaining_hours + 1) if best[hours] < INFINITY)
+    slots = {}
+    hours = covered
+    for shift_type, choice in reversed(list(zip(shift_types, choices))):
+        if choice[hours]:
+            slots[shift_type] = choice[hours]
+            hours -= choice[hours] * shift_type.duration_hours
+    return covered, slots
+
+def assign_shifts_for_day_optimal(snapshot, custom_date, shift_requirements, employee_hours, intervals, shifts, deadline=None, rng=None, stats=None):
+    # Tok je deterministički (izjednačenja se lome po indeksu radnika), pa rng nije potreban
+    day_shifts = []
+    assigned_employees = set()
+    week_hours = employee_hours.setdefault(custom_date.isocalendar()[:2], {})
+    day_hours = employee_hours.setdefault(custom_date, {})
+    covered_hours = {requirement.id: 0 for requirement in shift_requirements}
+    candidates = {requirement.id: snapshot.eligible_employees(requirement) for requirement in shift_requirements}
+
+    # Svaki krug planira preostale slotove i popunjava ih tokom; sljedeći krug
+    # ponovno planira ono što nije popunjeno jer su radnici otišli drugamo.
+    while deadline is None or monotonic() < deadline:
+        groups = []
+        for requirement in shift_requirements:
+            remaining_hours = requirement.required_hours - covered_hours[requirement.id]
+            if remaining_hours <= 0:
+                continue
+            available = [employee for employee in candidates[requirement.id] if employee not in assigned_employees]
+            if stats is not None:
+                stats.count('candidates_scanned', len(available) * len(requirement.shift_types))
+            able = {}
+            for shift_type in requirement.shift_types:
+                allowed_mask = snapshot.shift_type_mask(shift_type)
+                able[shift_type.id] = [
+                    employee for employee in available
+                    if can_take_shift(employee, shift_type, allowed_mask, custom_date, week_hours, day_hours, intervals, stats)
+                ]
+            _, slots = plan_shift_slots(remaining_hours, requirement.shift_types, {key: len(value) for key, value in able.items()})
+            for shift_type, count in slots.items():
+                groups.append((requirement, shift_type, count, able[shift_type.id]))
+
+        if not groups:
+            break
+
+        assignments = solve_assignment(groups, week_hours, deadline)
+        if not assignments:
+            break
+
+        for employee, requirement, shift_type in assignments:
+            create_shift(employee, requirement, shift_type.start_time, shift_type.end_time, shift_type.duration_hours, day_shifts, week_hours, day_hours, assigned_employees, intervals, stats)
+            covered_hours[requirement.id] += shift_type.duration_hours
+
+    for requirement in shift_requirements:
+        logger.debug("📊 %s (%s): pokriveno %d/%dh", requirement.department_name, custom_date, covered_hours[requirement.id], requirement.required_hours)
+
+    day_shifts.sort(key=lambda shift: (shift.department_id, shift.start_time, shift.employee_id))
+    shifts.extend(day_shifts)
+    return day_shifts
+
+def solve_assignment(groups, week_hours, deadline=None):
+    employees = {}
+    for _, _, _, able in groups:
+        for employee in able:
+            employees.setdefault(employee.id, employee)
+    employees = sorted(employees.values(), key=lambda employee: employee.index)
+
+    # Manji priority i manje već odrađenih sati = jeftiniji brid
+    def employee_cost(employee):
+        return max(employee.priority, 0) * 1000 + week_hours.get(employee.id, 0)
+
+    max_cost = max((employee_cost(employee) for employee in employees), default=0)
+    slot_count = sum(count for _, _, count, _ in groups)
+    # Sat pokrivenosti uvijek vrijedi više od svih troškova prioriteta zajedno
+    hour_weight = (max_cost + 1) * (slot_count + 1)
+
+    source, sink = 0, 1
+    employee_nodes = {employee.id: 2 + position for position, employee in enumerate(employees)}
+    network = MinCostFlow(2 + len(employees) + len(groups))
+    for employee in employees:
+        network.add_edge(source, employee_nodes[employee.id], 1, 0)
+
+    edges = []
+    for position, (requirement, shift_type, count, able) in enumerate(groups):
+        group_node = 2 + len(employees) + position
+        network.add_edge(group_node, sink, count, -shift_type.duration_hours * hour_weight)
+        for employee in able:
+            edge = network.add_edge(employee_nodes[employee.id], group_node, 1, employee_cost(employee))
+            edges.append((edge, employee, requirement, shift_type))
+
+    network.solve(source, sink, deadline)
+    return [(employee, requirement, shift_type) for edge, employee, requirement, shift_type in edges if edge[1] == 0]
@@ -1,3 +1,855 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import re
+import subprocess
+import sys
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.db.models import Count, QuerySet
+from django.test import SimpleTestCase, TestCase, tag
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .benchmarks import build_dataset, measure, coverage_ratio, shift_hours
+from .exports import EXCEL_CONTENT_TYPE, EXPORT_COLUMNS, export_queryset, export_response, iter_department_weeks, shift_row
+from .importers import import_file
+from .jobs import job_status, run_generation_job, submit_generation_job
+from .intervals import ShiftIntervalIndex, shift_interval
+from .instrumentation import GenerationStats
+from .ledger import rebuild_weekly_hours, shift_rows
+from .models import Day, Department, Employee, GenerationJob, RecurringRequirement, Role, Shift, ShiftRequirement, ShiftType, TimeOff, WeeklyHours
+from .recurring import materialize_templates
+from .repair import remove_employees, repair_requirements, repair_schedule
+from .scoring import ScheduleState, improve_schedule
+from .snapshot import SchedulingSnapshot
+from .utils import generate_schedule_for_range
+from .views import GENERATION_MAX_DAYS
+
+@tag('benchmark')
+class GeneratorBenchmarkTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=100, days=7)
+
+    def test_query_count_does_not_grow_with_horizon(self):
+        _, one_day = measure(generate_schedule_for_range, self.start_date, self.start_date, seed=1)
+        _, one_week = measure(generate_schedule_for_range, self.start_date, self.end_date, seed=1)
+        self.assertEqual(one_day['queries'], one_week['queries'])
+
+    def test_seeded_runs_are_reproducible(self):
+        def run(solver):
+            generate_schedule_for_range(self.start_date, self.end_date, solver=solver, seed=7)
+            return list(Shift.objects.order_by('date', 'start_time', 'employee_id').values_list('employee_id', 'date', 'start_time'))
+
+        for solver in ('greedy', 'flow'):
+            with self.subTest(solver=solver):
+                self.assertEqual(run(solver), run(solver))
+
+    def test_flow_solver_covers_at_least_greedy(self):
+        generate_schedule_for_range(self.start_date, self.end_date, solver='greedy', seed=1)
+        greedy_coverage = coverage_ratio(self.start_date, self.end_date)
+        generate_schedule_for_range(self.start_date, self.end_date, solver='flow', seed=1)
+        self.assertGreaterEqual(coverage_ratio(self.start_date, self.end_date), greedy_coverage)
+
+class ShiftIntervalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.day = date(2025, 3, 5)
+        self.index = ShiftIntervalIndex()
+        self.index.add(1, self.day, time(20), time(8))  # noćna, završava sutradan u 08:00
+
+    def test_overnight_shift_ends_next_day(self):
+        start, end = shift_interval(self.day, time(22), time(6))
+        self.assertEqual(end - start, 8 * 60)
+        self.assertEqual(shift_interval(self.day + timedelta(days=1), time(6), time(14))[0], end)
+        # Jednak početak i kraj znači 24 sata, ne praznu smjenu
+        start, end = shift_interval(self.day, time(7), time(7))
+        self.assertEqual(end - start, 24 * 60)
+
+    def test_overlaps_across_midnight_and_adjacent_days(self):
+        next_day, previous_day = self.day + timedelta(days=1), self.day - timedelta(days=1)
+        cases = [
+            (next_day, time(6), time(14), True),  # jutarnja smjena prije kraja noćne
+            (next_day, time(8), time(16), False),  # počinje točno kad noćna završi
+            (self.day, time(12), time(20), False),  # završava točno kad noćna počne
+            (self.day, time(19), time(21), True),
+            (self.day, time(23), time(1), True),  # obje preko ponoći
+            (previous_day, time(20), time(8), False),  # prethodna noć završava jutro prije
+            (previous_day, time(23), time(21), True),  # 22 sata, seže u noćnu
+            (next_day, time(20), time(8), False),
+        ]
+        for custom_date, start_time, end_time, expected in cases:
+            with self.subTest(date=custom_date, start=start_time, end=end_time):
+                self.assertEqual(self.index.overlaps(1, custom_date, start_time, end_time), expected)
+        self.assertFalse(self.index.overlaps(2, self.day, time(20), time(8)))
+
+    def test_intervals_stay_sorted_when_added_out_of_order(self):
+        self.index.add(1, self.day + timedelta(days=2), time(7), time(15))
+        self.index.add(1, self.day - timedelta(days=2), time(7), time(15))
+        self.index.add(1, self.day + timedelta(days=1), time(8), time(16))  # dodiruje noćnu
+        intervals = self.index.by_employee[1]
+        self.assertEqual(intervals.starts, sorted(intervals.starts))
+        self.assertEqual(intervals.ends, sorted(intervals.ends))
+        self.assertTrue(self.index.contains(1, self.day, time(20), time(8)))
+        self.assertFalse(self.index.contains(1, self.day, time(20), time(7)))
+        self.assertTrue(self.index.overlaps(1, self.day + timedelta(days=1), time(15), time(17)))
+        self.assertFalse(self.index.overlaps(1, self.day + timedelta(days=1), time(16), time(7)))
+        self.assertTrue(self.index.overlaps(1, self.day - timedelta(days=2), time(14), time(16)))
+
+class PartialGenerationTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=120, days=7, shared_staff=0.5)
+
+    def assert_no_double_booking(self):
+        by_employee = {}
+        for employee_id, custom_date, start_time, end_time in Shift.objects.values_list('employee_id', 'date', 'start_time', 'end_time'):
+            by_employee.setdefault(employee_id, []).append((*shift_interval(custom_date, start_time, end_time), custom_date))
+        for employee_id, intervals in by_employee.items():
+            intervals.sort()
+            self.assertFalse([(first, second) for first, second in zip(intervals, intervals[1:]) if second[0] < first[1]], employee_id)
+            days = [custom_date for _, _, custom_date in intervals]
+            self.assertEqual(len(days), len(set(days)), employee_id)
+
+    def test_department_run_respects_other_departments(self):
+        departments = list(Department.objects.order_by('id').values_list('id', flat=True))
+        for solver in ('greedy', 'flow'):
+            with self.subTest(solver=solver):
+                generate_schedule_for_range(self.start_date, self.end_date, solver=solver, seed=1)
+                for department_id in departments[:3]:
+                    generate_schedule_for_range(self.start_date, self.end_date, departments=[department_id], solver=solver, seed=2)
+                self.assert_no_double_booking()
+
+    def test_admin_action_generates_only_selected_departments(self):
+        generate_schedule_for_range(self.start_date, self.end_date, seed=1)
+        department_id = Department.objects.order_by('id').values_list('id', flat=True)[0]
+        others = sorted(Shift.objects.exclude(department_id=department_id).values_list('id', 'employee_id', 'date', 'start_time'))
+        selected = ShiftRequirement.objects.filter(department_id=department_id, date__lte=self.start_date + timedelta(days=2))
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:schedule_shiftrequirement_changelist'), {
+            'action': 'generate_schedule_for_selected', '_selected_action': list(selected.values_list('pk', flat=True)), 'solver': 'greedy', 'seed': 3,
+        })
+        self.assertEqual(response.status_code, 302)
+        job = GenerationJob.objects.get()
+        self.assertEqual(list(job.departments.values_list('id', flat=True)), [department_id])
+        with mock.patch('schedule.jobs.connections'):
+            run_generation_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(sorted(Shift.objects.exclude(department_id=department_id).values_list('id', 'employee_id', 'date', 'start_time')), others)
+        self.assert_no_double_booking()
+
+class EligibilityConstraintTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=120, days=7, shared_staff=0.5)
+        employees = list(Employee.objects.order_by('id'))
+        # Svaki treći radnik smije samo 8 sati dnevno, pa 12-satne smjene za njega otpadaju
+        Employee.objects.filter(pk__in=[employee.pk for employee in employees[::3]]).update(max_daily_hours=8)
+        TimeOff.objects.bulk_create(
+            TimeOff(employee=employee, start_date=self.start_date + timedelta(days=number % 4), end_date=self.start_date + timedelta(days=number % 4 + 2), reason='holiday')
+            for number, employee in enumerate(employees[1::4])
+        )
+
+    def assert_constraints_hold(self):
+        time_off = {}
+        for employee_id, start_date, end_date in TimeOff.objects.values_list('employee_id', 'start_date', 'end_date'):
+            time_off.setdefault(employee_id, []).append((start_date, end_date))
+        limits = dict(Employee.objects.values_list('id', 'max_daily_hours'))
+
+        day_hours = {}
+        for shift in Shift.objects.all():
+            self.assertFalse(
+                [period for period in time_off.get(shift.employee_id, []) if period[0] <= shift.date <= period[1]],
+                f"{shift.employee_id} works on {shift.date} during time off",
+            )
+            key = (shift.employee_id, shift.date)
+            day_hours[key] = day_hours.get(key, 0) + shift_hours(shift)
+        self.assertTrue(day_hours)
+        self.assertEqual({key: hours for key, hours in day_hours.items() if hours > limits[key[0]]}, {})
+
+    def test_time_off_and_daily_hours_are_respected(self):
+        departments = list(Department.objects.order_by('id').values_list('id', flat=True))
+        for solver in ('greedy', 'flow'):
+            with self.subTest(solver=solver):
+                generate_schedule_for_range(self.start_date, self.end_date, solver=solver, seed=1)
+                self.assert_constraints_hold()
+                # Ponovljeni pokreti po odjelu zbrajaju sate s postojećim smjenama drugih odjela
+                for department_id in departments:
+                    generate_schedule_for_range(self.start_date, self.end_date, departments=[department_id], solver=solver, seed=2)
+                self.assert_constraints_hold()
+
+class SnapshotPartitionTests(TestCase):
+    def test_components_carry_only_their_staff(self):
+        start_date, end_date = build_dataset(staff=150, days=3, shared_staff=0)
+        TimeOff.objects.create(employee=Employee.objects.order_by('id').first(), start_date=start_date, end_date=end_date, reason='holiday')
+        snapshot = SchedulingSnapshot.load([start_date, start_date + timedelta(days=1), end_date])
+        snapshot.prepare_eligibility()
+
+        components = snapshot.partition()
+        self.assertGreater(len(components), 1)
+        self.assertEqual(sum(len(component.employees) for component in components), len(snapshot.employees))
+        for component in components:
+            staff = {employee.id for employee in component.employees}
+            self.assertEqual(set(component.weekly_hours.get(start_date.isocalendar()[:2], {})) - staff, set())
+            self.assertEqual(set(component.time_off) - staff, set())
+            for requirements in component.requirements_by_date.values():
+                for requirement in requirements:
+                    # Indeksi podskupa daju iste kandidate kao puni snapshot
+                    self.assertEqual(component.employees_in_mask(component.eligible_mask(requirement)), requirement.candidates)
+
+class StartupImportTests(SimpleTestCase):
+    # Biblioteke koje smiju doći tek s prvim izvozom, nikad pri startu procesa
+    HEAVY_MODULES = {'pandas', 'numpy', 'openpyxl', 'reportlab'}
+
+    def imported_modules(self, code):
+        # -X importtime ispisuje svaki uvezeni modul na stderr ("import time: self | cumulative | modul")
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=Path(__file__).resolve().parent.parent,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'schedule_app.settings'},
+            capture_output=True, text=True, check=True,
+        )
+        return {
+            line.rsplit('|', 1)[1].strip().split('.')[0]
+            for line in result.stderr.splitlines()
+            if line.startswith('import time:') and line.count('|') == 2
+        }
+
+    def test_startup_does_not_import_export_libraries(self):
+        modules = self.imported_modules("import django; django.setup(); import schedule.admin, schedule.urls")
+        self.assertIn('schedule', modules)
+        self.assertFalse(modules & self.HEAVY_MODULES, f"Imported at startup: {sorted(modules & self.HEAVY_MODULES)}")
+
+class AdminChangelistQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start_date, end_date = build_dataset(staff=150, days=20)
+        generate_schedule_for_range(start_date, end_date, seed=1)
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def changelist_queries(self, model, per_page):
+        url = reverse(f'admin:schedule_{model._meta.model_name}_changelist')
+        with mock.patch.object(admin.site._registry[model], 'list_per_page', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.client.force_login(self.superuser)
+        for model in (Employee, ShiftRequirement, Shift, TimeOff, Role):
+            with self.subTest(model=model.__name__):
+                self.changelist_queries(model, 5)  # zagrijavanje (cache content typeova, sesija)
+                self.assertEqual(self.changelist_queries(model, 5), self.changelist_queries(model, 50))
+
+    def test_role_choices_do_not_grow_with_roles(self):
+        # Odjel uloge učitava admin, a ne zadani manager za cijelu aplikaciju
+        self.assertFalse(Role.objects.all().query.select_related)
+        self.client.force_login(self.superuser)
+        urls = [reverse(f'admin:schedule_{model._meta.model_name}_add') for model in (Employee, ShiftRequirement, RecurringRequirement, Shift)]
+        urls += [reverse('admin:schedule_employee_changelist'), reverse('admin:schedule_shift_changelist')]
+
+        def queries(url):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(captured)
+
+        for url in urls:
+            queries(url)  # zagrijavanje (cache content typeova, sesija)
+        before = {url: queries(url) for url in urls}
+        department = Department.objects.order_by('id').first()
+        Role.objects.bulk_create([Role(name=f"Extra role {number}", department=department) for number in range(20)])
+        self.assertEqual({url: queries(url) for url in urls}, before)
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.start_date, cls.end_date = build_dataset(staff=120, days=7, shared_staff=0.5)
+        generate_schedule_for_range(cls.start_date, cls.end_date, seed=1)
+
+    def test_csv_streams_header_and_every_shift(self):
+        response = export_response('csv', Shift.objects.all())
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode()
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], EXPORT_COLUMNS)
+        shifts = list(export_queryset(Shift.objects.all()))
+        self.assertEqual(len(rows) - 1, len(shifts))
+        for row, shift in zip(rows[1:], shifts):
+            self.assertEqual(row, [str(value) for value in shift_row(shift)])
+        self.assertAlmostEqual(sum(float(row[-1]) for row in rows[1:]), sum(shift_hours(shift) for shift in shifts), places=2)
+
+    def test_csv_view_filters_and_requires_permission(self):
+        departments = list(Department.objects.order_by('id').values_list('id', flat=True))
+        params = {'start_date': (self.start_date + timedelta(days=1)).isoformat(), 'end_date': (self.end_date - timedelta(days=1)).isoformat(), 'departments': str(departments[0])}
+        self.assertEqual(self.client.get(reverse('export_shifts_csv'), params).status_code, 302)
+        user = User.objects.create_user('viewer', password='password')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('export_shifts_csv'), params).status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_shift'))
+        self.client.force_login(User.objects.get(pk=user.pk))
+        response = self.client.get(reverse('export_shifts_csv'), params)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))[1:]
+        expected = Shift.objects.filter(date__range=(params['start_date'], params['end_date']), department=departments[0])
+        self.assertEqual(len(rows), expected.count())
+        self.assertGreater(len(rows), 0)
+        self.assertEqual({row[3] for row in rows}, {value.isoformat() for value in expected.values_list('date', flat=True)})
+        self.assertEqual(self.client.get(reverse('export_shifts_csv'), {'start_date': 'x'}).status_code, 400)
+
+    def test_excel_has_department_sheets_and_weekly_pivot(self):
+        from openpyxl import load_workbook
+
+        response = export_response('excel', Shift.objects.all())
+        self.assertEqual(response['Content-Type'], EXCEL_CONTENT_TYPE)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        sheets = {sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in workbook.worksheets}
+
+        departments = dict(Shift.objects.values_list('department__name').annotate(count=Count('id')))
+        self.assertGreater(len(departments), 1)
+        titles = list(sheets)
+        self.assertEqual((titles[0], titles[-1]), ('Schedule', 'Weekly Hours'))
+        self.assertEqual(set(titles[1:-1]), set(departments))
+        self.assertEqual(len(sheets['Schedule']) - 1, Shift.objects.count())
+        for name, count in departments.items():
+            self.assertEqual(list(sheets[name][0]), EXPORT_COLUMNS)
+            self.assertEqual(len(sheets[name]) - 1, count)
+
+        # Pivot: jedan redak po radniku, tjedni stupci se zbrajaju u Total
+        header, *pivot = sheets['Weekly Hours']
+        self.assertEqual((header[0], header[-1]), ('Employee', 'Total'))
+        self.assertEqual(len(pivot), Shift.objects.values('employee').distinct().count())
+        for row in pivot:
+            self.assertAlmostEqual(sum(row[1:-1]), row[-1], places=2)
+        self.assertAlmostEqual(sum(row[-1] for row in pivot), sum(row[-1] for row in sheets['Schedule'][1:]), places=1)
+
+    def test_pdf_has_a_table_per_department_week_and_is_cached(self):
+        response = export_response('pdf', Shift.objects.all())
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        self.assertGreaterEqual(len(re.findall(rb'/Type /Page\b(?!s)', content)), 1)
+
+        # Jedna tablica po odjelu i tjednu, sati u tablicama jednaki satima smjena
+        sections = list(iter_department_weeks(Shift.objects.all()))
+        expected = {(name, custom_date - timedelta(days=custom_date.weekday())) for name, custom_date in Shift.objects.values_list('department__name', 'date')}
+        self.assertEqual(sorted((name, week_start) for name, week_start, _ in sections), sorted(expected))
+        table_hours = sum(row['hours'] for _, _, employees in sections for row in employees.values())
+        self.assertAlmostEqual(table_hours, sum(shift_hours(shift) for shift in Shift.objects.all()), places=2)
+
+        # Ista verzija rasporeda: PDF iz cachea, bez upita u bazu
+        with self.assertNumQueries(0):
+            cached = export_response('pdf', Shift.objects.all())
+        self.assertEqual(cached.content, content)
+
+class CoverageReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.start_date, cls.end_date = build_dataset(staff=100, days=14)
+        generate_schedule_for_range(cls.start_date, cls.end_date, solver='flow', seed=1)
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_report_matches_shift_totals(self):
+        from .coverage import coverage_report
+
+        report, measured = measure(coverage_report, self.start_date, self.end_date)
+        shifts = Shift.objects.filter(date__range=(self.start_date, self.end_date))
+        self.assertAlmostEqual(sum(row['covered_hours'] for row in report['days']), sum(shift_hours(shift) for shift in shifts), places=2)
+        self.assertAlmostEqual(report['totals']['coverage'], coverage_ratio(self.start_date, self.end_date), places=3)
+        self.assertAlmostEqual(sum(row['hours'] for row in report['employees']), sum(row['hours'] for row in report['role_mix']), places=2)
+        self.assertLessEqual(measured['queries'], 7)
+
+    def test_json_and_admin_pages(self):
+        self.client.force_login(self.superuser)
+        params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat()}
+        response = self.client.get(reverse('coverage_report'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['start_date'], self.start_date.isoformat())
+        response = self.client.get(reverse('admin:schedule_shift_coverage'), params)
+        self.assertContains(response, 'Employee utilization')
+        self.assertEqual(self.client.get(reverse('coverage_report'), {'start_date': 'x'}).status_code, 400)
+
+    def test_report_requires_view_permission(self):
+        params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat()}
+        self.assertEqual(self.client.get(reverse('coverage_report'), params).status_code, 302)
+        user = User.objects.create_user('viewer', password='password', is_staff=True)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('coverage_report'), params).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:schedule_shift_coverage'), params).status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(codename='view_shift'))
+        self.client.force_login(User.objects.get(pk=user.pk))
+        self.assertEqual(self.client.get(reverse('coverage_report'), params).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:schedule_shift_coverage'), params).status_code, 200)
+
+@override_settings(SCHEDULE_ROSTER_TOKENS=['screen-token'], SCHEDULE_ROSTER_PUBLIC=False)
+class RosterApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.start_date, cls.end_date = build_dataset(staff=30, days=3)
+        generate_schedule_for_range(cls.start_date, cls.end_date, seed=1)
+
+    def get_roster(self, **headers):
+        params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat()}
+        headers.setdefault('authorization', 'Bearer screen-token')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('roster'), params, headers=headers)
+        return response, len(queries)
+
+    def test_roster_requires_token(self):
+        for authorization in ('', 'Bearer wrong-token'):
+            response, queries = self.get_roster(authorization=authorization)
+            self.assertEqual((response.status_code, queries), (401, 0))
+        response = self.client.get(reverse('roster'), {'token': 'screen-token'})
+        self.assertEqual(response.status_code, 200)
+        with self.settings(SCHEDULE_ROSTER_PUBLIC=True):
+            self.assertEqual(self.get_roster(authorization='')[0].status_code, 200)
+
+    def test_unchanged_roster_is_served_without_database(self):
+        response, _ = self.get_roster()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['shifts']), Shift.objects.filter(date__range=(self.start_date, self.end_date)).count())
+
+        cached, queries = self.get_roster()
+        self.assertEqual((cached.content, queries), (response.content, 0))
+        not_modified, queries = self.get_roster(if_none_match=response['ETag'])
+        self.assertEqual((not_modified.status_code, queries), (304, 0))
+        not_modified, queries = self.get_roster(if_modified_since=response['Last-Modified'])
+        self.assertEqual((not_modified.status_code, queries), (304, 0))
+
+    def test_shift_change_invalidates_roster(self):
+        response, _ = self.get_roster()
+        shift = Shift.objects.filter(date=self.start_date).first()
+        shift.save()
+        changed, queries = self.get_roster(if_none_match=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_renamed_user_invalidates_roster_and_pdf(self):
+        response, _ = self.get_roster()
+        pdf = b''.join(export_response('pdf', Shift.objects.all()).streaming_content)
+        user = Shift.objects.filter(date=self.start_date).first().employee.user
+        # Prijava (last_login) ne smije poništiti cache
+        user.save(update_fields=['last_login'])
+        self.assertEqual(self.get_roster(if_none_match=response['ETag'])[0].status_code, 304)
+
+        user.first_name = 'Renamed'
+        user.save()
+        changed, _ = self.get_roster(if_none_match=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Renamed', {shift['employee'].split()[0] for shift in changed.json()['shifts']})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotEqual(export_response('pdf', Shift.objects.all()).getvalue(), pdf)
+        self.assertGreater(len(queries), 0)
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        build_dataset(staff=5, days=1)
+        cls.superuser = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        role = Role.objects.order_by('id').first()
+        cls.department, cls.role = role.department, role
+        cls.shift_type = ShiftType.objects.order_by('id').first()
+        cls.day = Day.objects.order_by('id').first() or Day.objects.create(name='Monday')
+
+    def employees_csv(self, count, extra_rows=()):
+        lines = ['username,first_name,last_name,max_weekly_hours,max_daily_hours,departments,roles,available_days,can_work_shifts']
+        lines += [
+            f"imp{number},Import,User {number},40,8,{self.department.name},{self.role.name},{self.day.name},{self.shift_type.name}"
+            for number in range(count)
+        ]
+        lines += list(extra_rows)
+        return io.BytesIO("\n".join(lines).encode())
+
+    def test_employees_are_imported_in_batches_with_relations(self):
+        with CaptureQueriesContext(connection) as queries:
+            report = import_file('employees', self.employees_csv(120), 'staff.csv', batch_size=50)
+        self.assertEqual((report['created'], report['errors']), (120, []))
+        self.assertLess(len(queries), 40)
+        employee = Employee.objects.get(user__username='imp7')
+        self.assertEqual(list(employee.departments.all()), [self.department])
+        self.assertEqual(list(employee.roles.all()), [self.role])
+        self.assertEqual(list(employee.available_days.all()), [self.day])
+        self.assertEqual(list(employee.can_work_shifts.all()), [self.shift_type])
+
+    def test_dry_run_and_errors_save_nothing(self):
+        employees = Employee.objects.count()
+        report = import_file('employees', self.employees_csv(10), 'staff.csv', dry_run=True)
+        self.assertEqual((report['valid'], report['created'], report['committed']), (10, 0, False))
+
+        bad_rows = ['imp1,Dup,User,40,8,{0},{1},,'.format(self.department.name, self.role.name), 'nobody,,,x,8,Nowhere,,,']
+        report = import_file('employees', self.employees_csv(3, bad_rows), 'staff.csv')
+        self.assertEqual([row_number for row_number, _ in report['errors']], [5, 6])
+        self.assertFalse(report['committed'])
+        self.assertEqual(Employee.objects.count(), employees)
+
+    def test_requirements_from_xlsx(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(['department', 'date', 'required_hours', 'shift_types', 'required_roles'])
+        workbook.active.append([self.department.name, datetime(2030, 1, 7), 16, self.shift_type.name, self.role.name])
+        workbook.active.append([self.department.name, '2030-01-08', 8.0, self.shift_type.name, self.role.name])
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+
+        report = import_file('requirements', file, 'requirements.xlsx')
+        self.assertEqual((report['created'], report['errors']), (2, []))
+        requirement = ShiftRequirement.objects.get(date=date(2030, 1, 7))
+        self.assertEqual((requirement.required_hours, list(requirement.required_roles.all())), (16, [self.role]))
+
+    def test_admin_upload(self):
+        self.client.force_login(self.superuser)
+        upload = SimpleUploadedFile('staff.csv', self.employees_csv(2).getvalue(), content_type='text/csv')
+        response = self.client.post(reverse('admin:schedule_employee_import'), {'file': upload})
+        self.assertContains(response, 'Imported 2 rows')
+        self.assertTrue(Employee.objects.filter(user__username='imp1').exists())
+
+class RecurringRequirementTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=60, days=7)
+
+    def convert_to_templates(self):
+        # build_dataset daje isti zahtjev svaki dan, pa je jedan predložak po odjelu isto što i tjedan redaka
+        days = list(Day.objects.all())
+        for requirement in ShiftRequirement.objects.filter(date=self.start_date).order_by('id'):
+            template = RecurringRequirement.objects.create(department=requirement.department, required_hours=requirement.required_hours, valid_from=self.start_date)
+            template.days.set(days)
+            template.shift_types.set(requirement.shift_types.all())
+            template.required_roles.set(requirement.required_roles.all())
+        ShiftRequirement.objects.all().delete()
+
+    def generated_shifts(self, solver):
+        generate_schedule_for_range(self.start_date, self.end_date, solver=solver, seed=3)
+        return list(Shift.objects.order_by('date', 'department_id', 'start_time', 'employee_id').values_list('employee_id', 'department_id', 'date', 'start_time'))
+
+    def test_templates_generate_same_schedule_as_rows(self):
+        expected = {solver: self.generated_shifts(solver) for solver in ('greedy', 'flow')}
+        self.convert_to_templates()
+        for solver in ('greedy', 'flow'):
+            with self.subTest(solver=solver):
+                self.assertEqual(self.generated_shifts(solver), expected[solver])
+
+    def test_concrete_requirement_overrides_templates(self):
+        self.convert_to_templates()
+        template = RecurringRequirement.objects.order_by('id').first()
+        override = ShiftRequirement.objects.create(department=template.department, date=self.start_date, required_hours=8)
+        override.shift_types.set(template.shift_types.all())
+        override.required_roles.set(template.required_roles.all())
+
+        snapshot = SchedulingSnapshot.load([self.start_date, self.end_date])
+        first_day = [requirement for requirement in snapshot.requirements_by_date[self.start_date] if requirement.department_id == template.department_id]
+        last_day = [requirement for requirement in snapshot.requirements_by_date[self.end_date] if requirement.department_id == template.department_id]
+        self.assertEqual([(requirement.id, requirement.required_hours) for requirement in first_day], [(override.id, 8)])
+        self.assertEqual([requirement.required_hours for requirement in last_day], [template.required_hours])
+
+    def test_materialize_skips_existing_days(self):
+        self.convert_to_templates()
+        templates = RecurringRequirement.objects.all()
+        created = materialize_templates(templates, self.start_date, self.start_date + timedelta(days=2))
+        self.assertEqual(created, templates.count() * 3)
+        self.assertEqual(materialize_templates(templates, self.start_date, self.end_date), templates.count() * 4)
+        requirement = ShiftRequirement.objects.order_by('id').first()
+        self.assertEqual(requirement.required_roles.count(), templates.first().required_roles.count())
+
+class ScheduleScoringTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=60, days=7)
+        self.dates = [self.start_date + timedelta(days=offset) for offset in range(7)]
+
+    def generated_state(self):
+        # Isto stanje kao u generatoru: knjiga sati bez smjena koje se ocjenjuju
+        generate_schedule_for_range(self.start_date, self.end_date, seed=5)
+        snapshot = SchedulingSnapshot.load(self.dates)
+        snapshot.release_hours(shift_rows(Shift.objects.all()))
+        shifts = list(Shift.objects.order_by('date', 'department_id', 'start_time', 'employee_id'))
+        snapshot.prepare_eligibility()
+        return snapshot, shifts
+
+    def test_incremental_score_matches_full_score(self):
+        import random
+
+        snapshot, shifts = self.generated_state()
+        state = ScheduleState(snapshot, shifts)
+        movable = [slot for slot in state.slots if slot.requirement is not None]
+        rng = random.Random(1)
+        applied = 0
+        for _ in range(2000):
+            slot = rng.choice(movable)
+            other = rng.choice(state.slots_by_ordinal[slot.ordinal])
+            delta = state.swap_delta(slot, other)
+            if delta is not None:
+                state.swap(slot, other, delta)
+            else:
+                employee = rng.choice(slot.requirement.candidates)
+                delta = state.move_delta(slot, employee)
+                if delta is None:
+                    continue
+                state.move(slot, employee, delta)
+            applied += 1
+        self.assertGreater(applied, 0)
+        for name, value in state.full_components().items():
+            self.assertAlmostEqual(state.components[name], value, places=6, msg=name)
+
+    def test_improve_keeps_schedule_valid(self):
+        snapshot, shifts = self.generated_state()
+        before, after = improve_schedule(snapshot, shifts, iterations=20000, seed=5)
+        self.assertLessEqual(after['total'], before['total'])
+
+        stats = GenerationStats()
+        generate_schedule_for_range(self.start_date, self.end_date, seed=5, stats=stats, improve_iterations=20000)
+        scores = stats.as_dict()['scores']
+        self.assertLessEqual(scores['final']['total'], scores['generated']['total'])
+        # Repair provjerava ista pravila kao generator: nijedna poboljšana smjena ne smije pasti
+        report = repair_schedule(self.dates)
+        self.assertEqual((report['removed'], report['created']), (0, 0))
+
+    def test_improved_runs_are_reproducible(self):
+        def run():
+            stats = GenerationStats()
+            generate_schedule_for_range(self.start_date, self.end_date, solver='flow', seed=7, stats=stats, improve_iterations=20000)
+            return stats.scores['final'], list(Shift.objects.order_by('date', 'start_time', 'employee_id').values_list('employee_id', 'date', 'start_time'))
+
+        first = run()
+        self.assertEqual(run(), first)
+        self.assertGreater(first[0]['total'], 0)
+
+class RepairScheduleTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=60, days=7)
+        self.dates = [self.start_date + timedelta(days=offset) for offset in range(7)]
+        generate_schedule_for_range(self.start_date, self.end_date, seed=2)
+
+    def schedule(self):
+        return sorted(Shift.objects.values_list('employee_id', 'department_id', 'date', 'start_time'))
+
+    def test_repair_of_unchanged_schedule_is_noop(self):
+        before = self.schedule()
+        for _ in range(2):
+            summary = repair_schedule(self.dates, seed=2)
+            self.assertEqual((summary['removed'], summary['created']), (0, 0))
+        self.assertEqual(self.schedule(), before)
+
+    def test_repair_only_replaces_freed_hours(self):
+        hours_before = sum(shift_hours(shift) for shift in Shift.objects.all())
+        shift = Shift.objects.order_by('date', 'id').first()
+        TimeOff.objects.create(employee=shift.employee, start_date=shift.date, end_date=shift.date, reason='sick')
+
+        summary = repair_schedule(self.dates, seed=2)
+        self.assertEqual(summary['removed'], 1)
+        self.assertLessEqual(summary['created'], 1)
+        self.assertFalse(Shift.objects.filter(employee=shift.employee, date=shift.date).exists())
+        self.assertLessEqual(sum(shift_hours(shift) for shift in Shift.objects.all()), hours_before)
+        self.assertEqual(repair_schedule(self.dates, seed=2)['created'], 0)
+
+    def requirement_hours(self, requirement):
+        shifts = Shift.objects.filter(department=requirement.department, date=requirement.date)
+        return sum(shift_hours(shift) for shift in shifts)
+
+    def test_edited_requirement_is_filled_to_new_target(self):
+        requirement = ShiftRequirement.objects.order_by('date', 'id').first()
+        shifts = Shift.objects.filter(department=requirement.department, date=requirement.date)
+        # Zadržava se samo najrjeđe korišten tip, pa sve ostale smjene otpadaju
+        new_types = ShiftType.objects.filter(pk=min(requirement.shift_types.all(), key=lambda shift_type: shifts.filter(start_time=shift_type.start_time).count()).pk)
+        requirement.shift_types.set(new_types)
+
+        summary = repair_requirements(ShiftRequirement.objects.filter(pk=requirement.pk), seed=2)
+        self.assertGreater(summary['removed'], 0)
+        self.assertGreater(summary['created'], 0)
+        starts = set(Shift.objects.filter(department=requirement.department, date=requirement.date).values_list('start_time', flat=True))
+        self.assertLessEqual(starts, set(new_types.values_list('start_time', flat=True)))
+
+        hours_before = self.requirement_hours(requirement)
+        ShiftRequirement.objects.filter(pk=requirement.pk).update(required_hours=requirement.required_hours + 48)
+        summary = repair_requirements(ShiftRequirement.objects.filter(pk=requirement.pk), seed=2)
+        self.assertGreater(summary['created'], 0)
+        self.assertGreater(self.requirement_hours(requirement), hours_before)
+
+    def test_removed_employee_shifts_are_refilled(self):
+        employee_id = Shift.objects.values('employee').annotate(count=Count('id')).order_by('-count', 'employee').values_list('employee', flat=True)[0]
+        affected = set(Shift.objects.filter(employee_id=employee_id).values_list('department_id', 'date'))
+        removed_hours = sum(shift_hours(shift) for shift in Shift.objects.filter(employee_id=employee_id))
+        hours_before = sum(shift_hours(shift) for shift in Shift.objects.all())
+        untouched = [row for row in self.schedule() if row[0] != employee_id and row[1:3] not in affected]
+
+        summary = remove_employees(Employee.objects.filter(pk=employee_id), seed=2)
+        self.assertFalse(Employee.objects.filter(pk=employee_id).exists())
+        self.assertGreater(summary['created'], 0)
+        self.assertGreater(sum(shift_hours(shift) for shift in Shift.objects.all()), hours_before - removed_hours)
+        # Dani i odjeli u kojima radnik nije radio ostaju isti
+        self.assertEqual([row for row in self.schedule() if row[1:3] not in affected], untouched)
+
+    def test_admin_delete_of_employee_repairs(self):
+        employee_id = Shift.objects.order_by('date', 'id').values_list('employee_id', flat=True)[0]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:schedule_employee_delete', args=[employee_id]), {'post': 'yes'}, follow=True)
+        self.assertContains(response, 'Schedule repaired')
+        self.assertFalse(Shift.objects.filter(employee_id=employee_id).exists())
+
+    def test_view_requires_staff_post(self):
+        params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat()}
+        self.assertEqual(self.client.get(reverse('repair_schedule'), params).status_code, 405)
+        self.assertEqual(self.client.post(reverse('repair_schedule'), params).status_code, 302)
+        self.client.force_login(User.objects.create_user('viewer', password='password'))
+        self.assertEqual(self.client.post(reverse('repair_schedule'), params).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('planner', password='password', is_staff=True))
+        response = self.client.post(reverse('repair_schedule'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 0)
+
+class WeeklyHoursLedgerTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=60, days=7)
+        self.dates = [self.start_date + timedelta(days=offset) for offset in range(7)]
+
+    def assert_ledger_matches_shifts(self):
+        # Ledger koji održavaju signali mora biti jednak punoj rekonstrukciji iz smjena
+        def rows():
+            return sorted(WeeklyHours.objects.filter(minutes__gt=0).values_list('employee_id', 'iso_year', 'iso_week', 'minutes'))
+
+        ledger = rows()
+        rebuild_weekly_hours()
+        self.assertEqual(ledger, rows())
+        self.assertTrue(ledger)
+
+    def test_ledger_follows_every_change(self):
+        generate_schedule_for_range(self.start_date, self.end_date, seed=3)
+        self.assert_ledger_matches_shifts()
+
+        # Izmjena jedne smjene: drugi radnik, drugi tjedan i noćni kraj
+        shift = Shift.objects.order_by('date', 'id').first()
+        shift.employee = Employee.objects.exclude(pk=shift.employee_id).order_by('id').first()
+        shift.date = shift.date - timedelta(days=7)
+        shift.start_time, shift.end_time = time(22, 0), time(6, 0)
+        shift.save()
+        self.assert_ledger_matches_shifts()
+
+        Shift.objects.filter(pk=Shift.objects.order_by('-date', 'id').values('pk')[:1]).get().delete()
+        self.assert_ledger_matches_shifts()
+
+        generate_schedule_for_range(self.start_date, self.end_date, departments=[shift.department_id], seed=4)
+        self.assert_ledger_matches_shifts()
+
+        employee_id = Shift.objects.filter(date=self.start_date).values_list('employee_id', flat=True).first()
+        TimeOff.objects.create(employee_id=employee_id, start_date=self.start_date, end_date=self.end_date, reason='sick')
+        summary = repair_schedule(self.dates, seed=3)
+        self.assertGreater(summary['removed'], 0)
+        self.assert_ledger_matches_shifts()
+
+    def test_failed_write_keeps_previous_schedule_and_ledger(self):
+        generate_schedule_for_range(self.start_date, self.end_date, seed=3)
+        shifts_before = sorted(Shift.objects.values_list('id', 'employee_id', 'department_id', 'date', 'start_time', 'end_time'))
+        ledger_before = sorted(WeeklyHours.objects.values_list('employee_id', 'iso_year', 'iso_week', 'minutes'))
+        bulk_create = Shift.objects.bulk_create
+
+        def fail_halfway(shifts, *args, **kwargs):
+            # Prva polovica se stvarno upiše, pa upis pukne
+            bulk_create(shifts[:len(shifts) // 2], *args, **kwargs)
+            raise DatabaseError('disk full')
+
+        with mock.patch.object(Shift.objects, 'bulk_create', side_effect=fail_halfway):
+            with self.assertRaises(DatabaseError):
+                generate_schedule_for_range(self.start_date, self.end_date, seed=4)
+
+        self.assertEqual(sorted(Shift.objects.values_list('id', 'employee_id', 'department_id', 'date', 'start_time', 'end_time')), shifts_before)
+        self.assertEqual(sorted(WeeklyHours.objects.values_list('employee_id', 'iso_year', 'iso_week', 'minutes')), ledger_before)
+
+class GenerationViewTests(TestCase):
+    def setUp(self):
+        self.start_date, self.end_date = build_dataset(staff=30, days=3)
+        self.params = {'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat(), 'seed': 1}
+
+    def test_generation_requires_staff_post(self):
+        self.assertEqual(self.client.get(reverse('generate_schedule'), self.params).status_code, 405)
+        self.assertEqual(self.client.post(reverse('generate_schedule'), self.params).status_code, 302)
+        self.assertFalse(Shift.objects.exists())
+
+        self.client.force_login(User.objects.create_user('planner', password='password', is_staff=True))
+        response = self.client.post(reverse('generate_schedule'), self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['shifts_created'], Shift.objects.count())
+        response = self.client.post(reverse('generate_schedule'), {**self.params, 'background': 1, 'improve_iterations': 50})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(GenerationJob.objects.get(pk=response.json()['job_id']).improve_iterations, 50)
+        too_long = {**self.params, 'end_date': (self.start_date + timedelta(days=GENERATION_MAX_DAYS)).isoformat()}
+        self.assertEqual(self.client.post(reverse('generate_schedule'), too_long).status_code, 400)
+
+    def test_overlapping_jobs_conflict_only_when_departments_share_staff(self):
+        self.client.force_login(User.objects.create_user('planner', password='password', is_staff=True))
+        department = Department.objects.order_by('id').first()
+        other = Department.objects.create(name='Other')
+        # U TestCase transakcija nikad ne završi, pa posao ostaje 'pending'
+        response = self.client.post(reverse('generate_schedule'), {**self.params, 'background': 1, 'departments': department.pk})
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+
+        # Odjel bez zajedničkih radnika radi istodobno; isti odjel ili svi odjeli čekaju
+        self.assertEqual(self.client.post(reverse('generate_schedule'), {**self.params, 'background': 1, 'departments': other.pk}).status_code, 202)
+        self.assertEqual(self.client.post(reverse('generate_schedule'), {**self.params, 'background': 1, 'departments': department.pk}).status_code, 409)
+        self.assertEqual(self.client.post(reverse('generate_schedule'), self.params).status_code, 409)
+        later = {**self.params, 'background': 1, 'start_date': (self.end_date + timedelta(days=1)).isoformat(), 'end_date': (self.end_date + timedelta(days=1)).isoformat()}
+        self.assertEqual(self.client.post(reverse('generate_schedule'), later).status_code, 202)
+
+        # Radnik u oba odjela ih spaja u istu komponentu
+        shared = Department.objects.create(name='Shared')
+        Employee.objects.order_by('id').first().departments.add(shared)
+        self.assertEqual(self.client.post(reverse('generate_schedule'), {**self.params, 'background': 1, 'departments': shared.pk}).status_code, 409)
+
+        self.assertEqual(self.client.get(status_url).json()['status'], 'pending')
+        self.client.logout()
+        self.assertEqual(self.client.get(status_url).status_code, 302)
+
+    def test_run_generation_job_reports_progress(self):
+        job = submit_generation_job([self.start_date + timedelta(days=offset) for offset in range(3)], solver='flow', seed=1, improve_iterations=500)
+        self.assertEqual(job_status(job)['status'], 'pending')
+        progress = []
+        original_update = QuerySet.update
+
+        def record_update(queryset, **kwargs):
+            if queryset.model is GenerationJob:
+                progress.append(kwargs)
+            return original_update(queryset, **kwargs)
+
+        # Thread posla zatvara svoju konekciju; ovdje je to konekcija testa
+        with mock.patch('schedule.jobs.connections'), mock.patch.object(QuerySet, 'update', record_update):
+            run_generation_job(job.pk)
+
+        job.refresh_from_db()
+        status = job_status(job)
+        self.assertEqual(status['status'], 'done', status['error'])
+        self.assertEqual(status['requirements_done'], status['requirements_total'])
+        self.assertGreater(status['requirements_total'], 0)
+        self.assertEqual(status['shifts_created'], Shift.objects.count())
+        self.assertAlmostEqual(status['hours_covered'], sum(shift_hours(shift) for shift in Shift.objects.all()), places=2)
+        self.assertIsNotNone(status['started_at'])
+        self.assertIsNotNone(status['finished_at'])
+
+        # Pozadinski posao koristi isti broj pokušaja i daje istu ocjenu kao izravno generiranje
+        self.assertEqual(status['improve_iterations'], 500)
+        stats = GenerationStats()
+        generate_schedule_for_range(self.start_date, self.end_date, solver='flow', seed=1, stats=stats, improve_iterations=500)
+        self.assertEqual(status['score'], stats.scores['final']['total'])
+        # Napredak se sprema nakon svakog dana, ne samo na kraju
+        done = [update['requirements_done'] for update in progress if 'requirements_done' in update]
+        self.assertEqual(done, sorted(done))
+        self.assertGreater(len(done), 2)
+
+        failing = submit_generation_job([self.start_date], solver='flow', seed=1)
+        with mock.patch('schedule.jobs.connections'), mock.patch('schedule.jobs.generate_schedule_for_dates', side_effect=RuntimeError('boom')):
+            run_generation_job(failing.pk)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.error), ('failed', "RuntimeError('boom')"))
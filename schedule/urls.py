@@ -1,6 +1,11 @@
 from django.urls import path
-from .views import generate_schedule_view
+from .views import generate_schedule_view, repair_schedule_view, generation_job_status_view, export_shifts_csv_view, coverage_report_view, roster_view
 
 urlpatterns = [
     path('generate-schedule/', generate_schedule_view, name='generate_schedule'),
+    path('repair-schedule/', repair_schedule_view, name='repair_schedule'),
+    path('jobs/<int:job_id>/', generation_job_status_view, name='generation_job_status'),
+    path('export/shifts.csv', export_shifts_csv_view, name='export_shifts_csv'),
+    path('roster/', roster_view, name='roster'),
+    path('reports/coverage/', coverage_report_view, name='coverage_report'),
 ]
@@ -1,49 +1,199 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import timedelta, datetime
+import django
+from django.conf import settings
 from django.utils.timezone import now
 from django.apps import apps
+from django.db import transaction
+from django.utils.module_loading import import_string
+from time import monotonic
+import os
 import random
 
+from .instrumentation import GenerationStats, logger
+from .intervals import ShiftIntervalIndex
+from .ledger import replace_shifts, shift_rows
+from .scoring import DEFAULT_IMPROVE_ITERATIONS, improve_schedule
+from .signals import schedule_changed
+from .snapshot import SchedulingSnapshot
+
+# Broj smjena po jednom INSERT upitu
+SHIFT_BATCH_SIZE = 500
+# Ispod ovoga broja zahtjeva pokretanje procesa košta više nego što donosi
+PARALLEL_MIN_REQUIREMENTS = 50
+
+# === SOLVERI ===
+# Svaki solver dodjeljuje smjene za jedan dan; bira se po imenu za svako generiranje
+SOLVERS = {
+    'greedy': 'schedule.utils.assign_shifts_for_day',
+    'flow': 'schedule.solvers.assign_shifts_for_day_optimal',
+}
+DEFAULT_SOLVER = 'greedy'
+# Vremenski budžet (s) za optimalni solver; nakon isteka ostatak dana radi greedy
+DEFAULT_TIME_LIMIT = 10
+
+def get_solver(name):
+    if name not in SOLVERS:
+        raise ValueError(f"Nepoznat solver '{name}', dostupni: {', '.join(SOLVERS)}")
+    return import_string(SOLVERS[name])
+
 def generate_schedule_for_day(custom_date):
-    ShiftRequirement = apps.get_model('schedule', 'ShiftRequirement')
-    Shift = apps.get_model('schedule', 'Shift')
-    Employee = apps.get_model('schedule', 'Employee')
-    ShiftType = apps.get_model('schedule', 'ShiftType')
+    return generate_schedule_for_range(custom_date, custom_date)
+
+def generate_schedule_for_range(start_date, end_date, departments=None, solver=DEFAULT_SOLVER, time_limit=DEFAULT_TIME_LIMIT, seed=None, progress=None, workers=None, stats=None, improve_iterations=DEFAULT_IMPROVE_ITERATIONS):
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    return generate_schedule_for_dates(dates, departments, solver, time_limit, seed, progress, workers, stats, improve_iterations)
+
+def generate_schedule_for_dates(dates, departments=None, solver=DEFAULT_SOLVER, time_limit=DEFAULT_TIME_LIMIT, seed=None, progress=None, workers=None, stats=None, improve_iterations=DEFAULT_IMPROVE_ITERATIONS):
+    get_solver(solver)  # nepoznat solver javljamo prije bilo kakvog posla
+    # ⏱️ Pozivatelj može proslijediti svoj GenerationStats da dobije vremena, upite i brojače
+    stats = stats if stats is not None else GenerationStats()
+
+    # 📅 Svaki datum obrađujemo samo jednom, bez obzira koliko puta je zatražen
+    dates = sorted(set(dates))
+    if not dates:
+        return []
+
+    logger.info("📅 === GENERIRANJE RASPOREDA: %s - %s (%d dana, solver %s) ===", dates[0], dates[-1], len(dates), solver)
+
+    # 📥 Sve potrebne podatke za cijeli raspon učitavamo odjednom (fiksni broj upita)
+    with stats.phase('load'):
+        snapshot = SchedulingSnapshot.load(dates, departments)
+        # ⚖️ Tjedni fond iz knjige sati, bez smjena koje ovo generiranje zamjenjuje
+        snapshot.release_hours(shift_rows(replaced_shifts(dates, departments)))
+        # 🔒 Smjene koje ostaju (drugi odjeli, susjedni dani) zauzimaju radnike
+        snapshot.load_fixed_shifts()
+
+    if not snapshot.requirements_by_date:
+        logger.warning("⚠️ Nema ShiftRequirement unosa za %s - %s!", dates[0], dates[-1])
+        return []
+
+    with stats.phase('eligibility'):
+        snapshot.prepare_eligibility()
+
+    # 📈 Napredak se javlja nakon svakog dana (npr. za pozadinske poslove)
+    status = {
+        'requirements_total': sum(len(requirements) for requirements in snapshot.requirements_by_date.values()),
+        'requirements_done': 0,
+        'hours_required': sum(requirement.required_hours for requirements in snapshot.requirements_by_date.values() for requirement in requirements),
+        'hours_covered': 0,
+        'shifts_created': 0,
+    }
+
+    def advance(requirements_done, hours_covered, shifts_created):
+        status['requirements_done'] += requirements_done
+        status['hours_covered'] += hours_covered
+        status['shifts_created'] += shifts_created
+        if progress:
+            progress(status)
+
+    advance(0, 0, 0)
+
+    # 🧩 Odjeli bez zajedničkih radnika su neovisni pa se rješavaju zasebno, po potrebi u više procesa
+    components = snapshot.partition()
+    workers = min(workers or getattr(settings, 'SCHEDULE_GENERATION_WORKERS', None) or os.cpu_count() or 1, len(components))
+    deadline = monotonic() + time_limit if time_limit else None
+
+    # 🧠 Dodjela za cijeli raspon radi se u memoriji, a tek na kraju spremamo u bazu
+    shifts = []
+    with stats.phase('assignment'):
+        if workers > 1 and status['requirements_total'] >= PARALLEL_MIN_REQUIREMENTS:
+            logger.info("🧩 %d neovisnih grupa odjela, rješavam u %d procesa", len(components), workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=setup_worker) as pool:
+                futures = [
+                    pool.submit(solve_component, component, solver, time_limit, component_seed(seed, component))
+                    for component in components
+                ]
+                for future in as_completed(futures):
+                    component_shifts, totals, component_stats = future.result()
+                    shifts.extend(component_shifts)
+                    stats.merge(component_stats)
+                    advance(*totals)
+        else:
+            for component in components:
+                remaining = max(deadline - monotonic(), 0.001) if deadline is not None else None
+                component_shifts, _, _ = solve_component(component, solver, remaining, component_seed(seed, component), advance, stats)
+                shifts.extend(component_shifts)
+
+    # Redoslijed ne smije ovisiti o tome koji je proces prvi završio
+    shifts.sort(key=lambda shift: (shift.date, shift.department_id, shift.start_time, shift.employee_id))
+
+    # 🧮 Lokalna pretraga (pravednost sati, priority, dani zaredom) uz ocjenu prije i poslije
+    with stats.phase('improve'):
+        stats.scores['generated'], stats.scores['final'] = improve_schedule(snapshot, shifts, improve_iterations, seed, stats)
+
+    with stats.phase('persist'):
+        persist_shifts(dates, departments, shifts)
+
+    stats.log_summary()
+    logger.info("✅✅ Raspored generiran uspješno: %d smjena, %d/%d sati", len(shifts), status['hours_covered'], status['hours_required'])
+    return shifts
+
+# === NEOVISNE GRUPE ODJELA ===
 
-    # 🗑️ Obriši sve postojeće smjene prije generiranja novih
-    deleted_count, _ = Shift.objects.filter(date=custom_date).delete()
-    print(f"🗑️ Obrišeno {deleted_count} smjena za {custom_date}, generiram novi raspored...\n")
+def setup_worker():
+    # Kod "spawn" pokretanja procesa Django još nije inicijaliziran
+    if not apps.ready:
+        django.setup()
+
+def component_seed(seed, component):
+    # Seed po grupi ne ovisi o broju procesa ni redoslijedu izvršavanja
+    if seed is None:
+        return None
+    return f"{seed}:{','.join(str(department_id) for department_id in component.departments)}"
+
+def solve_component(snapshot, solver, time_limit, seed, progress=None, stats=None):
+    # Radi isključivo nad snapshotom, bez pristupa bazi, pa može u zasebnom procesu
+    stats = stats if stats is not None else GenerationStats()
+    assign = get_solver(solver)
+    # 🎲 Isti seed nad istim podacima uvijek daje isti raspored
+    rng = random.Random(seed)
+    deadline = monotonic() + time_limit if time_limit else None
 
-    print(f"\n📅 === GENERIRANJE RASPOREDA: {custom_date} ===\n")
     shifts = []
-    employee_hours = {}
+    employee_hours = snapshot.employee_hours()  # ISO tjedan -> {radnik: sati}, datum -> {radnik: sati}
+    intervals = ShiftIntervalIndex()
+    snapshot.seed_fixed_shifts(employee_hours, intervals)
+    totals = [0, 0, 0]
+    for custom_date, requirements in snapshot.requirements_by_date.items():
+        if deadline is not None and monotonic() >= deadline and assign is not assign_shifts_for_day:
+            logger.warning("⏱️ Isteklo vrijeme za solver '%s', %s generiram pohlepno.", solver, custom_date)
+            assign = assign_shifts_for_day
+        hours_before = sum(employee_hours.get(custom_date.isocalendar()[:2], {}).values())
+        day_shifts = assign(snapshot, custom_date, requirements, employee_hours, intervals, shifts, deadline=deadline, rng=rng, stats=stats)
+        day_totals = (len(requirements), round(sum(employee_hours[custom_date.isocalendar()[:2]].values()) - hours_before, 2), len(day_shifts))
+
+        totals = [total + value for total, value in zip(totals, day_totals)]
+        if progress:
+            progress(*day_totals)
+    return shifts, totals, stats
+
+def assign_shifts_for_day(snapshot, custom_date, shift_requirements, employee_hours, intervals, shifts, deadline=None, rng=random, stats=None):
+    day_shifts = []
     assigned_employees = set()
+    week = custom_date.isocalendar()[:2]
+    weekday = custom_date.strftime('%A')
 
-    shift_requirements = ShiftRequirement.objects.filter(date=custom_date)
-
-    if not shift_requirements.exists():
-        print("⚠️ Nema ShiftRequirement unosa za ovaj dan!")
-        return shifts
+    # Tjedni fond sati vodimo po ISO tjednu, pa se dani istog tjedna zbrajaju;
+    # dnevni fond (max_daily_hours) je u istom rječniku pod ključem datuma
+    week_hours = employee_hours.setdefault(week, {})
+    day_hours = employee_hours.setdefault(custom_date, {})
 
     for requirement in shift_requirements:
         total_hours_needed = requirement.required_hours
-        assigned_hours = 0  
-        full_day_shifts = 0  
-
-        print(f"\n📌 Obrada {requirement.department.name} za {requirement.date.strftime('%A')} ({requirement.date})")
-        print(f"📊 Potrebno sati: {total_hours_needed}h")
+        assigned_hours = 0
+        full_day_shifts = 0
 
-        allowed_shifts = sorted(requirement.shift_types.all(), key=lambda x: x.start_time)
-        print(f"🔍 Dozvoljene smjene: {', '.join([s.name for s in allowed_shifts])}")
+        allowed_shifts = requirement.shift_types
+        logger.debug("📌 Obrada %s za %s (%s), potrebno sati: %dh, dozvoljene smjene: %s",
+                     requirement.department_name, weekday, custom_date, total_hours_needed, ", ".join(s.name for s in allowed_shifts))
 
-        available_employees = list(Employee.objects.filter(
-            departments=requirement.department,
-            available_days__name=requirement.date.strftime('%A'),
-            roles__in=requirement.required_roles.all()
-        ).distinct().order_by('-max_weekly_hours', 'priority'))
-        random.shuffle(available_employees)
+        # Kandidati dolaze u stabilnom redoslijedu (-max_weekly_hours, priority, id), pa miješanje ovisi samo o seedu
+        available_employees = snapshot.eligible_employees(requirement)
+        rng.shuffle(available_employees)
 
         if not available_employees:
-            print("⚠️ NEMA DOSTUPNIH RADNIKA!")
+            logger.warning("⚠️ NEMA DOSTUPNIH RADNIKA za %s (%s)!", requirement.department_name, custom_date)
             continue
 
         shift_employee_map = {}
@@ -52,111 +202,144 @@ def generate_schedule_for_day(custom_date):
 
             # **🛑 Ako smo već popunili svih 24h, preskačemo dodatne smjene**
             if assigned_hours >= total_hours_needed:
-                assigned_hours = total_hours_needed  
-                print(f"❌ Preskačem smjenu {shift_type.name} jer su svi sati popunjeni ({assigned_hours}/{total_hours_needed}).")
-                continue  
+                assigned_hours = total_hours_needed
+                logger.debug("❌ Preskačem smjenu %s jer su svi sati popunjeni (%d/%d).", shift_type.name, assigned_hours, total_hours_needed)
+                continue
 
-            print(f"\n🕒 Obrada smjene: {shift_type.name} ({shift_start.strftime('%H:%M')} - {shift_end.strftime('%H:%M')})")
+            logger.debug("🕒 Obrada smjene: %s (%s - %s)", shift_type.name, shift_start, shift_end)
 
             # ✅ **Ako su već dodijeljene dvije smjene 08-20, preskačemo dodatne smjene**
             if full_day_shifts >= 2:
                 assigned_hours = total_hours_needed
-                print(f"❌ Preskačem smjenu {shift_type.name} jer su svi sati popunjeni ({assigned_hours}/{total_hours_needed}).")
-                continue  
+                logger.debug("❌ Preskačem smjenu %s jer su svi sati popunjeni (%d/%d).", shift_type.name, assigned_hours, total_hours_needed)
+                continue
 
-            employees_for_shift = find_available_employees(available_employees, employee_hours, shift_type, assigned_employees, shifts)
+            employees_for_shift = find_available_employees(available_employees, week_hours, day_hours, shift_type, snapshot.shift_type_mask(shift_type), assigned_employees, intervals, custom_date, stats)
             if not employees_for_shift:
-                continue  
+                continue
 
             max_employees_needed = max(1, (total_hours_needed - assigned_hours) // shift_duration)
             employees_for_shift = employees_for_shift[:max_employees_needed]
 
             for employee in employees_for_shift:
                 if assigned_hours + shift_duration > total_hours_needed:
-                    print(f"⚠️ Smjena {shift_start.strftime('%H:%M')} - {shift_end.strftime('%H:%M')} prelazi potreban fond sati! Preskačem.")
-                    break  
+                    logger.debug("⚠️ Smjena %s - %s prelazi potreban fond sati! Preskačem.", shift_start, shift_end)
+                    break
 
                 shift_key = (shift_start, shift_end)
                 if shift_key not in shift_employee_map:
                     shift_employee_map[shift_key] = set()
 
                 if employee not in shift_employee_map[shift_key]:
-                    create_shift(employee, requirement, shift_start, shift_end, shift_duration, shifts, employee_hours, assigned_employees)
+                    create_shift(employee, requirement, shift_start, shift_end, shift_duration, day_shifts, week_hours, day_hours, assigned_employees, intervals, stats)
                     shift_employee_map[shift_key].add(employee)
-                    
+
                     assigned_hours += shift_duration
                     if assigned_hours >= total_hours_needed:
-                        assigned_hours = total_hours_needed  
-                        break  
+                        assigned_hours = total_hours_needed
+                        break
 
                 if shift_type.name == "8-20":
                     full_day_shifts += 1
 
-        print(f"\n👥 Radnici dodijeljeni za {requirement.date} ({requirement.department.name}): {', '.join([e.user.username for e in assigned_employees])}")
-        print(f"📊 Ukupno sati pokriveno: {total_hours_needed}/{total_hours_needed}")
+        logger.debug("📊 %s (%s): pokriveno %d/%dh", requirement.department_name, custom_date, assigned_hours, total_hours_needed)
 
-    print("\n✅✅ **Raspored generiran uspješno!** ✅✅")
-    return shifts
+    shifts.extend(day_shifts)
+    return day_shifts
 
 # === FUNKCIJE ZA DODJELU SMJENA ===
 
-def find_available_employees(available_employees, employee_hours, shift_type, assigned_employees, shifts):
+def find_available_employees(available_employees, employee_hours, day_hours, shift_type, allowed_mask, assigned_employees, intervals, custom_date, stats=None):
     shift_duration = shift_type.duration_hours
     selected_employees = []
-    
+    scanned = rejected = 0
+
     for employee in available_employees:
-        total_assigned_hours = employee_hours.get(employee.user.username, 0)
+        scanned += 1
+        total_assigned_hours = employee_hours.get(employee.id, 0)
+
+        # can_work_shifts je jedan bit po radniku u maski smjene
+        if not allowed_mask >> employee.index & 1:
+            continue
 
         if total_assigned_hours >= employee.max_weekly_hours:
             continue
 
-        if any(shift.employee == employee and shift.start_time == shift_type.start_time and shift.end_time == shift_type.end_time for shift in shifts):
+        if day_hours.get(employee.id, 0) + shift_duration > employee.max_daily_hours:
+            continue
+
+        if intervals.contains(employee.id, custom_date, shift_type.start_time, shift_type.end_time):
             continue
-        
+
         if total_assigned_hours + shift_duration <= employee.max_weekly_hours and employee not in assigned_employees:
-            if not check_shift_overlap(employee, shift_type, shifts):
+            if not check_shift_overlap(employee, shift_type, intervals, custom_date):
                 selected_employees.append(employee)
-        
+            else:
+                rejected += 1
+
         if len(selected_employees) >= 2:
             break
+
+    if stats is not None:
+        stats.count('candidates_scanned', scanned)
+        stats.count('overlaps_rejected', rejected)
     return selected_employees
 
-def check_shift_overlap(employee, shift_type, shifts):
-    for shift in shifts:
-        if shift.employee == employee:
-            if not (shift.end_time <= shift_type.start_time or shift.start_time >= shift_type.end_time):
-                return True
-    return False
+def check_shift_overlap(employee, shift_type, intervals, custom_date):
+    # O(log k) upit nad intervalima radnika, uključujući smjene preko ponoći
+    return intervals.overlaps(employee.id, custom_date, shift_type.start_time, shift_type.end_time)
 
-def create_shift(employee, requirement, shift_start, shift_end, shift_duration, shifts, employee_hours, assigned_employees):
+def create_shift(employee, requirement, shift_start, shift_end, shift_duration, shifts, employee_hours, day_hours, assigned_employees, intervals, stats=None):
     Shift = apps.get_model('schedule', 'Shift')
 
-    # 🛑 Sprječavanje duplikata
-    existing_shift = Shift.objects.filter(
-        employee=employee,
-        department=requirement.department,
-        date=requirement.date,
-        start_time=shift_start,
-        end_time=shift_end
-    ).exists()
-
-    if existing_shift:
-        print(f"⚠️ Smjena već postoji za {employee.user.first_name} {employee.user.last_name} ({employee.user.username}) {shift_start.strftime('%H:%M')} - {shift_end.strftime('%H:%M')}, preskačem!")
-        return  # Ako postoji, ne dodaj je ponovo
-
-    # ✅ Ako smjena ne postoji, kreiraj novu
+    # Smjena se samo priprema u memoriji, spremanje radi persist_shifts
     shift = Shift(
-        employee=employee,
-        department=requirement.department,
-        role=employee.roles.first(),
+        employee_id=employee.id,
+        department_id=requirement.department_id,
+        role_id=employee.role_id,
         date=requirement.date,
         start_time=shift_start,
         end_time=shift_end
     )
-    shift.save()
     shifts.append(shift)
+    intervals.add(employee.id, requirement.date, shift_start, shift_end)
 
-    employee_hours[employee.user.username] = employee_hours.get(employee.user.username, 0) + shift_duration
+    employee_hours[employee.id] = employee_hours.get(employee.id, 0) + shift_duration
+    day_hours[employee.id] = day_hours.get(employee.id, 0) + shift_duration
     assigned_employees.add(employee)
 
-    print(f"✅ Dodijeljena smjena: {employee.user.first_name} {employee.user.last_name} ({employee.user.username}) {shift_start.strftime('%H:%M')} - {shift_end.strftime('%H:%M')}")
+    if stats is not None:
+        stats.count('shifts_created')
+    logger.debug("✅ Dodijeljena smjena: %s %s (%s) %s %s - %s", employee.first_name, employee.last_name, employee.username, requirement.date, shift_start, shift_end)
+
+def replaced_shifts(dates, departments):
+    Shift = apps.get_model('schedule', 'Shift')
+    existing_shifts = Shift.objects.filter(date__in=dates)
+    if departments is not None:
+        existing_shifts = existing_shifts.filter(department__in=departments)
+    return existing_shifts
+
+def persist_shifts(dates, departments, shifts):
+    Shift = apps.get_model('schedule', 'Shift')
+
+    # 🛑 Sprječavanje duplikata iz memorije, bez upita po smjeni
+    seen = set()
+    new_shifts = []
+    for shift in shifts:
+        shift_key = (shift.employee_id, shift.department_id, shift.date, shift.start_time, shift.end_time)
+        if shift_key in seen:
+            logger.warning("⚠️ Smjena već postoji za radnika #%s %s %s - %s, preskačem!", shift.employee_id, shift.date, shift.start_time, shift.end_time)
+            continue
+        seen.add(shift_key)
+        new_shifts.append(shift)
+
+    # Brisanje i upis u jednoj transakciji: ako upis padne, stari raspored ostaje netaknut
+    with transaction.atomic():
+        # 🗑️ Obriši sve postojeće smjene i spremi nove; knjiga sati dobiva samo razliku
+        deleted_count = replace_shifts(replaced_shifts(dates, departments), new_shifts, batch_size=SHIFT_BATCH_SIZE)
+        logger.info("🗑️ Obrisano %d smjena za %d dana, spremljen novi raspored.", deleted_count, len(dates))
+
+        # bulk_create i delete ne šalju signale modela; novi raspored = nova verzija
+        transaction.on_commit(lambda: schedule_changed.send(sender=Shift))
+
+    shifts[:] = new_shifts
@@ -1,8 +1,171 @@
-from django.http import JsonResponse
+from datetime import date, timedelta
+from functools import wraps
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required, permission_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.timezone import now
-from .utils import generate_schedule_for_day  # ⬅️ ISPRAVNO: Import bez pozivanja funkcije
+from django.views.decorators.http import condition, require_POST
+from .exports import csv_response
+from .instrumentation import GenerationStats
+from .jobs import conflicting_job, submit_generation_job, job_status
+from .models import GenerationJob, Shift
+from .repair import repair_schedule
+from .scoring import DEFAULT_IMPROVE_ITERATIONS, MAX_IMPROVE_ITERATIONS
+from .roster import ROSTER_MAX_DAYS, roster_access_allowed, roster_etag, roster_json, roster_last_modified
+from .utils import generate_schedule_for_dates, SOLVERS, DEFAULT_SOLVER  # ⬅️ ISPRAVNO: Import bez pozivanja funkcije
 
+def request_params(request):
+    # Akcije koje mijenjaju raspored primaju parametre POST-om, izvještaji GET-om
+    return request.POST if request.method == 'POST' else request.GET
+
+def parse_date_range(request, default_days=1):
+    params = request_params(request)
+    start_date = date.fromisoformat(params['start_date']) if params.get('start_date') else now().date()
+    end_date = date.fromisoformat(params['end_date']) if params.get('end_date') else start_date + timedelta(days=default_days - 1)
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date")
+    departments = [int(value) for value in params['departments'].split(',')] if params.get('departments') else None
+    return start_date, end_date, departments
+
+# Generiranje i popravak brišu smjene cijelog raspona, pa je raspon ograničen
+GENERATION_MAX_DAYS = 92
+
+def parse_generation_params(request):
+    start_date, end_date, departments = parse_date_range(request)
+    params = request_params(request)
+
+    solver = params.get('solver', DEFAULT_SOLVER)
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', available: {', '.join(SOLVERS)}")
+
+    seed = int(params['seed']) if params.get('seed') else None
+    if (end_date - start_date).days >= GENERATION_MAX_DAYS:
+        raise ValueError(f"Date range is limited to {GENERATION_MAX_DAYS} days")
+    dates = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    return dates, departments, solver, seed
+
+@require_POST
+@staff_member_required(login_url='admin:login')
 def generate_schedule_view(request):
-    start_date = now().date()
-    shifts = generate_schedule_for_day(start_date)  # ⬅️ Sada pozivamo funkciju unutar view-a
-    return JsonResponse({"shifts_created": len(shifts)})
+    params = request_params(request)
+    try:
+        dates, departments, solver, seed = parse_generation_params(request)
+        # 🧮 Pokušaji lokalne pretrage nakon generiranja (0 = samo ocjena)
+        improve_iterations = int(params['improve_iterations']) if params.get('improve_iterations') else DEFAULT_IMPROVE_ITERATIONS
+        if not 0 <= improve_iterations <= MAX_IMPROVE_ITERATIONS:
+            raise ValueError(f"improve_iterations must be between 0 and {MAX_IMPROVE_ITERATIONS}")
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    # ⏳ background=1 vraća ID posla odmah, a generiranje ide u pozadini
+    if params.get('background'):
+        try:
+            job = submit_generation_job(dates, departments, solver, seed, improve_iterations)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=409)
+        return JsonResponse({
+            "job_id": job.pk,
+            "status": job.status,
+            "status_url": reverse('generation_job_status', args=[job.pk]),
+        }, status=202)
+
+    # 🔒 Ni izravno generiranje ne smije raditi nad datumima aktivnog posla
+    conflict = conflicting_job(dates, departments)
+    if conflict is not None:
+        return JsonResponse({"error": f"Dates overlap generation job #{conflict.pk} ({conflict.status})"}, status=409)
+
+    stats = GenerationStats()
+    shifts = generate_schedule_for_dates(dates, departments, solver=solver, seed=seed, stats=stats, improve_iterations=improve_iterations)  # ⬅️ Sada pozivamo funkciju unutar view-a
+    return JsonResponse({"shifts_created": len(shifts), "solver": solver, "seed": seed, "score": stats.scores.get('final'), "stats": stats.as_dict()})
+
+@require_POST
+@staff_member_required(login_url='admin:login')
+def repair_schedule_view(request):
+    try:
+        dates, departments, solver, seed = parse_generation_params(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    # 🔧 Valjane smjene ostaju, rješava se samo ono što je promjena pokvarila
+    stats = GenerationStats()
+    summary = repair_schedule(dates, departments, solver=solver, seed=seed, stats=stats)
+    return JsonResponse({**summary, "solver": solver, "seed": seed, "stats": stats.as_dict()})
+
+@staff_member_required(login_url='admin:login')
+def generation_job_status_view(request, job_id):
+    job = get_object_or_404(GenerationJob, pk=job_id)
+    return JsonResponse(job_status(job))
+
+def filter_shifts(request):
+    shifts = Shift.objects.all()
+    if request.GET.get('start_date'):
+        shifts = shifts.filter(date__gte=date.fromisoformat(request.GET['start_date']))
+    if request.GET.get('end_date'):
+        shifts = shifts.filter(date__lte=date.fromisoformat(request.GET['end_date']))
+    if request.GET.get('departments'):
+        shifts = shifts.filter(department__in=[int(value) for value in request.GET['departments'].split(',')])
+    return shifts
+
+# Smjene svih radnika vidi samo tko ih smije vidjeti i u adminu
+@login_required(login_url='admin:login')
+@permission_required('schedule.view_shift', raise_exception=True)
+def export_shifts_csv_view(request):
+    try:
+        shifts = filter_shifts(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return csv_response(shifts)
+
+# 📊 Pokrivenost i iskorištenost; NumPy se učitava tek kod prvog izvještaja
+COVERAGE_DEFAULT_DAYS = 7
+
+# Iskorištenost po radniku: ista provjera kao admin izvještaj (has_view_permission)
+@login_required(login_url='admin:login')
+@permission_required('schedule.view_shift', raise_exception=True)
+def coverage_report_view(request):
+    from .coverage import coverage_report
+
+    try:
+        start_date, end_date, departments = parse_date_range(request, default_days=COVERAGE_DEFAULT_DAYS)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse(coverage_report(start_date, end_date, departments))
+
+# 📋 Roster za zaslone: token umjesto prijave, jer sesija znači upit u bazu i kod 304 odgovora
+def roster_token_required(view):
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not roster_access_allowed(request):
+            return JsonResponse({"error": "A valid roster token is required"}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+def parse_roster_params(request):
+    start_date, end_date, departments = parse_date_range(request)
+    if (end_date - start_date).days >= ROSTER_MAX_DAYS:
+        raise ValueError(f"Date range is limited to {ROSTER_MAX_DAYS} days")
+    employees = [int(value) for value in request.GET['employees'].split(',')] if request.GET.get('employees') else None
+    return start_date, end_date, departments, employees
+
+def roster_view_etag(request):
+    try:
+        return roster_etag(*parse_roster_params(request))
+    except ValueError:
+        return None
+
+@roster_token_required
+@condition(etag_func=roster_view_etag, last_modified_func=lambda request: roster_last_modified())
+def roster_view(request):
+    try:
+        params = parse_roster_params(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    response = HttpResponse(roster_json(*params), content_type='application/json')
+    # Klijent smije čuvati odgovor, ali ga prije svake upotrebe provjerava (ETag / 304)
+    patch_cache_control(response, no_cache=True, private=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
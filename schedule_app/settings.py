@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -83,12 +86,45 @@ WSGI_APPLICATION = 'schedule_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SCHEDULE_DB_ENGINE selects the backend:
+#   sqlite (default)  WAL journal, so admin reads continue while a generation run writes
+#   postgresql        persistent, health-checked connections (requires psycopg)
+
+SCHEDULE_DB_ENGINE = os.environ.get('SCHEDULE_DB_ENGINE', 'sqlite').lower()
+
+if SCHEDULE_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('SCHEDULE_DB_NAME', 'schedule'),
+            'USER': os.environ.get('SCHEDULE_DB_USER', 'schedule'),
+            'PASSWORD': os.environ.get('SCHEDULE_DB_PASSWORD', ''),
+            'HOST': os.environ.get('SCHEDULE_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('SCHEDULE_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('SCHEDULE_DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
+elif SCHEDULE_DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SCHEDULE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a connection waits for a lock before "database is locked"
+                'timeout': int(os.environ.get('SCHEDULE_SQLITE_TIMEOUT', '20')),
+                # Writers take the lock at BEGIN instead of failing on upgrade mid-transaction
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('SCHEDULE_SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown SCHEDULE_DB_ENGINE '{SCHEDULE_DB_ENGINE}', use 'sqlite' or 'postgresql'")
 
 
 # Password validation
@@ -131,3 +167,95 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Schedule generation
+# Number of background threads running GenerationJob instances
+
+SCHEDULE_JOB_WORKERS = 2
+
+# Processes solving independent department groups in parallel (None = all CPU cores)
+
+SCHEDULE_GENERATION_WORKERS = None
+
+# Cache
+# Rendered PDF rosters are cached by schedule version. The default in-process cache
+# suits a single server process; set SCHEDULE_CACHE_DIR to share the cache (and the
+# schedule version) between several worker processes.
+
+if os.environ.get('SCHEDULE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['SCHEDULE_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'schedule',
+        }
+    }
+
+# Roster PDFs larger than this (bytes) are streamed from a temporary file and not cached
+
+SCHEDULE_PDF_CACHE_MAX_SIZE = 20 * 1024 * 1024
+
+SCHEDULE_PDF_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Cached roster API responses; any schedule change makes old entries unreachable
+
+SCHEDULE_ROSTER_CACHE_TIMEOUT = 60 * 60
+
+# Roster API access: screens send "Authorization: Bearer <token>" (or ?token=) with one of
+# these comma-separated tokens; the check needs no database query. Set
+# SCHEDULE_ROSTER_PUBLIC=1 only on a closed network to serve the roster without a token.
+
+SCHEDULE_ROSTER_TOKENS = [token for token in os.environ.get('SCHEDULE_ROSTER_TOKENS', '').split(',') if token]
+
+SCHEDULE_ROSTER_PUBLIC = os.environ.get('SCHEDULE_ROSTER_PUBLIC', '') == '1'
+
+# Logging
+# Generator logs go to the "schedule" logger; SCHEDULE_LOG_LEVEL=DEBUG shows every
+# assignment, SCHEDULE_LOG_LEVEL=OFF silences it entirely
+
+SCHEDULE_LOG_LEVEL = os.environ.get('SCHEDULE_LOG_LEVEL', 'INFO').upper()
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'null': {'class': 'logging.NullHandler'},
+    },
+    'loggers': {
+        'schedule': {
+            'handlers': ['null'] if SCHEDULE_LOG_LEVEL == 'OFF' else ['console'],
+            'level': 'CRITICAL' if SCHEDULE_LOG_LEVEL == 'OFF' else SCHEDULE_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
+# Jazzmin admin: links to the coverage report and import pages next to the schedule models
+
+JAZZMIN_SETTINGS = {
+    'custom_links': {
+        'schedule': [{
+            'name': 'Coverage report',
+            'url': 'admin:schedule_shift_coverage',
+            'icon': 'fas fa-chart-area',
+            'permissions': ['schedule.view_shift'],
+        }, {
+            'name': 'Import employees',
+            'url': 'admin:schedule_employee_import',
+            'icon': 'fas fa-file-import',
+            'permissions': ['schedule.add_employee'],
+        }, {
+            'name': 'Import shift requirements',
+            'url': 'admin:schedule_shiftrequirement_import',
+            'icon': 'fas fa-file-import',
+            'permissions': ['schedule.add_shiftrequirement'],
+        }],
+    },
+}